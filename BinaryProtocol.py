@@ -0,0 +1,149 @@
+##################################################################
+# Compact binary framing used with Radar_Binary.ino
+# Every reading from the Arduino is one 15 byte frame:
+#   sync     2 bytes  0xA5 0x5A
+#   seq      uint16   sequence number of the angle command in effect
+#   angle    uint16   servo angle in tenths of a degree
+#   range    float32  distance in cm
+#   time     uint32   micros() on the Arduino when the ping was sent
+#   checksum uint8    sum of the bytes from seq to time, modulo 256
+# Angle commands to the Arduino are 7 byte frames:
+#   sync, seq (uint16), angle (uint16, tenths of a degree), checksum
+# analog_port.ino sends frames of analogRead() values:
+#   sync, count (uint16), seq (uint16), time (uint32),
+#   count samples (uint16), checksum
+# Earlier versions of analog_port.ino printed each of 75 values on a
+# line, with nothing marking where a ping starts
+# All fields are little endian, as the AVR stores them
+##################################################################
+
+import numpy as np
+
+SYNC = b'\xa5\x5a'
+SYNC_WORD = 0x5aa5  # SYNC read as a little endian uint16
+
+FRAME = np.dtype([('sync', '<u2'), ('seq', '<u2'), ('angle', '<u2'),
+                  ('range', '<f4'), ('time', '<u4'), ('checksum', 'u1')])
+COMMAND = np.dtype([('sync', '<u2'), ('seq', '<u2'), ('angle', '<u2'), ('checksum', 'u1')])
+ANALOG_COUNT = 2  # Offset of the sample count in an analog frame
+ANALOG_TEXT_SAMPLES = 75  # Lines per ping of the text analog_port.ino
+ANALOG_TEXT_BYTES = 256  # Read without a sync marker before looking for text instead
+
+
+def analog_frame(count):
+    """dtype of an analog_port.ino frame holding count samples"""
+    return np.dtype([('sync', '<u2'), ('count', '<u2'), ('seq', '<u2'), ('time', '<u4'),
+                     ('samples', '<u2', (count,)), ('checksum', 'u1')])
+
+
+def checksums(raw):
+    """Checksums of an (n, itemsize) uint8 array of frames, skipping sync and checksum bytes"""
+    return (raw[:, 2:-1].sum(axis=1) & 0xff).astype(np.uint8)
+
+
+def encode_frames(seq, angle, distance, micros):
+    """Packs readings into frames. Accepts scalars or equal length arrays,
+        angle in degrees. Used by the simulator and benchmarks"""
+    seq, angle, distance, micros = np.broadcast_arrays(seq, angle, distance, micros)
+    frames = np.zeros(seq.shape[0] if seq.ndim else 1, dtype=FRAME)
+    frames['sync'] = SYNC_WORD
+    frames['seq'] = seq
+    frames['angle'] = np.round(np.asarray(angle, dtype=float) * 10)
+    frames['range'] = distance
+    frames['time'] = micros
+    raw = frames.view(np.uint8).reshape(len(frames), FRAME.itemsize)
+    frames['checksum'] = checksums(raw)
+    return frames.tobytes()
+
+
+def encode_analog_frames(seq, micros, samples):
+    """Packs rows of analogRead() values into analog frames. Used by the simulator and benchmarks"""
+    samples = np.atleast_2d(samples)
+    frames = np.zeros(len(samples), dtype=analog_frame(samples.shape[1]))
+    frames['sync'] = SYNC_WORD
+    frames['count'] = samples.shape[1]
+    frames['seq'] = seq
+    frames['time'] = micros
+    frames['samples'] = samples
+    raw = frames.view(np.uint8).reshape(len(frames), frames.dtype.itemsize)
+    frames['checksum'] = checksums(raw)
+    return frames.tobytes()
+
+
+def analog_count(buffer):
+    """Sample count from the header of the first analog frame in buffer, None if there is no complete header"""
+    start = buffer.find(SYNC)
+    if start < 0 or len(buffer) < start + ANALOG_COUNT + 2:
+        return None
+    return int.from_bytes(buffer[start + ANALOG_COUNT:start + ANALOG_COUNT + 2], 'little')
+
+
+def is_analog_text(buffer):
+    """True if buffer is lines of numbers, as the text analog_port.ino sends"""
+    return b'\n' in buffer and buffer.translate(None, b'0123456789\r\n') == b''
+
+
+def encode_command(seq, angle):
+    """Packs one angle command for the Arduino, angle in degrees"""
+    command = np.zeros(1, dtype=COMMAND)
+    command['sync'] = SYNC_WORD
+    command['seq'] = seq & 0xffff
+    command['angle'] = int(round(angle * 10))
+    raw = command.view(np.uint8).reshape(1, COMMAND.itemsize)
+    command['checksum'] = checksums(raw)
+    return command.tobytes()
+
+
+class FrameDecoder(object):
+    """Turns a byte stream into arrays of frames. Bytes are fed in whatever
+        chunks the port returns, complete frames are decoded many at a time
+        with np.frombuffer and partial frames are kept for the next call.
+        Corrupt frames are skipped by searching for the next sync marker"""
+
+    def __init__(self, dtype=FRAME):
+        self.dtype = dtype
+        self.size = dtype.itemsize
+        self.buffer = bytearray()
+        self.frames = 0
+        self.errors = 0  # Number of times the decoder had to resynchronise
+
+    def feed(self, data):
+        """Adds bytes and returns every complete, valid frame as a structured array"""
+        self.buffer += data
+        blocks = []
+        while True:
+            start = self.buffer.find(SYNC)
+            if start < 0:
+                # Keep a trailing first sync byte, its partner may be in the next read
+                keep = 1 if self.buffer[-1:] == SYNC[:1] else 0
+                if len(self.buffer) > keep:
+                    self.errors += 1
+                    del self.buffer[:len(self.buffer) - keep]
+                break
+            if start > 0:
+                self.errors += 1
+                del self.buffer[:start]
+
+            n = len(self.buffer) // self.size
+            if n == 0:
+                break
+            raw = np.frombuffer(bytes(self.buffer[:n * self.size]), dtype=np.uint8).reshape(n, self.size)
+            block = raw.view(self.dtype).reshape(n)
+            good = (block['sync'] == SYNC_WORD) & (checksums(raw) == block['checksum'])
+            if good.all():
+                blocks.append(block)
+                del self.buffer[:n * self.size]
+            else:
+                bad = int(np.argmin(good))
+                blocks.append(block[:bad])
+                self.errors += 1
+                del self.buffer[:bad * self.size + 1]  # Drop the bad sync marker and look for the next
+
+        if not blocks:
+            return np.empty(0, dtype=self.dtype)
+        frames = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+        self.frames += len(frames)
+        return frames
+
+    def reset(self):
+        self.buffer = bytearray()
@@ -1,15 +1,12 @@
-import serial
-import serial.tools.list_ports
 from pyqtgraph.Qt import QtCore, QtWidgets, QtGui
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot
-from qt_material import list_themes
 
 
 class CustomDialog(QDialog):
     new_theme = pyqtSignal(str)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, registry=None):
         super(CustomDialog, self).__init__(parent)
 
         self.setStyleSheet("""QLabel { font-size: 10pt; }""")
@@ -21,24 +18,17 @@ class CustomDialog(QDialog):
         self.setLayout(self.layout)
 
         # Port ComboBox and Labels
-        com_list = []
-        port_1 = QLabel()
-        # Find available ports to connect to
-        ports = serial.tools.list_ports.comports()
-
+        self.registry = registry  # PortRegistry the ports are listed from, kept up to date while open
+        self.port_list = QLabel()
         self.port = QComboBox()
-        self.port.setMaxCount(len(ports))
-
-        for index, value in enumerate(sorted(ports)):
-            print(index, '\t', value.name, '\t', value.description)
-            com_list.append(value.name + '\t' + value.description)
-            self.port.addItem(value.name)
-        print(len(ports), 'ports found')
+        self.port.setEditable(True)  # Also accepts a typed port name, e.g. from SerialSimulator.py
+        self.set_ports()
+        if registry is not None:
+            registry.changed.connect(self.set_ports)
 
         message = QLabel("Select Port Name")
-        port_1.setText("Available Ports:\n" + '\n'.join(com_list))
 
-        self.layout.addWidget(port_1, 0, 0)
+        self.layout.addWidget(self.port_list, 0, 0)
         self.layout.addWidget(message, 1, 0)
         self.layout.addWidget(self.port, 2, 0)
 
@@ -58,6 +48,7 @@ class CustomDialog(QDialog):
         # ComboBox for theme colors
         self.color_label = QLabel("Color Theme")
         self.colors = QComboBox()
+        from qt_material import list_themes  # qt_material imports jinja2, Oscillate.py has no other use for it
         self.themes = list_themes()
 
         for i in range(10):
@@ -67,8 +58,55 @@ class CustomDialog(QDialog):
             self.colors.addItem(x)
         self.layout.addWidget(self.color_label, 4, 2)
         self.layout.addWidget(self.colors, 5, 2)
+
+        # CheckBox for timing each stage from the port to the screen, shown over the plots
+        self.latency = QCheckBox("Latency Overlay")
+        self.latency.setTristate(False)
+        self.layout.addWidget(self.latency, 6, 2)
+
+        # ComboBox for profiling the GUI thread, written to .pstats and .folded files, see Profiler.py
+        self.profiling_label = QLabel("Profiling")
+        self.profiling = QComboBox()
+        self.profiling_options = [(False, None), (True, None), (False, 0.05)]  # (armed, budget in seconds)
+        self.profiling.addItems(["Off", "Next 10 s", "Readings Over 50 ms"])
+        self.layout.addWidget(self.profiling_label, 7, 2)
+        self.layout.addWidget(self.profiling, 8, 2)
         self.colors.currentIndexChanged.connect(self.theme_change)
 
+        # ComboBox for how often the plots are repainted
+        self.render_label = QLabel("Render Rate")
+        self.render_rate = QComboBox()
+        self.render_rates = [30, 60, 0]  # Frames per second, 0 repaints on demand
+        self.render_rate.addItems(["30 Hz", "60 Hz", "On Demand"])
+        self.layout.addWidget(self.render_label, 1, 3)
+        self.layout.addWidget(self.render_rate, 2, 3)
+
+        # ComboBox for the serial protocol, must match the sketch on the Arduino
+        self.protocol_label = QLabel("Protocol")
+        self.protocol = QComboBox()
+        self.protocols = ['ascii', 'binary']
+        self.protocol.addItems(["ASCII, 9600 baud (Radar_Combined.ino)", "Binary, 115200 baud (Radar_Binary.ino)"])
+        self.layout.addWidget(self.protocol_label, 3, 3)
+        self.layout.addWidget(self.protocol, 4, 3)
+
+        # ComboBox for how long detections stay on the top right plot
+        self.persistence_label = QLabel("Persistence")
+        self.persistence = QComboBox()
+        self.persistences = [0, 2, 5, 15, None]  # Half life in seconds, None never fades
+        self.persistence.addItems(["Off", "2 s", "5 s", "15 s", "No Fade"])
+        self.persistence.setCurrentIndex(2)
+        self.layout.addWidget(self.persistence_label, 5, 3)
+        self.layout.addWidget(self.persistence, 6, 3)
+
+        # ComboBox for how many sweeps the right hand plots keep, older sweeps fade
+        self.history_label = QLabel("Sweep History")
+        self.history = QComboBox()
+        self.histories = [1, 10, 50, 200, 500]
+        self.history.addItems(["Last Sweep", "10 Sweeps", "50 Sweeps", "200 Sweeps", "500 Sweeps"])
+        self.history.setCurrentIndex(1)
+        self.layout.addWidget(self.history_label, 7, 3)
+        self.layout.addWidget(self.history, 8, 3)
+
         # Threshold Detection Bounds Labels and LineEdits
         self.threshold_bound1 = QLineEdit("20")
         self.threshold_bound2 = QLineEdit("0")
@@ -120,6 +158,39 @@ class CustomDialog(QDialog):
         self.threshold_bound1.textChanged.connect(self.range_check)
         self.threshold_bound2.textChanged.connect(self.range_check)
 
+    def set_ports(self, added=None, removed=None):
+        """Lists the ports, from the registry if there is one, keeping the port selected"""
+        from SerialSimulator import simulated_ports
+        from SerialSession import replay_ports
+
+        if self.registry is not None:
+            ports = self.registry.ports()
+        else:
+            import serial.tools.list_ports  # Imported here as the dialog is the only user
+            ports = [(port.device, port.description) for port in sorted(serial.tools.list_ports.comports())]
+        ports += simulated_ports() + replay_ports()  # Started with --simulate or --playback
+        selected = self.port.currentText()
+        self.port.clear()
+        for name, description in ports:
+            self.port.addItem(name)
+        if selected:
+            self.port.setCurrentText(selected)
+        self.port_list.setText("Available Ports:\n" + '\n'.join(name + '\t' + description
+                                                                for name, description in ports))
+
+    def done(self, result):
+        if self.registry is not None:
+            self.registry.changed.disconnect(self.set_ports)
+            self.registry = None
+        super(CustomDialog, self).done(result)
+
+    def set_profiling(self, armed, budget):
+        """Selects the profiling option, adding one for a budget given with --profile-budget"""
+        if (armed, budget) not in self.profiling_options:
+            self.profiling_options.append((armed, budget))
+            self.profiling.addItem("Readings Over {:g} ms".format(budget * 1000))
+        self.profiling.setCurrentIndex(self.profiling_options.index((armed, budget)))
+
     def update_value(self):
         self.detection_label.setText("Enter The Scanning Radius (degrees): " + str(self.detection_radius.value() * 10))
 
@@ -2,12 +2,12 @@ from PyQt5.QtWidgets import *
 
 
 class ExportDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, kinds=None):
         super(ExportDialog, self).__init__(parent)
 
         self.setStyleSheet("""QLabel {font-size: 10pt;}""")
 
-        self.setWindowTitle("Export to PNG")
+        self.setWindowTitle("Export")
 
         QBtn = QDialogButtonBox.Ok | QDialogButtonBox.Cancel
 
@@ -15,10 +15,19 @@ class ExportDialog(QDialog):
         self.buttonBox.accepted.connect(self.accept)
         self.buttonBox.rejected.connect(self.reject)
 
+        # What to export, (key, description) pairs
+        if kinds is None:
+            kinds = [('plots', "Plots (.png, .jpg, .bmp)"), ('data', "Sweep data (.csv, .npz)")]
+        self.kinds = [key for key, description in kinds]
+        self.kind = QComboBox()
+        self.kind.addItems([description for key, description in kinds])
+
         self.layout = QVBoxLayout()
         self.file_name = QLabel("Enter File Name: ")
         self.file = QLineEdit("filename.png")
 
+        self.layout.addWidget(QLabel("Export: "))
+        self.layout.addWidget(self.kind)
         self.layout.addWidget(self.file_name)
         self.layout.addWidget(self.file)
         self.layout.addWidget(self.buttonBox)
@@ -0,0 +1,187 @@
+import os
+import queue
+import time
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QColor, QImage
+
+from SweepLog import SweepLog, CLEAR, OBJECT
+
+IMAGE_TYPES = ('.png', '.jpg', '.jpeg', '.bmp')
+DATA_TYPES = ('.csv', '.npz')
+STOP = None  # Queued by stop(), everything queued before it is still exported
+
+
+def export_type(path, types):
+    """The extension of path if it is one of types, otherwise None"""
+    ext = os.path.splitext(path)[1].lower()
+    return ext if ext in types else None
+
+
+def sequence_name(path, i):
+    """File name of frame i of an image sequence, sweep.png -> sweep_00012.png"""
+    root, ext = os.path.splitext(path)
+    return "{}_{:05d}{}".format(root, i, ext)
+
+
+def save_data(path, arrays):
+    """Saves named 1D arrays. NPZ keeps each array, CSV has a column per array
+        with shorter columns left empty"""
+    if export_type(path, DATA_TYPES) == '.npz':
+        np.savez(path, **arrays)
+        return
+    names = list(arrays)
+    length = max((len(a) for a in arrays.values()), default=0)
+    table = np.full((length, len(names)), np.nan)
+    for i, name in enumerate(names):
+        table[:len(arrays[name]), i] = arrays[name]
+    with open(path, 'w') as f:
+        f.write(",".join(names) + "\n")
+        for row in table:
+            f.write(",".join("" if np.isnan(v) else repr(float(v)) for v in row) + "\n")
+
+
+class SweepRenderer(object):
+    """Draws sweeps as radar images with numpy, so it runs on any thread.
+        The background of range rings and bearing lines is drawn once and
+        each sweep's points are stamped onto a copy of it"""
+
+    def __init__(self, width=800, max_range=400., colors=None, dot=2):
+        colors = colors or {}
+        self.width = width
+        self.height = width // 2 + dot + 1
+        self.scale = (width / 2 - dot - 1) / float(max_range)  # Pixels per cm
+        self.dot = dot
+        rgb = lambda name, default: np.array(QColor(colors.get(name, default)).getRgb()[:3], dtype=np.uint8)
+        self.colors = {CLEAR: rgb('clear', '#00ff00'), OBJECT: rgb('object', '#ff0000')}
+        self.other = rgb('other', '#aaaaaa')
+        self.background = self.draw_background(rgb('background', '#000000'), rgb('grid', '#404040'), max_range)
+
+    def draw_background(self, fill, grid, max_range):
+        image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image[:] = fill
+        py, px = np.mgrid[0:self.height, 0:self.width]
+        dx = px - self.width / 2.
+        dy = (self.height - 1 - self.dot) - py
+        r = np.hypot(dx, dy) / self.scale
+        step = max_range / 4.
+        rings = (np.abs(r - np.round(r / step) * step) * self.scale < 0.7) & (r <= max_range * 1.001) & (dy >= 0)
+        bearing = np.degrees(np.arctan2(dy, dx))
+        lines = (np.abs(bearing - np.round(bearing / 30.) * 30.) * np.radians(1) * r * self.scale < 0.7)
+        image[rings | (lines & (r <= max_range) & (dy >= 0))] = grid
+        return image
+
+    def render(self, x, y, classification):
+        """RGB image of one sweep as a (height, width, 3) uint8 array"""
+        image = self.background.copy()
+        px = np.round(np.asarray(x) * self.scale + self.width / 2.).astype(np.intp)
+        py = np.round((self.height - 1 - self.dot) - np.asarray(y) * self.scale).astype(np.intp)
+        color = np.empty((len(px), 3), dtype=np.uint8)
+        color[:] = self.other
+        for kind, rgb in self.colors.items():
+            color[classification == kind] = rgb
+        for oy in range(-self.dot, self.dot + 1):
+            for ox in range(-self.dot, self.dot + 1):
+                if ox * ox + oy * oy > self.dot * self.dot:
+                    continue
+                cx = px + ox
+                cy = py + oy
+                inside = (cx >= 0) & (cx < self.width) & (cy >= 0) & (cy < self.height)
+                image[cy[inside], cx[inside]] = color[inside]
+        return image
+
+
+def to_qimage(image):
+    """QImage of an (height, width, 3) uint8 array, owning a copy of the data"""
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    return QImage(image.data, width, height, width * 3, QImage.Format_RGB888).copy()
+
+
+class Exporter(QObject):
+    """Saves exports on a worker thread, so acquisition carries on while files
+        are written. The GUI only takes a snapshot, a QImage of the plots
+        or copies of the arrays, and queues it. Every sweep of a sweep log
+        can also be rendered to an image sequence here, off the GUI thread"""
+    progress = pyqtSignal(str)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self):
+        super(Exporter, self).__init__()
+        self.queue = queue.Queue()
+        self.frames = 0
+        self.busy = 0.  # Seconds spent exporting
+
+    def save_image(self, path, image):
+        """Queues a QImage to be saved to path"""
+        self.queue.put((self.write_image, (path, image)))
+
+    def save_data(self, path, arrays):
+        """Queues a dict of named arrays to be saved to a CSV or NPZ file"""
+        self.queue.put((self.write_data, (path, arrays)))
+
+    def save_sweeps(self, log_path, path, max_range, colors=None, width=800, first=0):
+        """Queues every sweep of a sweep log, from sweep id first on, to be
+            rendered to an image sequence named after path"""
+        self.queue.put((self.write_sweeps, (log_path, path, (width, max_range, colors), first)))
+
+    def stop(self):
+        self.queue.put(STOP)
+
+    def fps(self):
+        return self.frames / self.busy if self.busy > 0 else 0.
+
+    @pyqtSlot()
+    def long_running(self):
+        while True:
+            job = self.queue.get()
+            if job is STOP:
+                break
+            function, args = job
+            try:
+                function(*args)
+            except Exception as a:
+                self.error.emit("Export failed: " + str(a))
+        self.finished.emit()
+
+    def write_image(self, path, image):
+        start = time.perf_counter()
+        if image.save(path) is False:
+            raise IOError("Could not write " + path)
+        self.count_frames(start, 1)
+        self.progress.emit("Successfully saved file as " + path)
+
+    def write_data(self, path, arrays):
+        save_data(path, arrays)
+        self.progress.emit("Successfully saved data as " + path)
+
+    def write_sweeps(self, log_path, path, options, first):
+        start = time.perf_counter()
+        renderer = SweepRenderer(*options)
+        log = SweepLog(log_path)
+        ids, starts, stops = log.sweep_bounds()
+        keep = ids >= first
+        ids, starts, stops = ids[keep], starts[keep], stops[keep]
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        for n, (sweep, lo, hi) in enumerate(zip(ids, starts, stops)):
+            records = log.records[lo:hi]
+            image = renderer.render(records['x'], records['y'], records['classification'])
+            name = sequence_name(path, int(sweep))
+            if to_qimage(image).save(name) is False:
+                raise IOError("Could not write " + name)
+            if n % 50 == 49:
+                self.progress.emit("Exported {} of {} sweeps".format(n + 1, len(ids)))
+        elapsed = self.count_frames(start, len(ids))
+        root, ext = os.path.splitext(path)
+        self.progress.emit("Exported {} sweeps to {}_*{} at {:.1f} frames/s".format(
+            len(ids), root, ext, len(ids) / elapsed if elapsed else 0.))
+
+    def count_frames(self, start, n):
+        elapsed = time.perf_counter() - start
+        self.frames += n
+        self.busy += elapsed
+        return elapsed
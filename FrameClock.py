@@ -0,0 +1,81 @@
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from Latency import probes
+
+
+class FrameClock(QObject):
+    """Collects plot and label updates as samples are processed and applies
+        them at most rate times a second, so repainting is independent of how
+        fast samples arrive. Only the last update staged for each plot or
+        label in a frame is applied. A rate of 0 renders on demand, as soon as
+        control returns to the event loop"""
+    frame = pyqtSignal()  # Emitted just before staged updates are applied
+
+    def __init__(self, rate=30, parent=None):
+        super(FrameClock, self).__init__(parent)
+        self.rate = rate
+        self.plots = {}
+        self.labels = {}
+        self.rendering = False
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)  # Only scheduled while there is something to draw
+        self.timer.timeout.connect(self.render)
+
+        # For Frame Rate Calculations
+        self.fps = 0.
+        self.frames = 0
+        self.lastupdate = time.time()
+
+    def set_rate(self, rate):
+        self.rate = rate
+
+    def set_data(self, item, *args, **kwargs):
+        """Stages item.setData(*args, **kwargs) for the next frame"""
+        self.plots[item] = (args, kwargs)
+        self.request()
+
+    def set_text(self, label, text):
+        """Stages label.setText(text) for the next frame"""
+        self.labels[label] = text
+        self.request()
+
+    def request(self):
+        """Schedules a frame unless one is already due"""
+        if self.timer.isActive() or self.rendering:
+            return
+        delay = 0
+        if self.rate:
+            delay = max(0., self.lastupdate + 1.0 / self.rate - time.time())
+        self.timer.start(int(delay * 1000))
+
+    def discard(self):
+        """Drops everything staged, for when plots are cleared directly"""
+        self.plots.clear()
+        self.labels.clear()
+
+    def render(self):
+        self.rendering = True
+        self.frame.emit()
+        self.rendering = False
+        plots = self.plots
+        labels = self.labels
+        self.plots = {}
+        self.labels = {}
+        start = probes.start()
+        for item, (args, kwargs) in plots.items():
+            item.setData(*args, **kwargs)
+        probes.stop('setData', start)
+        start = probes.start()
+        for label, text in labels.items():
+            label.setText(text)
+        probes.stop('labels', start)
+
+        now = time.time()
+        dt = now - self.lastupdate
+        if dt > 0:
+            self.fps = self.fps * 0.9 + (1.0 / dt) * 0.1
+        self.lastupdate = now
+        self.frames += 1
@@ -0,0 +1,333 @@
+##################################################################
+# Radar scanning and sweep logging without a display
+# Runs the sweeps, object scans and static angle readings of
+# Radar_Main.py from the command line, through the same Scanner logic,
+# without creating any widgets or importing pyqtgraph. Sweeps and scans
+# are appended to the sweep log, scans also to datax.txt and datay.txt,
+# and a line is printed for every sweep finished.
+#
+# One shot:     python Headless.py PORT --sweeps=10
+#               python Headless.py PORT --scan
+#               python Headless.py PORT --static=90 --seconds=5
+# Scripted:     python Headless.py PORT < commands.txt
+#               one command per line, each run to completion in turn:
+#                   sweep [N]           N sweeps, until stopped without N
+#                   scan                one object scan
+#                   static ANGLE [S]    readings at ANGLE for S seconds
+#                   stop                servo back to 0
+#                   quit
+# Options:      --protocol=ascii|binary  --threshold=CM  --threshold2=CM
+#               --range=CM  --radius=3..18  --scan-speed=1|2  --log=PATH
+# Without hardware, PORT can be left out for --simulate[=binary] or
+# --playback=PATH, which take the options of SerialSimulator.py and
+# SerialSession.py
+##################################################################
+
+import sys
+import threading
+import time
+
+from PyQt5.QtCore import Qt
+
+from Latency import probes
+from LogWriter import LogWriter
+from PolarTransform import polar_transform
+from Scanner import Scanner
+from SerialReader import SerialReader
+from SerialSession import recording_path, session_from_args
+from SerialSimulator import simulate_from_args
+from SweepLog import OBJECT
+
+
+class HeadlessScanner(Scanner):
+    """Scanner driven from the command line. The reader and log writer
+        run on plain threads, their signals connected directly so they are
+        delivered without an event loop, and each command blocks this
+        thread until it is done"""
+
+    def __init__(self, port_name, protocol='ascii', threshold=20, threshold2=0, s=50, det_radius=18,
+                 multiplier=2, log_name="sweeps.radarlog"):
+        self.port_name = port_name
+        self.protocol = protocol
+        self.threshold = threshold
+        self.threshold2 = threshold2
+        self.s = s
+        self.det_radius = det_radius
+        self.multiplier = multiplier
+        self.angle_multiplier = 2 // multiplier
+        self.polar = polar_transform(multiplier)
+
+        self.reader = None
+        self.reader_thread = None
+        self.status = None  # What the reader said on opening the port
+        self.connected = threading.Event()
+        self.ready = threading.Event()  # Set by data_ready
+        self.running = False  # Cleared by interrupt() to end the command in progress
+
+        self.angle = 0
+        self.iter = False
+        self.scan = False
+        self.tracking_list_radius = []
+        self.tracking_list_azimuth = []
+        # Angle commands run ahead of the readings, see Scanner.start_commands()
+        self.pipeline = 4
+        self.command_angle = 0
+        self.command_iter = False
+        self.issued = 0
+        self.last_seq = None
+        self.sweep_start = None
+        self.sweep_time = 0.
+        self.sweeps = 0  # Sweeps finished
+        self.objects = []  # (angle, range) of the OBJECT readings of the sweep in progress
+        self.readings = 0  # Of the sweep in progress
+
+        self.log_name = log_name
+        self.log = None
+        self.log_thread = None
+        self.next_sweep = None
+        self.log_rows = []
+
+    def connect(self, timeout=5.):
+        """Opens the port on the reader's thread, returns False if it could not be opened"""
+        baudrate = 115200 if self.protocol == 'binary' else 9600
+        self.reader = SerialReader(self.port_name, baudrate, self.protocol, record=recording_path())
+        self.reader.progress.connect(self.reader_status, Qt.DirectConnection)
+        self.reader.error.connect(self.log_error, Qt.DirectConnection)
+        self.reader.data_ready.connect(self.ready.set, Qt.DirectConnection)
+        self.reader_thread = threading.Thread(target=self.reader.long_running, daemon=True)
+        self.reader_thread.start()
+        self.connected.wait(timeout)
+        if self.status != "Success":
+            print(self.status or "Error: No reply from " + str(self.port_name))
+            return False
+        print("Connected to", self.port_name)
+        return True
+
+    def reader_status(self, s):
+        self.status = s
+        self.connected.set()
+
+    def log_writer(self):
+        """The log writer worker, started on first use"""
+        if self.log is None:
+            self.log = LogWriter()
+            self.log.error.connect(self.log_error, Qt.DirectConnection)
+            self.log_thread = threading.Thread(target=self.log.long_running, daemon=True)
+            self.log_thread.start()
+        return self.log
+
+    def log_error(self, s):
+        print(s)
+
+    def close(self):
+        """Stops the reader and waits for everything logged to be written"""
+        self.log_sweep()
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader_thread.join()
+            self.reader = None
+        if self.log is not None:
+            self.log.stop()
+            self.log_thread.join()
+            print(self.log.stats())
+            self.log = None
+
+    def interrupt(self):
+        self.running = False
+        self.ready.set()
+
+    def process(self, handle, done, seconds=None):
+        """Passes readings to handle(sample) as they arrive until done() is True,
+            interrupt() is called or seconds have passed"""
+        self.running = True
+        deadline = None if seconds is None else time.time() + seconds
+        while self.running and not done():
+            if deadline is not None and time.time() >= deadline:
+                break
+            self.ready.wait(0.5)
+            self.ready.clear()  # Before pending(), which re-arms data_ready
+            for sample in self.reader.pending():
+                handle(sample)
+                if done():
+                    break
+            if self.reader_thread is not None and not self.reader_thread.is_alive():
+                print("Error: The reader stopped")
+                break
+        self.running = False
+
+    def start(self):
+        """As the Start button, continues sweeping or scanning from the current angle"""
+        self.reader.flush_input()
+        self.start_commands()
+
+    def stop(self):
+        """As the Stop button, moves the servo back to 0"""
+        self.scan = False
+        self.log_sweep()  # Keep what there is of a sweep cut short
+        self.angle = 0
+        self.reader.write_angle(self.angle)
+
+    def sweep(self, sweeps=None):
+        """Sweeps back and forth, sweeps times or until interrupted"""
+        self.scan = False
+        target = None if sweeps is None else self.sweeps + sweeps
+        self.objects = []
+        self.readings = 0
+        self.start()
+        self.process(self.sweep_sample, lambda: target is not None and self.sweeps >= target)
+        self.stop()
+
+    def sweep_sample(self, sample):
+        """A reading taken during a sweep, as Radar_Main's update_sample() without the plots"""
+        if not self.accept(sample):
+            return
+        self.angle = sample.angle
+        start = probes.start()
+        x, y = self.polar.point(sample.value, self.angle)
+        probes.stop('transform', start)
+        classification = self.classify(sample.value)
+        self.readings += 1
+        if classification == OBJECT:
+            self.objects.append((self.angle, sample.value))
+        if self.record_reading(sample, x, y, classification):
+            if self.readings > 1:  # Not where the servo started from
+                self.sweeps += 1
+                self.report_sweep()
+            self.objects = []
+            self.readings = 0
+        self.refill_commands(sample)
+
+    def report_sweep(self):
+        line = "Sweep {} {:<8} {} readings  {:.2f} s  {} objects".format(
+            self.sweeps, "back" if self.iter is False else "forward", self.readings, self.sweep_time,
+            len(self.objects))
+        if self.objects:
+            angle, distance = min(self.objects, key=lambda o: o[1])
+            line += "  nearest {} cm at {}°".format(distance, angle)
+        print(line)
+
+    def object_scan(self):
+        """As Object Scanning then Start, one scan from 0 to the detection radius"""
+        self.stop()
+        self.tracking_list_radius = []
+        self.tracking_list_azimuth = []
+        self.scan = True
+        self.start()
+        self.process(self.scan_sample, lambda: self.angle >= (self.det_radius * 10))
+        log = self.log_scan()
+        print("Scan: {} points appended to datax.txt and datay.txt".format(len(self.tracking_list_radius)))
+        print(log.stats())
+        self.scan = False
+
+    def scan_sample(self, sample):
+        if self.accept(sample):
+            self.scan_reading(sample)
+            self.refill_commands(sample)
+
+    def static(self, angle, seconds=None):
+        """Prints readings at a stationary angle for seconds, or until interrupted"""
+        self.scan = False
+        self.angle = angle
+        self.reader.write_angle(self.angle)
+        self.reader.flush_input()
+        print("time,angle,range,x,y,classification")
+        self.process(self.static_sample, lambda: False, seconds)
+
+    def static_sample(self, sample):
+        start = probes.start()
+        x, y = self.polar.point(sample.value, sample.angle)
+        probes.stop('transform', start)
+        print("{:.3f},{},{},{:.2f},{:.2f},{}".format(sample.stamp, sample.angle, sample.value, x, y,
+                                                    self.classify(sample.value)))
+
+    def command(self, line):
+        """Runs one scripted command, returns False for quit"""
+        words = line.split()
+        if not words or words[0].startswith('#'):
+            return True
+        try:
+            if words[0] == 'sweep':
+                self.sweep(int(words[1]) if len(words) > 1 else None)
+            elif words[0] == 'scan':
+                self.object_scan()
+            elif words[0] == 'static':
+                self.static(float(words[1]), float(words[2]) if len(words) > 2 else None)
+            elif words[0] == 'stop':
+                self.stop()
+            elif words[0] == 'quit':
+                return False
+            else:
+                print("Unknown command:", line.strip())
+        except Exception as a:
+            print("Error: " + str(a))
+        return True
+
+
+def headless_from_args(argv):
+    """HeadlessScanner for the port and options in argv, None without a port"""
+    simulator = simulate_from_args(argv)
+    port_name = session_from_args(argv)
+    options = {}
+    for arg in argv:
+        if arg.startswith('--protocol='):
+            options['protocol'] = arg.split('=', 1)[1]
+        elif arg.startswith('--threshold='):
+            options['threshold'] = int(arg.split('=', 1)[1])
+        elif arg.startswith('--threshold2='):
+            options['threshold2'] = int(arg.split('=', 1)[1])
+        elif arg.startswith('--range='):
+            options['s'] = int(arg.split('=', 1)[1])
+        elif arg.startswith('--radius='):
+            options['det_radius'] = int(arg.split('=', 1)[1])
+        elif arg.startswith('--scan-speed='):
+            options['multiplier'] = 2 if arg.split('=', 1)[1] == '1' else 1
+        elif arg.startswith('--log='):
+            options['log_name'] = arg.split('=', 1)[1]
+        elif not arg.startswith('--'):
+            port_name = arg
+    if simulator is not None:
+        port_name = simulator.port_name
+        options.setdefault('protocol', getattr(simulator.device, 'protocol', 'ascii'))
+    if port_name is None:
+        return None
+    scanner = HeadlessScanner(port_name, **options)
+    if scanner.threshold < scanner.threshold2:
+        scanner.threshold, scanner.threshold2 = scanner.threshold2, scanner.threshold
+    return scanner
+
+
+def main(argv):
+    scanner = headless_from_args(argv)
+    if scanner is None:
+        print("Usage: python Headless.py PORT [--sweeps=N | --scan | --static=ANGLE --seconds=S] [options]")
+        return 1
+    probes.enabled = '--latency' in argv
+    if not scanner.connect():
+        return 1
+    commands = []
+    for arg in argv:
+        if arg.startswith('--sweeps='):
+            commands.append('sweep ' + arg.split('=', 1)[1])
+        elif arg == '--scan':
+            commands.append('scan')
+        elif arg.startswith('--static='):
+            seconds = [a.split('=', 1)[1] for a in argv if a.startswith('--seconds=')]
+            commands.append(' '.join(['static', arg.split('=', 1)[1]] + seconds))
+    try:
+        for line in commands or sys.stdin:
+            if scanner.command(line) is False:
+                break
+    except KeyboardInterrupt:
+        print("Stopped")
+    try:
+        scanner.stop()
+    except Exception as a:
+        print(a)
+    scanner.close()
+    if probes.enabled:
+        print(probes.report())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,110 @@
+import math
+import time
+
+# Stages timed, in the order a reading goes through them
+STAGES = ('read', 'parse', 'queue', 'transform', 'setData', 'labels', 'log', 'fsync')
+DESCRIPTIONS = {
+    'read': "serial read() of what the port has waiting",
+    'parse': "decoding a read into samples",
+    'queue': "from a reading arriving to the GUI taking it",
+    'transform': "polar to Cartesian of one reading",
+    'setData': "applying a frame's staged plot updates",
+    'labels': "applying a frame's staged label updates",
+    'log': "writing a batch of log data",
+    'fsync': "fsync of the log files",
+}
+
+SMALLEST = 1e-7  # Seconds at the bottom of the first bucket
+STEPS = 8  # Buckets per doubling, so a percentile is within 9% of the true value
+BUCKETS = STEPS * 27  # Up to 13 s, longer durations go in the last bucket
+
+
+class Histogram(object):
+    """Durations counted in log spaced buckets. Adding one is a few
+        arithmetic operations and a list increment, and percentiles are read
+        from the bucket counts"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        if seconds > SMALLEST:
+            self.counts[min(int(math.log2(seconds / SMALLEST) * STEPS), BUCKETS - 1)] += 1
+        else:
+            self.counts[0] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile, at most max"""
+        if self.count == 0:
+            return 0.
+        wanted = self.count * p / 100.
+        seen = 0
+        for i, n in enumerate(list(self.counts)):  # Copied, another thread may be adding
+            seen += n
+            if seen >= wanted:
+                return min(SMALLEST * 2 ** ((i + 1) / float(STEPS)), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.
+
+
+class Latency(object):
+    """Timing probes for each stage of acquisition and display. Each stage
+        is timed by one thread, the reader, the GUI or the log writer, into
+        its own Histogram. Probes are placed as
+            start = probes.start()
+            ...
+            probes.stop('parse', start)
+        and while disabled start() returns None and stop() returns at once,
+        so they cost two calls"""
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.since = time.time()
+        self.reset()
+
+    def reset(self):
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.since = time.time()
+
+    def start(self):
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, stage, start):
+        if start is not None:
+            self.stages[stage].add(time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        if self.enabled:
+            self.stages[stage].add(seconds)
+
+    def report(self, descriptions=False):
+        """Table of count, p50, p99 and max of every stage timed, in ms"""
+        lines = ["{:<10}{:>9}{:>9}{:>9}{:>9}".format("stage", "count", "p50 ms", "p99 ms", "max ms")]
+        for stage in STAGES:
+            h = self.stages[stage]
+            if h.count == 0:
+                continue
+            line = "{:<10}{:>9}{:>9.3f}{:>9.3f}{:>9.3f}".format(stage, h.count, h.percentile(50) * 1e3,
+                                                                h.percentile(99) * 1e3, h.max * 1e3)
+            if descriptions:
+                line += "  " + DESCRIPTIONS[stage]
+            lines.append(line)
+        return "\n".join(lines)
+
+    def dump(self):
+        """Report with a heading, for appending to a file"""
+        return "Latency from {} to {}\n{}\n\n".format(time.ctime(self.since), time.ctime(),
+                                                           self.report(descriptions=True))
+
+
+probes = Latency()  # Shared by the reader, the frame clock, the log writer and the GUI
@@ -0,0 +1,137 @@
+import os
+import queue
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from Latency import probes
+
+STOP = None  # Queued by stop(), everything queued before it is still written
+
+
+class LogWriter(QObject):
+    """Writes log files on a worker thread so the GUI never waits on the disk.
+        append() queues bytes for a file and returns at once. The worker
+        writes whatever has queued up in one write per file, flushes, and
+        fsyncs files written to at most every fsync_interval seconds.
+        If the queue is full the data is dropped and counted rather than
+        blocking the caller, so the queue is sized to ride out a long disk
+        stall. error is emitted the first time a file loses data, so it
+        shows in the GUI or Headless.py rather than only in stats()"""
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, maxsize=4096, fsync_interval=1.0):
+        super(LogWriter, self).__init__()
+        self.queue = queue.Queue(maxsize)
+        self.fsync_interval = fsync_interval
+        self.files = {}  # Open files by path
+        self.dirty = set()  # Paths written since the last fsync
+
+        # Statistics
+        self.bytes_written = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.dropped = 0
+        self.dropped_paths = set()  # Files that have lost data, each reported once through error
+        self.max_enqueue = 0.  # Longest time append() has taken, in seconds
+        self.max_lag = 0.  # Longest time data has waited in the queue, in seconds
+
+    def append(self, path, data, opener=None):
+        """Queues data to be appended to path. opener(path) opens the file
+            on first use, open(path, 'ab') by default. Returns False if the
+            data had to be dropped"""
+        start = time.perf_counter()
+        try:
+            self.queue.put_nowait((path, data, opener, start))
+            queued = True
+        except queue.Full:
+            self.dropped += 1
+            queued = False
+            if path not in self.dropped_paths:
+                self.dropped_paths.add(path)
+                self.error.emit("Error writing " + str(path) + ": the disk is not keeping up, data was dropped")
+        self.max_enqueue = max(self.max_enqueue, time.perf_counter() - start)
+        return queued
+
+    def stop(self):
+        """Finishes writing everything queued, then closes the files"""
+        self.queue.put(STOP)
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        return ("Log: {depth} queued  {mb:.2f} MB written in {batches} batches  {fsyncs} fsyncs  "
+                "{dropped} dropped  worst enqueue {enqueue:.3f} ms  worst lag {lag:.1f} ms").format(
+            depth=self.depth(), mb=self.bytes_written / 1e6, batches=self.batches, fsyncs=self.fsyncs,
+            dropped=self.dropped, enqueue=self.max_enqueue * 1e3, lag=self.max_lag * 1e3)
+
+    @pyqtSlot()
+    def long_running(self):
+        next_sync = time.time() + self.fsync_interval
+        stopping = False
+        while stopping is False:
+            timeout = max(0., next_sync - time.time()) if self.dirty else None
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while True:  # Take everything else already waiting
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if STOP in batch:
+                stopping = True
+                batch = batch[:batch.index(STOP)]
+            self.write_batch(batch)
+            if stopping or time.time() >= next_sync:
+                self.sync()
+                next_sync = time.time() + self.fsync_interval
+        self.close()
+        self.finished.emit()
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        start = probes.start()
+        now = time.perf_counter()
+        chunks = {}
+        for path, data, opener, queued in batch:
+            if path not in chunks:
+                chunks[path] = (opener, [])
+            chunks[path][1].append(data)
+            self.max_lag = max(self.max_lag, now - queued)
+        for path, (opener, parts) in chunks.items():
+            try:
+                if path not in self.files:
+                    self.files[path] = opener(path) if opener is not None else open(path, 'ab')
+                data = b''.join(parts)
+                self.files[path].write(data)
+                self.files[path].flush()
+                self.bytes_written += len(data)
+                self.dirty.add(path)
+            except Exception as a:
+                self.error.emit("Error writing " + str(path) + ": " + str(a))
+        self.batches += 1
+        probes.stop('log', start)
+
+    def sync(self):
+        start = probes.start() if self.dirty else None
+        for path in self.dirty:
+            try:
+                os.fsync(self.files[path].fileno())
+                self.fsyncs += 1
+            except Exception as a:
+                self.error.emit("Error syncing " + str(path) + ": " + str(a))
+        self.dirty.clear()
+        probes.stop('fsync', start)
+
+    def close(self):
+        for path, f in self.files.items():
+            try:
+                f.close()
+            except Exception as a:
+                print(a)
+        self.files = {}
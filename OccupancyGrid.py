@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+
+
+class OccupancyGrid(object):
+    """Detections binned on a polar grid of servo angle and range that fade
+        with a half life, like the phosphor of a PPI radar display.
+        Readings are added a batch at a time with one bincount, and image()
+        resamples the grid to a Cartesian image through a table built once,
+        so the cost of a frame depends on the grid size alone, however many
+        sweeps have been added"""
+
+    def __init__(self, max_range, half_life=5., angle_bins=91, range_bins=64, width=256):
+        self.max_range = float(max_range)
+        self.half_life = half_life
+        self.angle_bins = angle_bins
+        self.range_bins = range_bins
+        # The last cell stays 0, for outside the arc
+        self.grid = np.zeros(angle_bins * range_bins + 1, dtype=np.float32)
+        self.last = time.time()
+        self.added = 0
+
+        # Cell of every pixel of a width x width / 2 image covering x from -max_range to max_range
+        # and y from 0 to max_range, row 0 at y = 0 as ImageItem draws it
+        height = width // 2
+        x = (np.arange(width) + 0.5) / width * 2 - 1
+        y = (np.arange(height) + 0.5) / height
+        x, y = np.meshgrid(x, y)
+        r = np.hypot(x, y)
+        angle = np.degrees(np.arctan2(x, y)) + 90  # Servo angle, as in PolarTransform
+        a = np.round(angle / 180. * (angle_bins - 1)).astype(np.intp)
+        ri = (r * range_bins).astype(np.intp)
+        self.pixels = np.where(r < 1, a * range_bins + np.minimum(ri, range_bins - 1), len(self.grid) - 1)
+
+    def add(self, angles, ranges):
+        """Adds a batch of readings, angles in degrees and ranges in cm.
+            Readings at or beyond max_range saw nothing and are left out"""
+        angles = np.asarray(angles, dtype=float)
+        ranges = np.asarray(ranges, dtype=float)
+        keep = (ranges > 0) & (ranges < self.max_range) & (angles >= 0) & (angles <= 180)
+        if not keep.any():
+            return
+        a = np.round(angles[keep] / 180. * (self.angle_bins - 1)).astype(np.intp)
+        r = (ranges[keep] / self.max_range * self.range_bins).astype(np.intp)
+        self.grid += np.bincount(a * self.range_bins + r, minlength=len(self.grid)).astype(np.float32)
+        self.added += int(keep.sum())
+
+    def decay(self, now=None):
+        """Fades the grid by the time since the last call"""
+        now = time.time() if now is None else now
+        dt = now - self.last
+        self.last = now
+        if self.half_life and dt > 0:
+            self.grid *= np.float32(0.5 ** (dt / self.half_life))
+
+    def image(self, now=None):
+        """Fades the grid and returns it as a (width / 2, width) image"""
+        self.decay(now)
+        return self.grid[self.pixels]
+
+    def clear(self):
+        self.grid[:] = 0
+        self.last = time.time()
+        self.added = 0
+
+
+def fade_lut(color, n=256):
+    """RGBA lookup table from transparent to color, for ImageItem"""
+    lut = np.zeros((n, 4), dtype=np.uint8)
+    lut[:, :3] = color
+    lut[:, 3] = np.linspace(0, 255, n)
+    return lut
@@ -12,18 +12,26 @@ import time
 
 import numpy as np
 import pyqtgraph as pg
-import pyqtgraph.exporters
-import serial
-import serial.tools.list_ports
-from scipy.signal import *
-from scipy.signal.windows import gaussian
-from scipy.fftpack import rfft, rfftfreq
 from PyQt5.QtCore import QObject, pyqtSignal, QThread, pyqtSlot, Qt
 from PyQt5.QtWidgets import *
 from pyqtgraph.Qt import QtCore, QtWidgets
-from SomeObject import SomeObject
+from SerialReader import SerialReader
+from RingBuffer import RingBuffer
+from PolarTransform import polar_transform
 from ExportDialog import ExportDialog
+from Exporter import Exporter, export_type, IMAGE_TYPES, DATA_TYPES
 from CustomDialog import CustomDialog
+from SerialSimulator import simulate_from_args, simulated_ports
+from SerialSession import recording_path, replay_ports, session_from_args
+from PortRegistry import PortRegistry, PortProbe
+from Profiler import CallbackProfiler, profile_from_args
+
+
+def cspline1d(signal, lamb=0.):
+    """scipy.signal.cspline1d. Importing scipy.signal takes over a second,
+        so it is imported with the first frame rather than at start up"""
+    from scipy.signal import cspline1d
+    return cspline1d(signal, lamb)
 
 
 class App(QtWidgets.QMainWindow):
@@ -68,14 +76,21 @@ class App(QtWidgets.QMainWindow):
                                     }
                                     """)
 
-        self.arduino = None
-        self.port_name = None
+        self.reader = None  # Reads frames from the port on reader_thread
+        self.reader_thread = None
+        self.exporter = None  # Saves exports on exporter_thread, started with the first export
+        self.exporter_thread = None
+        self.port_name = None  # None or "" to look for the arduino on every port
+        self.probe = None  # Finds the port the arduino answers on, on probe_thread
+        self.probe_thread = None
+        self.registry = None  # Lists the serial ports on registry_thread, started by start_registry()
+        self.registry_thread = None
         self.file_name = None
         self.det_radius = None
         self.detection_range = None
         self.scan = False
         self.iteration = 0
-        self.xrange = 75
+        self.xrange = 75  # Samples per frame, updated from the frames analog_port.ino sends
         # Create Gui Elements ###########
         self.mainbox = QtWidgets.QWidget()
         self.setCentralWidget(self.mainbox)
@@ -130,11 +145,12 @@ class App(QtWidgets.QMainWindow):
         # Set Data  #####################
 
         # Bottom Plot Variables
-        self.theta = np.linspace(np.pi / -2, np.pi / 2, 181)
+        self.polar = polar_transform(1)  # Cached sin/cos tables, one position per degree
         self.radius = [180 for _ in range(181)]
 
-        self.ydata1 = [0, self.radius[0] * np.sin(self.theta[0])]  # Radar scanner line
-        self.xdata1 = [0, self.radius[0] * np.cos(self.theta[0])]  # initialized at (0, radius)
+        x, y = self.polar.point(self.radius[0], 0)  # Radar scanner line
+        self.xdata1 = [0, x]  # initialized at (-radius, 0)
+        self.ydata1 = [0, y]
         self.ydata3 = []
         self.xdata3 = []
         self.ydata5 = []
@@ -148,7 +164,8 @@ class App(QtWidgets.QMainWindow):
         self.threshold = 50
 
         # Top Plot Variables
-        self.ydata = [0 for _ in range(self.xrange)]  # Sets the x range for Top Left Plot
+        self.ydata = RingBuffer(self.xrange)  # Sets the x range for Top Left Plot
+        self.ydata_c = np.empty(0)  # Smoothed frame
         # self.xdata = np.linspace(0, 74, 75)
 
         # self.xdata = self.xdata.reshape((75,75))
@@ -161,11 +178,9 @@ class App(QtWidgets.QMainWindow):
         self.now_then2 = time.time()
 
         # Start  #####################
-        self.timer = QtCore.QTimer()  # Timer for regular scanning
-        self.timer.timeout.connect(self._update)
-
-        self.detection_timer = QtCore.QTimer()  # Timer for object detection
-        self.detection_timer.timeout.connect(self._scanning)
+        # Frames are processed as the reader signals them, by _update or by _scanning for object detection
+        self.mode = None  # 'stream', 'scan' or None while stopped
+        self.profiler = CallbackProfiler("oscillate_profile")  # See Profiler.py
 
         # Connect to Arduino Button
         self.arduino_button = QPushButton("Connect to Arduino")
@@ -202,13 +217,13 @@ class App(QtWidgets.QMainWindow):
         self.obj_det.setMaximumWidth(465)
         self.mainbox.layout().addWidget(self.obj_det, 5, 2)
         self.obj_det.clicked.connect(self.object_detection)
+        self.start_registry()
 
     def object_detection(self):
         try:
-            self.timer.stop()
+            self.stop_mode('stream')
             self.angle = 0  # Start scanning from theta = 0
-            x = str(self.angle) + "\n"
-            self.arduino.write(bytes(x.encode()))  # Move servo to angle
+            self.reader.write_angle(self.angle)  # Move servo to angle
             self.tracking_list_radius = []
             self.tracking_list_azimuth = []
             self.scan = True
@@ -224,24 +239,27 @@ class App(QtWidgets.QMainWindow):
             self.label.setText("Error: " + str(a))
 
     def _scanning(self):
+        for sample in self.reader.pending():
+            if self.mode != 'scan':
+                break
+            self.scanning_frame(sample)
 
+    def scanning_frame(self, sample):
+        """Takes the peak of a frame as the reading at the current angle"""
         if self.angle < (self.det_radius * 10):  # Scan to the preset radius in settings
-            arduinoData = self.arduino.readline().decode('ascii')
-            sensorData = int(arduinoData)
+            sensorData = int(sample.value.max())
             if sensorData > self.threshold:
                 sensorData = self.threshold
-            self.ydata = self.ydata[1:] + [sensorData]
-            self.h2.setData(self.ydata, pen=pg.mkPen('g'))  # Plot distance in Top Left Plot
+            self.ydata.append(sensorData)
+            self.h2.setData(self.ydata.view(), pen=pg.mkPen('g'))  # Plot distance in Top Left Plot
 
             self.radius1.append(sensorData)  # For use in determining threshold
-            self.ydata2 = (sensorData * np.cos(self.theta[self.angle]))  # Polar -> Cartesian y-coordinate
-            self.xdata2 = (sensorData * np.sin(self.theta[self.angle]))  # Polar -> Cartesian x-coordinate
+            self.xdata2, self.ydata2 = self.polar.point(sensorData, self.angle)  # Polar -> Cartesian
             self.ydata3.append(self.ydata2)  # List for y-coordinates
             self.xdata3.append(self.xdata2)  # List for x-coordinates
             self.h4.setData(self.xdata3, self.ydata3)  # Update Bottom Left Plot with data points
             self.angle += 1
-            x = str(self.angle) + "\n"
-            self.arduino.write(bytes(x.encode()))
+            self.reader.write_angle(self.angle)
             self.tracking_list_radius.append(self.xdata2)  # Array of coordinates for further use
             self.tracking_list_azimuth.append(self.ydata2)
         else:
@@ -268,65 +286,215 @@ class App(QtWidgets.QMainWindow):
             self.ydata3 = []
             self.h4.setData(self.xdata3, self.ydata3)
             self.obj_det.setEnabled(True)
-            self.detection_timer.stop()
+            self.stop_mode('scan')
             self.scan = False
             self.object_detection()
 
     def connect_arduino2(self, s):
         try:
             if s == "Success":
-                self.arduino = serial.Serial(self.port_name, 115200, bytesize=8)
-                self.label.setText("Successfully Connected to " + self.port_name)
-                self.arduino_button.setEnabled(True)
+                self.close_reader()
+                name, port = self.probe.take() if self.probe is not None else (None, None)
+                if name is not None:
+                    self.port_name = name  # The port the probe found the arduino on
+                # 1 - create Worker and Thread inside the Form
+                self.reader = SerialReader(self.port_name, 115200, 'analog', record=recording_path(),
+                                           port=port)  # no parent!
+                self.reader_thread = QThread()  # no parent!
+
+                # 2 - Connect Worker`s Signals to Form method slots to post data.
+                self.reader.progress.connect(self.reader_status)
+                self.reader.error.connect(self.reader_error)
+                self.reader.data_ready.connect(self.read_samples)
+
+                # 3 - Move the Worker object to the Thread object
+                self.reader.moveToThread(self.reader_thread)
+
+                # 4 - Connect Worker Signals to the Thread slots
+                self.reader.finished.connect(self.reader_thread.quit)
+
+                # 5 - Connect Thread started signal to Worker operational slot method
+                self.reader_thread.started.connect(self.reader.long_running)
+
+                # 6 - Start the thread
+                self.reader_thread.start()
             else:
                 self.label.setText(s)
+                if s.startswith("Error"):
+                    self.arduino_button.setEnabled(True)
         except Exception as a:
             self.label.setText("Error: " + str(a) + " " + str(self.port_name))
             self.arduino_button.setEnabled(True)
 
+    def reader_status(self, s):
+        if s == "Success":
+            self.label.setText("Successfully Connected to " + str(self.port_name))
+        else:
+            self.label.setText(s)
+            self.reader = None
+        self.arduino_button.setEnabled(True)
+
+    def reader_error(self, s):
+        self.label.setText(s)
+        print("Error With Communications From Arduino")
+        print(s)
+
+    def close_reader(self):
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        if self.reader_thread is not None:
+            self.reader_thread.quit()
+            self.reader_thread.wait()
+            self.reader_thread = None
+
+    def closeEvent(self, event):
+        self.close_reader()
+        self.close_registry()
+        self.close_exporter()
+        self.profiler.stop()
+        super().closeEvent(event)
+
+    def start_registry(self):
+        """Starts the port registry, which lists the serial ports for the Settings window"""
+        # 1 - create Worker and Thread inside the Form
+        self.registry = PortRegistry()  # no parent!
+        self.registry_thread = QThread()  # no parent!
+
+        # 2 - Connect Worker`s Signals to Form method slots to post data.
+        self.registry.changed.connect(self.ports_changed)
+
+        # 3 - Move the Worker object to the Thread object
+        self.registry.moveToThread(self.registry_thread)
+
+        # 4 - Connect Worker Signals to the Thread slots
+        self.registry.finished.connect(self.registry_thread.quit)
+
+        # 5 - Connect Thread started signal to Worker operational slot method
+        self.registry_thread.started.connect(self.registry.long_running)
+
+        # 6 - Start the thread
+        self.registry_thread.start()
+
+    def ports_changed(self, added, removed):
+        """Reports ports plugged in or removed after the first listing"""
+        if self.registry.listings > 1 and added:
+            self.label.setText("Serial port added: " + ", ".join(added))
+        if removed:
+            self.label.setText("Serial port removed: " + ", ".join(removed))
+
+    def close_registry(self):
+        """Stops the port registry and any probe still looking, and closes a
+            port found by a probe that was never used"""
+        self.registry.stop()
+        self.registry_thread.quit()
+        self.registry_thread.wait()
+        if self.probe is not None:
+            self.probe.stop()
+            self.probe_thread.quit()
+            self.probe_thread.wait()
+            name, port = self.probe.take()
+            if port is not None:
+                port.close()
+
     def connect_arduino(self):
-        # Connect to Arduino
+        """Looks for the arduino on a worker thread, on the selected port or on
+            every port when none is selected, see PortProbe. The port it
+            answers on is handed to the reader by connect_arduino2"""
+        self.label.setText("")
         self.arduino_button.setEnabled(False)
+        self.close_reader()  # The probe cannot share the port with a reader
+        if self.port_name:
+            candidates = [self.port_name]
+            writable = candidates  # Sent the byte that starts analog_port.ino, see PortProbe
+        else:
+            candidates = [name for name, description in self.registry.ports() + simulated_ports() + replay_ports()]
+            writable = [name for name, description in simulated_ports()]
         # 1 - create Worker and Thread inside the Form
-        self.obj = SomeObject()  # no parent!
-        self.thread = QThread()  # no parent!
+        self.probe = PortProbe(candidates, 115200, 'analog', writable=writable)  # no parent!
+        self.probe_thread = QThread()  # no parent!
 
         # 2 - Connect Worker`s Signals to Form method slots to post data.
-        self.obj.progress.connect(self.connect_arduino2)
+        self.probe.progress.connect(self.connect_arduino2)
 
         # 3 - Move the Worker object to the Thread object
-        self.obj.moveToThread(self.thread)
+        self.probe.moveToThread(self.probe_thread)
 
         # 4 - Connect Worker Signals to the Thread slots
-        self.obj.finished.connect(self.thread.quit)
+        self.probe.finished.connect(self.probe_thread.quit)
 
         # 5 - Connect Thread started signal to Worker operational slot method
-        self.thread.started.connect(self.obj.long_running)
+        self.probe_thread.started.connect(self.probe.long_running)
 
         # 6 - Start the thread
-        self.thread.start()
+        self.probe_thread.start()
 
     def export(self):
-        self.timer.stop()
-        dlg = ExportDialog(self)
+        """Exports the plots as an image or the newest frame as data without
+            stopping the stream, the export worker writes the files"""
+        dlg = ExportDialog(self, [('plots', "Plots (.png, .jpg, .bmp)"), ('data', "Current frame (.csv, .npz)")])
         if dlg.exec_() == QtWidgets.QDialog.Accepted:
             self.file_name = dlg.file.text()
-            exporter = pg.exporters.ImageExporter(self.canvas.scene())
-            exporter.export(self.file_name)
-            if self.file_name.lower().endswith('.png'):
-                self.label.setText("Successfully saved file as " + self.file_name)
-            else:
-                self.label.setText("Incorrect File Type")
+            kind = dlg.kinds[dlg.kind.currentIndex()]
+            types = DATA_TYPES if kind == 'data' else IMAGE_TYPES
+            if export_type(self.file_name, types) is None:
+                self.label.setText("Incorrect File Type, use " + ", ".join(types))
+                return
+            try:
+                exporter = self.export_worker()
+                if kind == 'plots':
+                    exporter.save_image(self.file_name, self.canvas.grab().toImage())
+                else:
+                    exporter.save_data(self.file_name, {'samples': self.ydata.view().copy(),
+                                                        'smoothed': np.array(self.ydata_c, dtype=float)})
+                self.label.setText("Exporting " + self.file_name)
+            except Exception as a:
+                self.label.setText("Error: " + str(a))
+
+    def export_worker(self):
+        """The export worker, started on first use"""
+        if self.exporter is None:
+            # 1 - create Worker and Thread inside the Form
+            self.exporter = Exporter()  # no parent!
+            self.exporter_thread = QThread()  # no parent!
+
+            # 2 - Connect Worker`s Signals to Form method slots to post data.
+            self.exporter.progress.connect(self.label.setText)
+            self.exporter.error.connect(self.label.setText)
+
+            # 3 - Move the Worker object to the Thread object
+            self.exporter.moveToThread(self.exporter_thread)
+
+            # 4 - Connect Worker Signals to the Thread slots
+            self.exporter.finished.connect(self.exporter_thread.quit)
+
+            # 5 - Connect Thread started signal to Worker operational slot method
+            self.exporter_thread.started.connect(self.exporter.long_running)
+
+            # 6 - Start the thread
+            self.exporter_thread.start()
+        return self.exporter
+
+    def close_exporter(self):
+        """Waits for queued exports to be written"""
+        if self.exporter is not None:
+            self.exporter.stop()
+            self.exporter_thread.quit()
+            self.exporter_thread.wait()
+            self.exporter = None
+            self.exporter_thread = None
 
     def settings(self):
-        self.timer.stop()
-        dlg = CustomDialog(self)
+        self.stop_mode('stream')
+        dlg = CustomDialog(self, self.registry)
+        dlg.set_profiling(self.profiler.armed, self.profiler.budget)
         if dlg.exec_() == QtWidgets.QDialog.Accepted:
-            self.port_name = dlg.port.text()
-            self.threshold = int(dlg.threshold_number.text())
+            self.port_name = dlg.port.currentText()
+            self.threshold = int(dlg.threshold_bound1.text())
             s = int(dlg.limit.text())
             self.set_limits(s)
             self.det_radius = dlg.detection_radius.value()
+            self.profiler.configure(*dlg.profiling_options[dlg.profiling.currentIndex()])
 
     def set_limits(self, s):
 
@@ -343,35 +511,48 @@ class App(QtWidgets.QMainWindow):
         self.detection_range = s
 
     def start_timer(self):
-        self.arduino.write(b'1')
         try:
-            self.arduino.flushInput()
+            self.reader.write(b'1')  # Any byte starts analog_port.ino sending frames
+            self.reader.flush_input()
             if self.scan is False:
-                self.timer.start(1)
+                self.set_mode('stream')
             else:
-                self.detection_timer.start(1)
+                self.set_mode('scan')
         except Exception as a:
             self.label.setText("Error: " + str(a))
             self.label2.setText("Error: No Port detected")
 
     def stop_timer(self):
-        self.timer.stop()
+        self.stop_mode('stream')
         self.obj_det.setEnabled(True)
 
+    def set_mode(self, mode):
+        self.mode = mode
+        if mode is not None:
+            self.read_samples()
+
+    def stop_mode(self, *modes):
+        if self.mode in modes:
+            self.mode = None
+
+    def read_samples(self):
+        """Called through the reader's data_ready signal when frames arrive"""
+        if self.mode == 'stream':
+            self.profiler.call(self._update)
+        elif self.mode == 'scan':
+            self.profiler.call(self._scanning)
+
     def _update(self):
-        for i in range(self.xrange):
-            try:
-                arduinoData = self.arduino.readline().decode('ascii')
-                sensorData = arduinoData.replace("\r\n", "")
-                sensorData = float(arduinoData)
-                if sensorData > self.threshold:
-                    sensorData = self.threshold
-            except Exception as a:
-                self.label.setText(str(a))
-                print("Error With Communications From Arduino")
-                print(str(a))
-                sensorData = 0
-            self.ydata[i] = sensorData
+        # Only the newest frame is drawn, older ones are counted in the frame rate
+        frame = None
+        for sample in self.reader.pending():
+            frame = sample.value
+        if frame is None:
+            return
+        if len(frame) != self.xrange:
+            self.xrange = len(frame)
+            self.ydata = RingBuffer(self.xrange)
+        self.ydata.extend(np.minimum(frame, self.threshold))
         '''with open("datax.txt", 'a+', encoding='utf-8') as f:
             for i in range(len(self.ydata)):
                 f.write(str(self.xdata[i]) + ",")
@@ -386,12 +567,16 @@ class App(QtWidgets.QMainWindow):
         # self.ydata = np.fft.fft(self.ydata)
         # self.ydata = np.real(self.ydata)
         # self.ydata = savgol_filter(self.ydata, 5, 2)
-        self.ydata = np.array(self.ydata)
-        self.h1.setData(self.ydata, pen=pg.mkPen('r'))
-        self.ydata_c = cspline1d(self.ydata, lamb=0.2)
+        ydata = self.ydata.view()
+        self.h1.setData(ydata, pen=pg.mkPen('r'))
+        self.ydata_c = cspline1d(ydata, lamb=0.2)
         self.h2.setData(self.ydata_c, pen=pg.mkPen('r'))
         # self.ydata_g = wiener(self.ydata)
         # self.h9.setData(self.ydata_g, pen=pg.mkPen('r'))
+        decoder = self.reader.decoder
+        tx = 'Frame Rate: {fps:.1f} FPS  {n} Samples Per Frame  Errors: {errors}'.format(
+            fps=self.reader.rate, n=self.xrange, errors=decoder.errors if decoder is not None else 0)
+        self.label3.setText(tx)
 
         # print(self.ydata)
         '''if self.threshold <= sensorData <= self.detection_range:
@@ -474,6 +659,9 @@ class App(QtWidgets.QMainWindow):
 
 if __name__ == '__main__':
     app = QtWidgets.QApplication(sys.argv)
+    simulator = simulate_from_args(sys.argv, 'analog')
+    session_from_args(sys.argv)
     thisapp = App()
+    profile_from_args(sys.argv, thisapp.profiler)
     thisapp.show()
     sys.exit(app.exec_())
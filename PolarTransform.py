@@ -0,0 +1,39 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+class PolarTransform(object):
+    """Sine and cosine tables for 180 * multiplier + 1 servo positions between
+        0 and 180 degrees, built once per angular resolution. A reading at
+        servo angle a lands at x = r * sin(theta), y = r * cos(theta) where
+        theta runs from -90 to 90 degrees"""
+
+    def __init__(self, multiplier):
+        self.multiplier = multiplier
+        self.theta = np.linspace(np.pi / -2, np.pi / 2, 180 * multiplier + 1)
+        self.cos = np.cos(self.theta)
+        self.sin = np.sin(self.theta)
+        # Python float copies, indexing these is much faster than numpy scalars for single points
+        self.cos_list = self.cos.tolist()
+        self.sin_list = self.sin.tolist()
+
+    def index(self, angle):
+        return int(angle * self.multiplier)
+
+    def point(self, distance, angle):
+        """Scalar fast path, returns (x, y) for one reading as Python floats"""
+        i = int(angle * self.multiplier)
+        return distance * self.sin_list[i], distance * self.cos_list[i]
+
+    def sweep(self, angles, ranges):
+        """Batched path, returns (x, y) arrays for whole sweeps of readings"""
+        i = (np.asarray(angles) * self.multiplier).astype(np.intp)
+        ranges = np.asarray(ranges, dtype=float)
+        return ranges * self.sin[i], ranges * self.cos[i]
+
+
+@lru_cache(maxsize=None)
+def polar_transform(multiplier):
+    """Returns the shared PolarTransform for a multiplier, building it on first use"""
+    return PolarTransform(multiplier)
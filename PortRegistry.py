@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from BinaryProtocol import ANALOG_TEXT_BYTES, FrameDecoder, analog_count, analog_frame, is_analog_text
+from SerialSession import open_port
+
+
+def device_snapshot():
+    """Names in /dev, which change whenever a port is plugged in or removed.
+        None where there is no /dev, and the ports are listed every time"""
+    if os.name != 'posix':
+        return None
+    try:
+        return frozenset(os.listdir('/dev'))
+    except OSError:
+        return None
+
+
+class PortRegistry(QObject):
+    """Lists the serial ports on a worker thread and keeps the list up to
+        date, so the Settings window never waits for comports(). The ports
+        are listed once at start up and again whenever /dev changes, which
+        is checked every interval seconds, and changed tells the GUI which
+        ports were plugged in or removed"""
+    changed = pyqtSignal(list, list)  # Devices added and removed
+    finished = pyqtSignal()
+
+    def __init__(self, interval=1.):
+        super(PortRegistry, self).__init__()
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.known = {}  # Device -> description
+        self.listed = threading.Event()  # Set once the first listing is done
+        self.stopping = threading.Event()
+        self.listings = 0
+        self.list_time = 0.  # Of the last listing, in seconds
+
+    @pyqtSlot()
+    def long_running(self):
+        snapshot = None
+        while not self.stopping.is_set():
+            now = device_snapshot()
+            if now is None or now != snapshot or self.listings == 0:
+                snapshot = now
+                try:
+                    self.list_ports()
+                except Exception as a:
+                    print("Error listing ports: " + str(a))
+            self.stopping.wait(self.interval)
+        self.finished.emit()
+
+    def list_ports(self):
+        import serial.tools.list_ports  # Only ever imported on this thread
+
+        start = time.perf_counter()
+        found = {port.device: port.description for port in serial.tools.list_ports.comports()}
+        self.list_time = time.perf_counter() - start
+        with self.lock:
+            added = sorted(set(found) - set(self.known))
+            removed = sorted(set(self.known) - set(found))
+            self.known = found
+        self.listings += 1
+        first = not self.listed.is_set()
+        self.listed.set()
+        if added or removed or first:
+            self.changed.emit(added, removed)
+
+    def ports(self):
+        """(device, description) of every port, from the last listing"""
+        with self.lock:
+            return sorted(self.known.items())
+
+    def stop(self):
+        self.stopping.set()
+
+
+class Handshake(object):
+    """Recognises the first whole reading a port sends in a protocol, the
+        same way SerialReader parses them"""
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.partial = b''
+        self.lines = 0
+        self.decoder = FrameDecoder() if protocol == 'binary' else None
+        self.answered = False
+
+    def feed(self, data):
+        if self.protocol == 'binary':
+            self.answered = len(self.decoder.feed(data)) > 0
+        elif self.protocol == 'analog':
+            if self.decoder is None:
+                self.partial += data
+                count = analog_count(self.partial)
+                if count is None:
+                    # The analog_port.ino that sends text, which SerialReader also reads
+                    self.answered = len(self.partial) >= ANALOG_TEXT_BYTES and is_analog_text(self.partial)
+                    return self.answered
+                self.decoder = FrameDecoder(analog_frame(count))
+                data = self.partial
+                self.partial = b''
+            self.answered = len(self.decoder.feed(data)) > 0
+            if not self.answered and self.decoder.frames == 0 and self.decoder.errors > 8:
+                self.decoder = None  # The first header was corrupt, look for another
+        else:
+            lines = (self.partial + data).split(b'\n')
+            self.partial = lines.pop()
+            for line in lines:
+                self.lines += 1
+                if self.lines == 1:
+                    continue  # May have started part way through
+                try:
+                    float(line.decode('ascii').replace("\r", ""))
+                    self.answered = True
+                except Exception:
+                    pass
+        return self.answered
+
+
+class PortProbe(QObject):
+    """Finds the Arduino among the candidate ports. Each candidate is opened
+        on a thread of its own, all at once, and read until a whole reading
+        arrives. The first to answer is left open for the SerialReader, so
+        the Arduino is not reset by opening it a second time, and the rest
+        are closed. Connecting takes as long as the Arduino does to start
+        sending, there is no fixed wait.
+        analog_port.ino only sends once it has been sent a byte. That byte
+        is only written to the candidates in writable, the port the user
+        picked or simulators started by this process, as writing to every
+        device in /dev to find one is not safe. Other candidates are only
+        listened to.
+        Replays and pyserial URLs have no device to answer and are taken as
+        soon as they open"""
+    progress = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, candidates, baudrate, protocol, timeout=5., writable=()):
+        super(PortProbe, self).__init__()
+        self.candidates = list(candidates)
+        self.baudrate = baudrate
+        self.protocol = protocol
+        self.timeout = timeout  # Seconds each candidate has to answer
+        self.writable = set(writable)  # Candidates that may be sent analog_port.ino's start byte
+        self.lock = threading.Lock()
+        self.done = threading.Event()  # Set when a candidate answers or none are left
+        self.remaining = len(self.candidates)
+        self.errors = {}  # Candidate -> why it was not taken
+        self.port_name = None
+        self.port = None  # Open port of the candidate that answered
+        self.stopped = False  # Set by stop(), no candidate is taken after it
+        self.elapsed = None
+
+    @pyqtSlot()
+    def long_running(self):
+        start = time.perf_counter()
+        if not self.candidates:
+            self.progress.emit("Error: No serial ports found")
+            self.finished.emit()
+            return
+        if len(self.candidates) == 1:
+            self.progress.emit("Connecting to " + str(self.candidates[0]))
+        else:
+            self.progress.emit("Looking for the Arduino on {} ports".format(len(self.candidates)))
+        for name in self.candidates:
+            threading.Thread(target=self.probe, args=(name,), daemon=True).start()
+        self.done.wait()
+        self.elapsed = time.perf_counter() - start
+        if self.stopped:  # Closing, there is no one left to tell
+            self.finished.emit()
+            return
+        if self.port is not None:
+            self.progress.emit("Success")
+        elif len(self.candidates) == 1:
+            with self.lock:
+                error = self.errors.get(self.candidates[0], "No answer")
+            self.progress.emit("Error: " + error + " " + str(self.candidates[0]))
+        elif self.protocol == 'analog' and not self.writable.issuperset(self.candidates):
+            self.progress.emit("Error: No Arduino answered on " + ", ".join(map(str, self.candidates)) +
+                               ", analog_port.ino waits to be sent a byte, select its port in Settings")
+        else:
+            self.progress.emit("Error: No Arduino answered on " + ", ".join(map(str, self.candidates)))
+        self.finished.emit()
+
+    def probe(self, name):
+        port = None
+        try:
+            port = open_port(name, self.baudrate, self.protocol, 0.05)
+            if '://' not in str(name):
+                self.handshake(port, name in self.writable)
+            with self.lock:
+                if self.port is None and not self.stopped:
+                    self.port_name, self.port = name, port
+                    port = None
+                    self.done.set()
+        except Exception as a:
+            with self.lock:
+                self.errors[name] = str(a)
+        finally:
+            if port is not None:
+                try:
+                    port.close()
+                except Exception:
+                    pass
+            with self.lock:
+                self.remaining -= 1
+                if self.remaining == 0:
+                    self.done.set()
+
+    def handshake(self, port, writable=False):
+        """Reads until a whole reading arrives, raises if none does within timeout"""
+        handshake = Handshake(self.protocol)
+        if self.protocol == 'analog' and writable:
+            port.write(b'1')  # Starts analog_port.ino
+        deadline = time.perf_counter() + self.timeout
+        while not handshake.answered:
+            if self.done.is_set():
+                raise RuntimeError("Another port answered first")
+            if time.perf_counter() > deadline:
+                raise RuntimeError("No answer in {:g} s from".format(self.timeout))
+            handshake.feed(port.read(max(1, port.in_waiting)))
+
+    def stop(self):
+        """Stops looking, candidates still being read give up and close their ports"""
+        with self.lock:
+            self.stopped = True
+        self.done.set()
+
+    def take(self):
+        """(name, port) of the candidate that answered, once, or (None, None)"""
+        with self.lock:
+            found = self.port_name, self.port
+            self.port_name, self.port = None, None
+        return found
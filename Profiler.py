@@ -0,0 +1,127 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from PyQt5.QtCore import QTimer
+
+
+class CallbackProfiler(object):
+    """Profiles the GUI thread for a window of seconds, started by hand,
+        armed to start with the next callback, or started whenever a
+        callback takes longer than a budget. Callbacks are run through
+        call(), which only times them when a budget is set.
+        During the window cProfile records every Python call on the GUI
+        thread, the callbacks and the frame clock, repaints and anything
+        else the event loop runs, and a sampling thread records the GUI
+        thread's stack every interval. When the window closes both are
+        written next to each other:
+            <name>-<time>.pstats   for pstats, snakeviz and the like
+            <name>-<time>.folded   collapsed stacks, one per line with
+                                   its sample count, for flamegraph.pl,
+                                   speedscope and the like"""
+
+    def __init__(self, name, window=10., interval=0.005, folder="."):
+        self.name = name
+        self.window = window  # Seconds profiled per capture
+        self.interval = interval  # Between stack samples, in seconds
+        self.folder = folder
+        self.armed = False  # Start with the next callback
+        self.budget = None  # Seconds a callback may take before a capture starts, None to never start one
+        self.captures = 3  # Captures a budget may still start, so a slow run does not fill the disk
+
+        self.profile = None  # cProfile.Profile while capturing
+        self.stacks = Counter()
+        self.thread_id = None  # Of the GUI thread
+        self.sampler = None
+        self.sampling = False
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.stop)
+
+    def configure(self, armed=False, budget=None, window=None):
+        """budget in seconds"""
+        self.armed = armed
+        self.budget = budget
+        if window is not None:
+            self.window = window
+
+    def call(self, function):
+        """Runs a callback, starting a capture if armed or if it goes over budget"""
+        if self.armed:
+            self.armed = False
+            self.start()
+        if self.budget is None:
+            return function()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if elapsed > self.budget and self.profile is None and self.captures > 0:
+            self.captures -= 1
+            print("{} took {:.1f} ms, over the {:g} ms budget, profiling the next {:g} s".format(
+                function.__name__, elapsed * 1e3, self.budget * 1e3, self.window))
+            self.start()
+        return result
+
+    def start(self):
+        """Starts a capture on the calling thread, the GUI thread"""
+        if self.profile is not None:
+            return
+        self.stacks = Counter()
+        self.thread_id = threading.get_ident()
+        self.sampling = True
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        self.timer.start(int(self.window * 1000))
+
+    def stop(self):
+        """Ends the capture and writes it out, returns the path without extension"""
+        if self.profile is None:
+            return None
+        self.profile.disable()
+        self.timer.stop()
+        self.sampling = False
+        self.sampler.join()
+        base = os.path.join(self.folder, "{}-{}".format(self.name, time.strftime("%Y%m%d-%H%M%S")))
+        try:
+            self.profile.dump_stats(base + ".pstats")
+            with open(base + ".folded", 'w') as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write("{} {}\n".format(stack, count))
+            print("Profile written to", base + ".pstats and", base + ".folded")
+        except Exception as a:
+            print("Error writing profile: " + str(a))
+        self.profile = None
+        return base
+
+    def sample(self):
+        """Counts the GUI thread's stack every interval, runs on its own thread"""
+        while self.sampling:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename),
+                                                 code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+
+def profile_from_args(argv, profiler):
+    """Configures profiler from --profile[=SECONDS], which profiles from
+        the first callback, and --profile-budget=MS, which profiles
+        whenever a callback takes longer than MS"""
+    for arg in argv:
+        if arg == '--profile':
+            profiler.armed = True
+        elif arg.startswith('--profile='):
+            profiler.armed = True
+            profiler.window = float(arg.split('=', 1)[1])
+        elif arg.startswith('--profile-budget='):
+            profiler.budget = float(arg.split('=', 1)[1]) / 1000.
@@ -0,0 +1,155 @@
+// Binary protocol variant of Radar_Combined.ino
+// Readings are sent as 15 byte frames and angle commands are received
+// as 7 byte frames, see BinaryProtocol.py for the layout.
+// Select "Binary" as the protocol in the Settings window to use it.
+// Angle commands are queued, and each loop moves to the next queued
+// angle before pinging, so the host can keep several commands in flight
+// and every frame reports the angle and seq it was actually taken at.
+// With the queue empty the servo stays put and readings repeat the
+// seq of the last command.
+#include <Servo.h>
+
+Servo myservo;
+
+int trigPin = 12;  // Trigger
+int echoPin = 11;  // Echo
+long duration;
+float cm;
+unsigned long pingTime;
+
+uint16_t seq = 0;    // Sequence number of the angle command in effect
+uint16_t angle = 0;  // Commanded angle in tenths of a degree
+
+byte command[7];
+byte received = 0;
+
+const byte QUEUE_SIZE = 8;  // More than the host keeps in flight
+uint16_t queuedSeq[QUEUE_SIZE];
+uint16_t queuedAngle[QUEUE_SIZE];
+byte queueHead = 0;
+byte queueCount = 0;
+
+struct __attribute__((packed)) Frame {
+  byte sync[2];
+  uint16_t seq;
+  uint16_t angle;
+  float range;
+  uint32_t time;
+  byte checksum;
+};
+
+void setup() {
+  //Serial Port begin
+  Serial.begin(115200);
+  myservo.attach(9);
+  //Define inputs and outputs
+
+  pinMode(trigPin, OUTPUT);
+  pinMode(echoPin, INPUT);
+}
+
+void sendFrame() {
+  Frame frame;
+  frame.sync[0] = 0xA5;
+  frame.sync[1] = 0x5A;
+  frame.seq = seq;
+  frame.angle = angle;
+  frame.range = cm;
+  frame.time = pingTime;
+
+  // Checksum is the sum of every byte between the sync marker and the checksum
+  byte *bytes = (byte *)&frame;
+  byte sum = 0;
+  for (unsigned int i = 2; i < sizeof(Frame) - 1; i++) {
+    sum += bytes[i];
+  }
+  frame.checksum = sum;
+  Serial.write(bytes, sizeof(Frame));
+}
+
+void readCommands() {
+  // Collects command frames a byte at a time, resynchronising on the sync marker
+  while (Serial.available()) {
+    byte b = Serial.read();
+    if (received == 0 && b != 0xA5) {
+      continue;
+    }
+    if (received == 1 && b != 0x5A) {
+      received = (b == 0xA5) ? 1 : 0;
+      continue;
+    }
+    command[received++] = b;
+    if (received == sizeof(command)) {
+      received = 0;
+      byte sum = command[2] + command[3] + command[4] + command[5];
+      if (sum == command[6] && queueCount < QUEUE_SIZE) {
+        byte tail = (queueHead + queueCount) % QUEUE_SIZE;
+        queuedSeq[tail] = command[2] | (command[3] << 8);
+        queuedAngle[tail] = command[4] | (command[5] << 8);
+        queueCount++;
+      }
+    }
+  }
+}
+
+void nextAngle() {
+  if (queueCount == 0) {
+    return;
+  }
+  seq = queuedSeq[queueHead];
+  angle = queuedAngle[queueHead];
+  queueHead = (queueHead + 1) % QUEUE_SIZE;
+  queueCount--;
+  // Tenths of a degree onto the default 544-2400 us pulse range of the Servo library
+  myservo.writeMicroseconds(map(angle, 0, 1800, 544, 2400));
+  delay(2);  // A half degree step takes the servo about 1.5 ms
+}
+
+void loop() {
+  readCommands();
+  nextAngle();
+
+  // The sensor is triggered by a HIGH pulse of 10 or more microseconds.
+  // Give a short LOW pulse beforehand to ensure a clean HIGH pulse:
+  digitalWrite(trigPin, LOW);
+  delayMicroseconds(5);
+  pingTime = micros();
+  digitalWrite(trigPin, HIGH);
+  delayMicroseconds(10);
+  digitalWrite(trigPin, LOW);
+
+  // Read the signal from the sensor: a HIGH pulse whose
+  // duration is the time (in microseconds) from the sending
+  // of the ping to the reception of its echo off of an object.
+  pinMode(echoPin, INPUT);
+  duration = pulseIn(echoPin, HIGH);
+
+  // Convert the time into a distance
+  cm = (duration / 2) * 0.0343;  // Divide by 29.1 or multiply by 0.0343
+
+  sendFrame();
+
+  if (cm <= 10){
+    delay(2);
+  } else if (cm <= 50) {
+    delay(4);
+  } else if (cm <= 100) {
+    delay(7);
+  } else if (cm <= 150) {
+    delay(9);
+  } else if (cm <= 200) {
+    delay(12);
+  } else if (cm <= 250) {
+    delay(15);
+  } else if (cm <= 300) {
+    delay(18);
+  } else if (cm <= 350) {
+    delay(21);
+  } else if (cm <= 400) {
+    delay(24);
+  } else if (cm <= 450) {
+    delay(27);
+  } else {
+    delay(47);
+  }
+}
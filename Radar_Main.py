@@ -8,30 +8,36 @@ import sys
 import os
 import time
 
-import PyQt5
-import numpy as np
 import pyqtgraph as pg
-import pyqtgraph.exporters
-import serial
-import serial.tools.list_ports
 
-from PyQt5.QtCore import QObject, pyqtSignal, QThread, pyqtSlot, Qt, QEvent
+from PyQt5.QtCore import QThread, Qt
 from PyQt5.QtWidgets import *
-from PyQt5.QtGui import QCursor, QPixmap
 from pyqtgraph.Qt import QtCore, QtWidgets
 from qt_material import apply_stylesheet, list_themes
 
-from SomeObject import SomeObject
-from ExportDialog import ExportDialog
+from SerialReader import SerialReader
+from RingBuffer import RingBuffer
+from SweepBuffer import SweepBuffer, SweepScatter
+from PolarTransform import polar_transform
+from FrameClock import FrameClock
+from ThemeCache import ThemeCache
+from Latency import probes
+from PortRegistry import PortRegistry, PortProbe
+from Profiler import CallbackProfiler, profile_from_args
+from Scanner import Scanner
+from SweepLog import CLEAR, OBJECT
+from LogWriter import LogWriter
 from CustomDialog import CustomDialog
 from MyBar import MyBar
 
-# noinspection PyArgumentList,PyStatementEffect
-stylesheet = list_themes()
+
+def default_theme():
+    """Theme applied at start up, the fourth offered in the Settings window"""
+    return list_themes()[3]
 
 
 # noinspection PyArgumentList
-class App(QtWidgets.QMainWindow):
+class App(QtWidgets.QMainWindow, Scanner):
     def __init__(self, parent=None):
         super(App, self).__init__(parent)
         self.setWindowTitle("Arduino Project")
@@ -42,8 +48,13 @@ class App(QtWidgets.QMainWindow):
         self.setMinimumSize(720, 600)  # To avoid being resized too small
         self.setStyleSheet("""QLabel { font-size: 14pt; } """)
 
-        self.arduino = None
-        self.port_name = None
+        self.reader = None  # Worker that owns the serial port
+        self.reader_thread = None
+        self.port_name = None  # None or "" to look for the arduino on every port
+        self.probe = None  # Finds the port the arduino answers on, on probe_thread
+        self.probe_thread = None
+        self.registry = None  # Lists the serial ports on registry_thread, started by start_registry()
+        self.registry_thread = None
         self.file_name = None
         self.det_radius = None
         self.detection_range = None
@@ -53,7 +64,8 @@ class App(QtWidgets.QMainWindow):
         self.index = None
         self.s = 90
         self.color_index = None
-        self.current_color = stylesheet[0]
+        self.current_color = os.environ.get('QTMATERIAL_THEME') or list_themes()[0]  # Set by apply_stylesheet
+        self.themes = ThemeCache()
         self.prim_col = os.environ['QTMATERIAL_PRIMARYCOLOR']
         self.shif_col = os.environ['QTMATERIAL_SHIFTEDCOLOR']
         self.sec_light_col = os.environ['QTMATERIAL_SECONDARYTEXTCOLOR']
@@ -98,11 +110,9 @@ class App(QtWidgets.QMainWindow):
         self.set_angle.setTickPosition(QSlider.TicksAbove)
         self.set_angle.setMaximumWidth(930)
         self.set_angle.valueChanged.connect(self.static_angle)
-        self.static_timer = QtCore.QTimer()
-        self.static_timer.timeout.connect(self.static_scan)
         self.mainbox.layout().addWidget(self.set_angle, 2, 1, 1, 2)
-        self.x_static = [0 for _ in range(8)]
-        self.y_static = [0 for _ in range(8)]
+        self.x_static = RingBuffer(8)
+        self.y_static = RingBuffer(8)
         self.d_symbol = '\u00b0'
 
         # Connect to Arduino Button
@@ -186,46 +196,101 @@ class App(QtWidgets.QMainWindow):
         # Bottom Right Plot: Radar Image
         self.otherplot3 = self.canvas.addPlot(1, 1)
 
+        # The right hand plots can be hidden in the settings, see checked_plots()
+        self.top_right = True
+        self.bottom_right = True
+
         # Set Data  #####################
 
         # Bottom Plot Variables
-        self.theta = np.linspace(np.pi / -2, np.pi / 2, 180 * self.multiplier + 1)
+        self.polar = polar_transform(self.multiplier)  # Cached sin/cos tables for each servo position
         self.radius = [180 for _ in range(180 * self.multiplier + 1)]
 
-        self.ydata1 = [0, self.radius[0] * np.sin(self.theta[0])]  # Radar scanner line
-        self.xdata1 = [0, self.radius[0] * np.cos(self.theta[0])]  # initialized at (0, radius)
-        self.ydata3 = []
-        self.xdata3 = []
-        self.ydata5 = []
-        self.xdata5 = []
+        x, y = self.polar.point(self.radius[0], 0)  # Radar scanner line
+        self.xdata1 = [0, x]  # initialized at (-radius, 0)
+        self.ydata1 = [0, y]
+        self.sweep3 = SweepBuffer(180 * self.multiplier + 1)  # Points inside the threshold bounds
+        self.sweep5 = SweepBuffer(180 * self.multiplier + 1)  # Points outside the threshold bounds
         self.tracking_list_radius = []
         self.tracking_list_azimuth = []
         self.radius1 = []
 
-        self.angle = 0
+        self.angle = 0  # Angle of the last reading processed
         self.iter = False
         self.threshold = None
+
+        # Angle commands run ahead of the readings, see start_commands()
+        self.pipeline = 4  # Commands kept in flight with the binary protocol
+        self.command_angle = 0
+        self.command_iter = False
+        self.issued = 0
+        self.last_seq = None
+        self.sweep_start = None
+        self.sweep_time = 0.
+
+        # Every sweep and scan is appended to the sweep log, see SweepLog.py
+        self.log_name = "sweeps.radarlog"
+        self.log = None  # Writes logs on log_thread, started with the first sweep
+        self.log_thread = None
+        self.next_sweep = None  # Id of the next sweep in the log
+        self.log_rows = []  # (time, angle, range, x, y, classification) of the sweep in progress
+        self.exporter = None  # Saves exports on exporter_thread, started with the first export
+        self.exporter_thread = None
         self.threshold2 = None
 
         # Top Plot Variables
-        self.ydata = [0 for _ in range(200 * self.multiplier)]  # Sets the x range for Top Left Plot
+        self.ydata = RingBuffer(200 * self.multiplier)  # Sets the x range for Top Left Plot
         self.counter = 0
 
         # For Frame Rate Calculations
-        self.fps = 0.
-        self.lastupdate = time.time()
         self.now_then = time.time()
         self.now_then2 = time.time()
 
-        # Start  #####################
-        self.timer = QtCore.QTimer()  # Timer for regular scanning
-        self.timer.timeout.connect(self._update)
+        # Plots and labels are repainted by the frame clock, not once per sample
+        self.render_rate = 30
+        self.protocol = 'ascii'  # 'binary' for Radar_Binary.ino
+        self.clock = FrameClock(self.render_rate)
+
+        # Latency of each stage from the port to the screen, timed while the overlay is shown, see Latency.py
+        self.latency_name = "latency.txt"  # Appended to when scanning stops
+        self.latency = QtWidgets.QLabel(self.canvas)  # Overlay in the corner of the plots
+        self.latency.setStyleSheet("QLabel { font-family: monospace; font-size: 9pt; color: white;"
+                                   " background-color: rgba(0, 0, 0, 160); padding: 4px; }")
+        self.latency.move(8, 8)
+        self.latency.hide()
+        self.latency_timer = QtCore.QTimer()
+        self.latency_timer.timeout.connect(self.show_latency)
+
+        # Profiles the GUI thread when asked to or when processing readings goes over budget, see Profiler.py
+        self.profiler = CallbackProfiler("radar_profile")
+
+        # Imported where used, as are the simulator, session and export modules
+        from OccupancyGrid import OccupancyGrid
+        from SweepHistory import SweepHistory
+
+        # Detections of every sweep fade out in the top right plot, drawn once per frame
+        self.persistence = 5  # Half life in seconds, 0 turns it off and None never fades
+        self.occupancy = OccupancyGrid(self.s, self.persistence)
+        self.heat = None  # ImageItem of the occupancy grid, made by plot_items()
+        self.clock.frame.connect(self.render_occupancy)
+
+        # Points of the last sweeps in each direction, the right hand plots fade them with age
+        self.history_sweeps = 10
+        self.forward = SweepHistory(self.history_sweeps, 180 * 2 + 1)  # Sweeps towards det_radius, top right
+        self.backward = SweepHistory(self.history_sweeps, 180 * 2 + 1)  # Sweeps back to 0, bottom right
+        self.trail2 = None  # FadingScatter items of the top and bottom right plots, made by plot_items()
+        self.trail3 = None
+        self.clock.frame.connect(self.render_history)
 
-        self.detection_timer = QtCore.QTimer()  # Timer for object detection
-        self.detection_timer.timeout.connect(self._scanning)
+        # Start  #####################
+        # Readings are processed as the reader signals them, by _update for
+        # regular scanning, _scanning for object detection or static_scan
+        self.mode = None  # 'sweep', 'scan', 'static' or None while stopped
 
         # Plot Items
         self.plot_items()
+        self.set_latency(probes.enabled)  # Enabled with --latency
+        self.start_registry()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -257,40 +322,42 @@ class App(QtWidgets.QMainWindow):
             self.multiplier = 1
             self.angle_multiplier = 2
 
-            self.theta = np.linspace(np.pi / -2, np.pi / 2, 180 * self.multiplier + 1)
+            self.polar = polar_transform(self.multiplier)
             self.radius = [180 for _ in range(180 * self.multiplier + 1)]
             self.radius = [self.s for _ in range(180 * self.multiplier + 1)]
-            self.ydata = [0 for _ in range(200 * self.multiplier)]
+            self.ydata = RingBuffer(200 * self.multiplier)
+            self.sweep3 = SweepBuffer(180 * self.multiplier + 1)
+            self.sweep5 = SweepBuffer(180 * self.multiplier + 1)
         elif self.speed1.isChecked() is True:
             self.multiplier = 2
             self.angle_multiplier = 1
 
-            self.theta = np.linspace(np.pi / -2, np.pi / 2, 180 * self.multiplier + 1)
+            self.polar = polar_transform(self.multiplier)
             self.radius = [180 for _ in range(180 * self.multiplier + 1)]
             self.radius = [self.s for _ in range(180 * self.multiplier + 1)]
-            self.ydata = [0 for _ in range(200 * self.multiplier)]
+            self.ydata = RingBuffer(200 * self.multiplier)
+            self.sweep3 = SweepBuffer(180 * self.multiplier + 1)
+            self.sweep5 = SweepBuffer(180 * self.multiplier + 1)
 
     def reset_plots(self):
         """Stops all timers and clears all plots. Functionally a reset button"""
-        self.timer.stop()
+        self.stop_mode('sweep', 'static')
         self.scan = False
         self.obj_det.setEnabled(True)  # Stop Timers
         self.speed1.setEnabled(True)
         self.speed2.setEnabled(True)
-        self.static_timer.stop()
 
+        self.clock.discard()
         self.h1.setData()
         self.h2.setData()
         self.h3.setData()
         self.h4.setData()
-        self.h5.setData()
-        self.h6.setData()  # Clear All Plots
-        self.h7.setData()
-        self.h8.setData()
+        self.clear_history()  # Clear All Plots
         self.h9.setData()
         self.h10.setData()
         self.h_static.setData()
         self.h_static2.setData()
+        self.occupancy.clear()
         self.set_limits(self.s)
 
     def clear_errors(self):
@@ -304,16 +371,15 @@ class App(QtWidgets.QMainWindow):
         try:
             self.stop_timer()
             self.angle = 0  # Start scanning from theta = 0
-            x = str(self.angle) + "\n"
-            self.arduino.write(bytes(x.encode()))  # Move servo to angle
+            self.reader.write_angle(self.angle)  # Move servo to angle
             self.tracking_list_radius = []
             self.tracking_list_azimuth = []
             self.scan = True
             self.speed1.setEnabled(False)
             self.speed2.setEnabled(False)
             self.obj_det.setEnabled(False)  # Disable further user input with button
-            self.xdata3 = []
-            self.ydata3 = []
+            self.sweep3.clear()
+            self.clock.discard()
             self.h1.setData()  # Clear plots Top Left
             self.h3.setData()  # Bottom Left
             self.h4.setData()  # Bottom Left
@@ -330,100 +396,308 @@ class App(QtWidgets.QMainWindow):
         self.obj_det.setEnabled(False)
         self.speed1.setEnabled(False)
         self.speed2.setEnabled(False)
-        if self.angle < (self.det_radius * 10) and self.scan is True:  # Scan to the preset radius in settings
-            arduinoData = self.arduino.readline().decode('ascii')
-            sensorData = float(arduinoData)
-            if sensorData > self.s:
-                sensorData = self.s
-            self.ydata = self.ydata[1:] + [sensorData]
-            self.h2.setData(self.ydata, pen=pg.mkPen(self.prim_col))  # Plot distance in Top Left Plot
-
-            self.radius1.append(sensorData)  # For use in determining threshold
-            self.ydata2 = (sensorData * np.cos(self.theta[int(self.angle * self.multiplier)]))  # Polar -> Cartesian
-            self.xdata2 = (sensorData * np.sin(self.theta[int(self.angle * self.multiplier)]))  # Polar -> Cartesian
-            self.ydata2 = float("{:.2f}".format(self.ydata2))
-            self.xdata2 = float("{:.2f}".format(self.xdata2))
-            self.ydata3.append(self.ydata2)  # List for y-coordinates
-            self.xdata3.append(self.xdata2)  # List for x-coordinates
-            self.h4.setData(self.xdata3, self.ydata3)  # Update Bottom Left Plot with data points
-            self.angle += 0.5 * self.angle_multiplier
-            x = str(self.angle) + "\n"
-            self.arduino.write(bytes(x.encode()))
-            self.tracking_list_radius.append(self.xdata2)  # Array of coordinates for further use
-            self.tracking_list_azimuth.append(self.ydata2)
-        else:
-            self.h9.setData(self.xdata3, self.ydata3)
-            self.h10.setData(self.xdata3, self.ydata3)
-
-            with open("datax.txt", 'a+', encoding='utf-8') as f:
-                for i in range(len(self.tracking_list_radius)):
-                    f.write(str(self.tracking_list_radius[i]) + ",")
-                f.write("\n")
-
-            with open("datay.txt", 'a+', encoding='utf-8)') as f:
-                for i in range(len(self.tracking_list_azimuth)):
-                    f.write(str(self.tracking_list_azimuth[i]) + ",")
-                f.write("\n")
-
-            print("Radius: ", self.tracking_list_radius)
-            print("Azimuth: ", self.tracking_list_azimuth)
-            self.radius1 = []
-            self.xdata3 = []
-            self.ydata3 = []
-            self.h4.setData(self.xdata3, self.ydata3)
-            self.detection_timer.stop()
-            if len(self.tracking_list_radius) == (self.det_radius * 10 * self.multiplier):
-                self.object_detection()
+        angles = []
+        ranges = []
+        for sample in self.reader.pending():
+            if self.angle < (self.det_radius * 10) and self.scan is True:  # Scan to the preset radius in settings
+                if self.accept(sample):
+                    self.scanning_sample(sample)
+                    self.refill_commands(sample)
+                    angles.append(sample.angle)
+                    ranges.append(sample.value)
+            else:
+                break
+        self.add_detections(angles, ranges)
+        if self.angle >= (self.det_radius * 10) or self.scan is False:
+            self.finish_scan()
+
+    def scanning_sample(self, sample):
+        """Plots and records a single reading taken during object detection"""
+        sensorData = sample.value
+        if sensorData > self.s:
+            sensorData = self.s
+        self.ydata.append(sensorData)
+        self.clock.set_data(self.h2, self.ydata.view(), pen=pg.mkPen(self.prim_col))  # Plot distance in Top Left Plot
+
+        self.radius1.append(sensorData)  # For use in determining threshold
+        sensorData, self.xdata2, self.ydata2 = self.scan_reading(sample)  # See Scanner.py
+        self.sweep3.append(self.xdata2, self.ydata2)  # Arrays for x and y-coordinates
+        self.clock.set_data(self.h4, self.sweep3)  # Update Bottom Left Plot with data points
+
+    def finish_scan(self):
+        """Logs the completed object detection sweep and resets for the next one"""
+        if self.top_right:
+            self.clock.set_data(self.h9, *self.sweep3.copy())
+        if self.bottom_right:
+            self.clock.set_data(self.h10, *self.sweep3.copy())
+
+        log = self.log_scan()
+        print("Radius: ", self.tracking_list_radius)
+        print("Azimuth: ", self.tracking_list_azimuth)
+        print(log.stats())
+        self.radius1 = []
+        self.sweep3.clear()
+        self.clock.set_data(self.h4)
+        self.stop_mode('scan')
+        if len(self.tracking_list_radius) == (self.det_radius * 10 * self.multiplier):
+            self.object_detection()
 
     def connect_arduino2(self, s):
-        """Connects to an arduino given a port name"""
+        """Connects to an arduino given a port name by handing the port
+            to a reader worker running in its own thread"""
         try:
             if s == "Success":
-                self.arduino = serial.Serial(self.port_name, 9600, bytesize=8)
-                self.label.setText("Successfully Connected to " + self.port_name)
-                self.arduino_button.setEnabled(True)
+                from SerialSession import recording_path
+
+                self.close_reader()
+                name, port = self.probe.take() if self.probe is not None else (None, None)
+                if name is not None:
+                    self.port_name = name  # The port the probe found the arduino on
+                # 1 - create Worker and Thread inside the Form
+                baudrate = 115200 if self.protocol == 'binary' else 9600
+                self.reader = SerialReader(self.port_name, baudrate, self.protocol, record=recording_path(),
+                                           port=port)  # no parent!
+                self.reader_thread = QThread()  # no parent!
+
+                # 2 - Connect Worker`s Signals to Form method slots to post data.
+                self.reader.progress.connect(self.reader_status)
+                self.reader.error.connect(self.reader_error)
+                self.reader.data_ready.connect(self.read_samples)
+
+                # 3 - Move the Worker object to the Thread object
+                self.reader.moveToThread(self.reader_thread)
+
+                # 4 - Connect Worker Signals to the Thread slots
+                self.reader.finished.connect(self.reader_thread.quit)
+
+                # 5 - Connect Thread started signal to Worker operational slot method
+                self.reader_thread.started.connect(self.reader.long_running)
+
+                # 6 - Start the thread
+                self.reader_thread.start()
             else:
                 self.label.setText(s)
+                if s.startswith("Error"):
+                    self.arduino_button.setEnabled(True)
         except Exception as a:
             self.label.setText("Error: " + str(a) + " " + str(self.port_name))
             self.arduino_button.setEnabled(True)
 
+    def reader_status(self, s):
+        """Reports the result of opening the port in the reader worker"""
+        if s == "Success":
+            self.label.setText("Successfully Connected to " + str(self.port_name))
+        else:
+            self.label.setText(s)
+            self.reader = None
+        self.arduino_button.setEnabled(True)
+
+    def reader_error(self, s):
+        self.label.setText(s)
+        print("Error With Communications From Arduino")
+        print(s)
+
+    def close_reader(self):
+        """Stops the reader worker and waits for it to release the port"""
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        if self.reader_thread is not None:
+            self.reader_thread.quit()
+            self.reader_thread.wait()
+            self.reader_thread = None
+
+    def closeEvent(self, event):
+        self.close_reader()
+        self.close_registry()
+        self.log_sweep()
+        self.dump_latency()
+        self.profiler.stop()
+        self.close_log()
+        self.close_exporter()
+        super().closeEvent(event)
+
+    def log_writer(self):
+        """The log writer worker, started on first use"""
+        if self.log is None:
+            # 1 - create Worker and Thread inside the Form
+            self.log = LogWriter()  # no parent!
+            self.log_thread = QThread()  # no parent!
+
+            # 2 - Connect Worker`s Signals to Form method slots to post data.
+            self.log.error.connect(self.log_error)
+
+            # 3 - Move the Worker object to the Thread object
+            self.log.moveToThread(self.log_thread)
+
+            # 4 - Connect Worker Signals to the Thread slots
+            self.log.finished.connect(self.log_thread.quit)
+
+            # 5 - Connect Thread started signal to Worker operational slot method
+            self.log_thread.started.connect(self.log.long_running)
+
+            # 6 - Start the thread
+            self.log_thread.start()
+        return self.log
+
+    def log_error(self, s):
+        self.label.setText(s)
+        print(s)
+
+    def close_log(self):
+        """Waits for everything queued to be written"""
+        if self.log is not None:
+            self.log.stop()
+            self.log_thread.quit()
+            self.log_thread.wait()
+            print(self.log.stats())
+            self.log = None
+            self.log_thread = None
+
+    def start_registry(self):
+        """Starts the port registry, which lists the serial ports for the Settings window"""
+        # 1 - create Worker and Thread inside the Form
+        self.registry = PortRegistry()  # no parent!
+        self.registry_thread = QThread()  # no parent!
+
+        # 2 - Connect Worker`s Signals to Form method slots to post data.
+        self.registry.changed.connect(self.ports_changed)
+
+        # 3 - Move the Worker object to the Thread object
+        self.registry.moveToThread(self.registry_thread)
+
+        # 4 - Connect Worker Signals to the Thread slots
+        self.registry.finished.connect(self.registry_thread.quit)
+
+        # 5 - Connect Thread started signal to Worker operational slot method
+        self.registry_thread.started.connect(self.registry.long_running)
+
+        # 6 - Start the thread
+        self.registry_thread.start()
+
+    def ports_changed(self, added, removed):
+        """Reports ports plugged in or removed after the first listing"""
+        if self.registry.listings > 1 and added:
+            self.label.setText("Serial port added: " + ", ".join(added))
+        if removed:
+            self.label.setText("Serial port removed: " + ", ".join(removed))
+
+    def close_registry(self):
+        """Stops the port registry and any probe still looking, and closes a
+            port found by a probe that was never used"""
+        self.registry.stop()
+        self.registry_thread.quit()
+        self.registry_thread.wait()
+        if self.probe is not None:
+            self.probe.stop()
+            self.probe_thread.quit()
+            self.probe_thread.wait()
+            name, port = self.probe.take()
+            if port is not None:
+                port.close()
+
     def connect_arduino(self):
-        """Creates a thread to connect to the arduino"""
+        """Looks for the arduino on a worker thread, on the selected port or on
+            every port when none is selected, see PortProbe. The port it
+            answers on is handed to the reader by connect_arduino2"""
         self.clear_errors()
         self.arduino_button.setEnabled(False)
+        self.close_reader()  # The probe cannot share the port with a reader
+        if self.port_name:
+            candidates = [self.port_name]
+        else:
+            from SerialSimulator import simulated_ports
+            from SerialSession import replay_ports
+            candidates = [name for name, description in self.registry.ports() + simulated_ports() + replay_ports()]
         # 1 - create Worker and Thread inside the Form
-        self.obj = SomeObject()  # no parent!
-        self.thread = QThread()  # no parent!
+        self.probe = PortProbe(candidates, 115200 if self.protocol == 'binary' else 9600, self.protocol)  # no parent!
+        self.probe_thread = QThread()  # no parent!
 
         # 2 - Connect Worker`s Signals to Form method slots to post data.
-        self.obj.progress.connect(self.connect_arduino2)
+        self.probe.progress.connect(self.connect_arduino2)
 
         # 3 - Move the Worker object to the Thread object
-        self.obj.moveToThread(self.thread)
+        self.probe.moveToThread(self.probe_thread)
 
         # 4 - Connect Worker Signals to the Thread slots
-        self.obj.finished.connect(self.thread.quit)
+        self.probe.finished.connect(self.probe_thread.quit)
 
         # 5 - Connect Thread started signal to Worker operational slot method
-        self.thread.started.connect(self.obj.long_running)
+        self.probe_thread.started.connect(self.probe.long_running)
 
         # 6 - Start the thread
-        self.thread.start()
+        self.probe_thread.start()
 
     def export(self):
-        """Exports current plots to a png file"""
+        """Exports the plots as an image, the current sweep buffers as data or
+            every sweep in the sweep log as an image sequence. Scanning
+            carries on, only a snapshot is taken here and the export
+            worker writes the files"""
+        from ExportDialog import ExportDialog
+        from Exporter import export_type, IMAGE_TYPES, DATA_TYPES
+
         self.clear_errors()
-        self.stop_timer()
-        dlg = ExportDialog(self)
+        dlg = ExportDialog(self, [('plots', "Plots (.png, .jpg, .bmp)"),
+                                  ('data', "Current sweep data (.csv, .npz)"),
+                                  ('sweeps', "Every logged sweep as an image sequence (.png, .jpg, .bmp)")])
         if dlg.exec_() == QtWidgets.QDialog.Accepted:
             self.file_name = dlg.file.text()
-            exporter = pg.exporters.ImageExporter(self.canvas.scene())
-            exporter.export(self.file_name)
-            if self.file_name.lower().endswith('.png'):
-                self.label.setText("Successfully saved file as " + self.file_name)
-            else:
-                self.label.setText("Incorrect File Type")
+            kind = dlg.kinds[dlg.kind.currentIndex()]
+            types = DATA_TYPES if kind == 'data' else IMAGE_TYPES
+            if export_type(self.file_name, types) is None:
+                self.label.setText("Incorrect File Type, use " + ", ".join(types))
+                return
+            try:
+                exporter = self.export_worker()
+                if kind == 'plots':
+                    exporter.save_image(self.file_name, self.canvas.grab().toImage())
+                elif kind == 'data':
+                    object_x, object_y = self.sweep3.copy()
+                    clear_x, clear_y = self.sweep5.copy()
+                    exporter.save_data(self.file_name, {'object_x': object_x, 'object_y': object_y,
+                                                        'clear_x': clear_x, 'clear_y': clear_y,
+                                                        'range': self.ydata.view().copy()})
+                else:
+                    colors = {'clear': self.prim_col, 'object': self.shif_col}
+                    exporter.save_sweeps(self.log_name, self.file_name, self.s, colors)
+                self.label.setText("Exporting " + self.file_name)
+            except Exception as a:
+                self.label.setText("Error: " + str(a))
+
+    def export_worker(self):
+        """The export worker, started on first use"""
+        if self.exporter is None:
+            from Exporter import Exporter
+
+            # 1 - create Worker and Thread inside the Form
+            self.exporter = Exporter()  # no parent!
+            self.exporter_thread = QThread()  # no parent!
+
+            # 2 - Connect Worker`s Signals to Form method slots to post data.
+            self.exporter.progress.connect(self.label.setText)
+            self.exporter.error.connect(self.log_error)
+
+            # 3 - Move the Worker object to the Thread object
+            self.exporter.moveToThread(self.exporter_thread)
+
+            # 4 - Connect Worker Signals to the Thread slots
+            self.exporter.finished.connect(self.exporter_thread.quit)
+
+            # 5 - Connect Thread started signal to Worker operational slot method
+            self.exporter_thread.started.connect(self.exporter.long_running)
+
+            # 6 - Start the thread
+            self.exporter_thread.start()
+        return self.exporter
+
+    def close_exporter(self):
+        """Waits for queued exports to be written"""
+        if self.exporter is not None:
+            self.exporter.stop()
+            self.exporter_thread.quit()
+            self.exporter_thread.wait()
+            self.exporter = None
+            self.exporter_thread = None
 
     def settings(self):
         """Opens a pop-up modeless dialog box it has options for selecting
@@ -432,8 +706,9 @@ class App(QtWidgets.QMainWindow):
             inputs their customizations and hits ok it then checks that all
             inputs are valid and accepted. If invalid, reopens dialog box"""
         self.stop_timer()
-        dlg = CustomDialog(self)
+        dlg = CustomDialog(self, self.registry)
         dlg.new_theme.connect(self.new_stylesheet)
+        dlg.set_profiling(self.profiler.armed, self.profiler.budget)
         if self.index is not None:
             try:
                 dlg.port.setCurrentIndex(self.index)
@@ -444,6 +719,11 @@ class App(QtWidgets.QMainWindow):
                 dlg.threshold_bound2.setText(str(self.threshold2))
                 dlg.plot1.setChecked(self.plot1)
                 dlg.plot2.setChecked(self.plot2)
+                dlg.render_rate.setCurrentIndex(dlg.render_rates.index(self.render_rate))
+                dlg.protocol.setCurrentIndex(dlg.protocols.index(self.protocol))
+                dlg.persistence.setCurrentIndex(dlg.persistences.index(self.persistence))
+                dlg.history.setCurrentIndex(dlg.histories.index(self.history_sweeps))
+                dlg.latency.setChecked(probes.enabled)
             except Exception as a:
                 print(a)
         else:
@@ -459,6 +739,15 @@ class App(QtWidgets.QMainWindow):
                 self.s = int(dlg.limit.text())
                 self.set_limits(self.s)
                 self.det_radius = dlg.detection_radius.value()
+                self.render_rate = dlg.render_rates[dlg.render_rate.currentIndex()]
+                self.clock.set_rate(self.render_rate)
+                self.protocol = dlg.protocols[dlg.protocol.currentIndex()]
+                self.persistence = dlg.persistences[dlg.persistence.currentIndex()]
+                self.occupancy.half_life = self.persistence
+                self.heat.setVisible(self.persistence != 0)
+                self.set_history(dlg.histories[dlg.history.currentIndex()])
+                self.set_latency(dlg.latency.isChecked())
+                self.profiler.configure(*dlg.profiling_options[dlg.profiling.currentIndex()])
                 if self.s < self.threshold or self.s < self.threshold2:
                     self.clear_errors()
                     self.label3.setText("Error: Threshold Values Out of Range")
@@ -497,81 +786,51 @@ class App(QtWidgets.QMainWindow):
             self.color_index = dlg.colors.currentIndex()
 
     def new_stylesheet(self, f):
+        """Switches to colour theme f. The stylesheet of each theme is built
+            once and the plot items that already exist are recoloured"""
+        if f == self.current_color:
+            return  # The settings dialog selects the current theme when it opens
         self.current_color = f
-        apply_stylesheet(self.titleBar, theme=f)
-        apply_stylesheet(app, theme=f)
+        self.themes.apply(app, f)
         self.prim_col = os.environ['QTMATERIAL_PRIMARYCOLOR']
         self.shif_col = os.environ['QTMATERIAL_SHIFTEDCOLOR']
         self.sec_light_col = os.environ['QTMATERIAL_PRIMARYTEXTCOLOR']
-        self.plot_items()
+        self.plot_colors()
         self.titleBar.setStyleSheet('''QPushButton {{ background-color: {}; }}
                                        QPushButton:hover {{ background-color: {}; }}
                                        QLabel {{ color: {}; }}
         '''.format(self.prim_col, os.environ['QTMATERIAL_PRIMARYLIGHTCOLOR'], self.prim_col))
 
     def checked_plots(self):
-        #Top Plots
-        if self.plot1 is False:
-            # Remove Plots
-            try:
-                self.canvas.removeItem(self.otherplot)
-            except Exception as a:
-                print(a)
-            try:
-                self.canvas.removeItem(self.otherplot2)
-            except Exception as a:
-                print(a)
-
-            # Add it back
-            self.otherplot = self.canvas.addPlot(0, 0, 1, 2)
-
-        elif self.plot1 is True:
-            # Remove Plots
-            try:
-                self.canvas.removeItem(self.otherplot)
-            except Exception as a:
-                print(a)
-            try:
-                self.canvas.removeItem(self.otherplot2)
-            except Exception as a:
-                print(a)
-
-            # Add it back
-            self.otherplot = self.canvas.addPlot(0, 0)
-            self.otherplot2 = self.canvas.addPlot(0, 1)
-
-        # Bottom Plots
-        if self.plot2 is False:
-            # Remove Plots
-            try:
-                self.canvas.removeItem(self.otherplot3)
-            except Exception as a:
-                print(a)
-            try:
-                self.canvas.removeItem(self.otherplot1)
-            except Exception as a:
-                print(a)
-
-            # Add it back
-            self.otherplot1 = self.canvas.addPlot(1, 0, 1, 2)
-
-        elif self.plot2 is True:
-            # Remove Plots
-            try:
-                self.canvas.removeItem(self.otherplot1)
-            except Exception as a:
-                print(a)
-            try:
-                self.canvas.removeItem(self.otherplot3)
-            except Exception as a:
-                print(a)
-
-            # Add it back
-            self.otherplot1 = self.canvas.addPlot(1, 0)
-            self.otherplot3 = self.canvas.addPlot(1, 1)
-        self.plot_items()
+        """Shows or hides the right hand plots as set in the settings. The
+            plots and their items are kept, a hidden plot is only taken out
+            of the layout and the left plot of its row spans both columns.
+            Readings are not added to the plots while they are hidden"""
+        top_right = self.plot1 is not False
+        bottom_right = self.plot2 is not False
+        if top_right != self.top_right:
+            self.top_right = top_right
+            self.place_row(0, self.otherplot, self.otherplot2, top_right)
+        if bottom_right != self.bottom_right:
+            self.bottom_right = bottom_right
+            self.place_row(1, self.otherplot1, self.otherplot3, bottom_right)
+        self.render_history()  # Catch up on what the plots missed while hidden
+        self.render_occupancy()
+
+    def place_row(self, row, left, right, both):
+        layout = self.canvas.ci
+        for plot in (left, right):
+            if plot in layout.items:
+                layout.removeItem(plot)
+        if both:
+            layout.addItem(left, row, 0)
+            layout.addItem(right, row, 1)
+        else:
+            layout.addItem(left, row, 0, 1, 2)
 
     def plot_items(self):
+        from OccupancyGrid import fade_lut
+        from SweepHistory import FadingScatter
 
         def top_left():
             # Top Left
@@ -582,9 +841,14 @@ class App(QtWidgets.QMainWindow):
             self.otherplot.setYRange(0, self.s, padding=0)
 
         def top_right():
-            # Top Right Plot
-            self.h5 = self.otherplot2.plot([], pen=None, symbolBrush=self.shif_col, symbolSize=2, symbolPen=None)
-            self.h6 = self.otherplot2.plot([], pen=None, symbolBrush=self.prim_col, symbolSize=2, symbolPen=None)
+            # Top Right Plot, the occupancy grid goes behind everything else
+            self.heat = pg.ImageItem(axisOrder='row-major')
+            self.heat.setZValue(-100)
+            self.heat_lut = fade_lut(pg.mkColor(self.prim_col).getRgb()[:3])
+            self.place_occupancy()
+            self.otherplot2.addItem(self.heat)
+            self.trail2 = FadingScatter(self.forward, self.point_colors())
+            self.otherplot2.addItem(self.trail2)
             self.h9 = self.otherplot2.plot(pen=self.prim_col)
 
             self.otherplot2.setYRange(0, self.s, padding=0)
@@ -593,16 +857,15 @@ class App(QtWidgets.QMainWindow):
             self.otherplot2.plot([806, -806], [-806, 806], pen=0.5)  # 45 degree line
             self.otherplot2.plot([-806, 806], [-806, 806], pen=0.5)  # 135 degree line
 
-            for r in range(0, 806, 10):
-                circle = pg.QtWidgets.QGraphicsEllipseItem(-r, -r, r * 2, r * 2)
-                circle.setPen(pg.mkPen(0.5))
-                self.otherplot2.addItem(circle)
+            self.otherplot2.addItem(self.range_rings())
 
         def bot_left():
             # Bottom Left Plot
             self.h1 = self.otherplot1.plot(pen=self.prim_col)
-            self.h3 = self.otherplot1.plot([], pen=None, symbolBrush=self.shif_col, symbolSize=2, symbolPen=None)
-            self.h4 = self.otherplot1.plot([], pen=None, symbolBrush=self.prim_col, symbolSize=2, symbolPen=None)
+            self.h3 = SweepScatter(pen=None, brush=self.shif_col, size=2)  # Drawn from sweep3, see SweepBuffer.py
+            self.otherplot1.addItem(self.h3)
+            self.h4 = SweepScatter(pen=None, brush=self.prim_col, size=2)  # sweep5, or sweep3 when scanning
+            self.otherplot1.addItem(self.h4)
             self.h_static = self.otherplot1.plot([], pen=None, symbolBrush=self.prim_col, symbolSize=5, symbolPen=None)
             self.h_static2 = self.otherplot1.plot([], pen=None, symbolBrush=self.shif_col, symbolSize=2, symbolPen=None)
 
@@ -612,15 +875,12 @@ class App(QtWidgets.QMainWindow):
             self.otherplot1.plot([806, -806], [-806, 806], pen=0.5)  # 45 degree line
             self.otherplot1.plot([-806, 806], [-806, 806], pen=0.5)  # 135 degree line
 
-            for r in range(0, 806, 10):  # From 2 to 806 cm at 10 cm intervals
-                circle = pg.QtWidgets.QGraphicsEllipseItem(-r, -r, r * 2, r * 2)
-                circle.setPen(pg.mkPen(0.5))
-                self.otherplot1.addItem(circle)
+            self.otherplot1.addItem(self.range_rings())
 
         def bot_right():
             # Bottom Right Plot
-            self.h7 = self.otherplot3.plot([], pen=None, symbolBrush=self.shif_col, symbolSize=2, symbolPen=None)
-            self.h8 = self.otherplot3.plot([], pen=None, symbolBrush=self.prim_col, symbolSize=2, symbolPen=None)
+            self.trail3 = FadingScatter(self.backward, self.point_colors())
+            self.otherplot3.addItem(self.trail3)
             self.h10 = self.otherplot3.plot(pen=self.prim_col)
 
             self.otherplot3.setYRange(0, self.s, padding=0)
@@ -629,26 +889,41 @@ class App(QtWidgets.QMainWindow):
             self.otherplot3.plot([806, -806], [-806, 806], pen=0.5)  # 45 degree line
             self.otherplot3.plot([-806, 806], [-806, 806], pen=0.5)  # 135 degree line
 
-            for r in range(0, 806, 10):
-                circle = pg.QtWidgets.QGraphicsEllipseItem(-r, -r, r * 2, r * 2)
-                circle.setPen(pg.mkPen(0.5))
-                self.otherplot3.addItem(circle)
-
-        if self.plot1 is None and self.plot2 is None:
-            top_left()
-            top_right()
-            bot_left()
-            bot_right()
-        if self.plot1 is True:
-            top_left()
-            top_right()
-        else:
-            top_left()
-        if self.plot2 is True:
-            bot_left()
-            bot_right()
-        else:
-            bot_left()
+            self.otherplot3.addItem(self.range_rings())
+
+        top_left()
+        top_right()
+        bot_left()
+        bot_right()
+
+    def range_rings(self):
+        """Circles at 10 cm intervals out to 806 cm, as one item rather than
+            one per circle, which was most of the time plot_items() took"""
+        path = pg.QtGui.QPainterPath()
+        for r in range(0, 806, 10):
+            path.addEllipse(-r, -r, r * 2, r * 2)
+        rings = pg.QtWidgets.QGraphicsPathItem(path)
+        rings.setPen(pg.mkPen(0.5))
+        return rings
+
+    def point_colors(self):
+        """Colours of the readings in each classification"""
+        return {OBJECT: self.shif_col, CLEAR: self.prim_col}
+
+    def plot_colors(self):
+        """Recolours the plot items made by plot_items() with the theme colours"""
+        for curve in (self.h1, self.h2, self.h9, self.h10):
+            curve.setPen(self.prim_col)
+        self.h4.setBrush(self.prim_col)
+        self.h_static.setSymbolBrush(self.prim_col)
+        self.h3.setBrush(self.shif_col)
+        self.h_static2.setSymbolBrush(self.shif_col)
+        from OccupancyGrid import fade_lut
+
+        self.heat_lut = fade_lut(pg.mkColor(self.prim_col).getRgb()[:3])
+        self.draw_occupancy()
+        self.trail2.set_colors(self.point_colors())
+        self.trail3.set_colors(self.point_colors())
 
     def set_limits(self, s):
         """Sets limits of each plot according to the maximum range specified
@@ -668,6 +943,10 @@ class App(QtWidgets.QMainWindow):
 
             self.radius = [s for _ in range(180 * self.multiplier + 1)]
             self.detection_range = s
+            if s != self.occupancy.max_range:
+                from OccupancyGrid import OccupancyGrid
+                self.occupancy = OccupancyGrid(s, self.persistence)
+                self.place_occupancy()
         except Exception as a:
             print(a)
             self.otherplot.showGrid(x=True, y=True)
@@ -685,30 +964,29 @@ class App(QtWidgets.QMainWindow):
     def start_timer(self):
         """Starts the timer for the scanning features"""
         self.clear_errors()
-        self.timer.stop()
+        self.stop_mode('sweep', 'static')
         self.obj_det.setEnabled(True)  # Stop Timers
         self.speed1.setEnabled(True)
         self.speed2.setEnabled(True)
-        self.static_timer.stop()
 
+        self.clock.discard()
         self.h1.setData()
         self.h2.setData()
         self.h3.setData()
         self.h4.setData()
-        self.h5.setData()
-        self.h6.setData()  # Clear All Plots
-        self.h7.setData()
-        self.h8.setData()
+        self.clear_history()  # Clear All Plots
         self.h9.setData()
         self.h10.setData()
         self.h_static.setData()
         self.h_static2.setData()
+        probes.reset()  # Latency is reported from the start of each scan
         try:
-            self.arduino.flushInput()
+            self.reader.flush_input()
+            self.start_commands()
             if self.scan is False:
-                self.timer.start(1)
+                self.set_mode('sweep')
             else:
-                self.detection_timer.start(1)
+                self.set_mode('scan')
         except Exception as a:
             self.label.setText("Error: " + str(a))
             self.label2.setText("Error: No Port detected")
@@ -717,185 +995,255 @@ class App(QtWidgets.QMainWindow):
         """Stops all live plotting timers"""
         try:
             self.angle = 0
-            x = str(self.angle) + "\n"
-            self.arduino.write(bytes(x.encode()))  # Move servo to angle
+            self.reader.write_angle(self.angle)  # Move servo to angle
         except Exception as a:
             print(a)
 
-        self.timer.stop()
+        self.stop_mode('sweep', 'static')
         self.obj_det.setEnabled(True)  # Stop Timers
         self.speed1.setEnabled(True)
         self.speed2.setEnabled(True)
-        self.static_timer.stop()
         self.scan = False
+        self.log_sweep()  # Keep what there is of a sweep cut short
+
+        x, y = self.polar.point(self.radius[0], 0)  # Radar scanner line
+        self.xdata1 = [0, x]  # initialized at (-radius, 0)
+        self.ydata1 = [0, y]
+        self.sweep3.clear()
+        self.sweep5.clear()
+        self.dump_latency()
+
+    def set_latency(self, enabled):
+        """Turns the latency probes and their overlay on or off"""
+        if enabled and not probes.enabled:
+            probes.reset()
+        probes.enabled = enabled
+        self.latency.setVisible(enabled)
+        if enabled:
+            self.show_latency()
+            self.latency_timer.start(500)
+        else:
+            self.latency_timer.stop()
+
+    def show_latency(self):
+        self.latency.setText(probes.report())
+        self.latency.adjustSize()
+        self.latency.raise_()
 
-        self.ydata1 = [0, self.radius[0] * np.sin(self.theta[0])]  # Radar scanner line
-        self.xdata1 = [0, self.radius[0] * np.cos(self.theta[0])]  # initialized at (0, radius)
-        self.ydata3 = []
-        self.xdata3 = []
-        self.ydata5 = []
-        self.xdata5 = []
+    def dump_latency(self):
+        """Appends the latency of each stage since the last dump to latency_name"""
+        if not probes.enabled or not any(h.count for h in probes.stages.values()):
+            return
+        self.log_writer().append(self.latency_name, probes.dump().encode('utf-8'))
+        probes.reset()
 
     def static_angle(self):
         """Starts scanning at a stationary angle only"""
         self.label3.setText("")
-        self.timer.stop()
-        self.detection_timer.stop()
+        self.stop_mode('sweep', 'scan')
         self.obj_det.setEnabled(True)
         self.speed1.setEnabled(True)
         self.speed2.setEnabled(True)
         self.scan = False
-        self.xdata3 = []
-        self.ydata3 = []
-        self.xdata5 = []
-        self.ydata5 = []
+        self.sweep3.clear()
+        self.sweep5.clear()
 
+        self.clock.discard()
         self.h1.setData()
         self.h3.setData()
         self.h4.setData()
-        self.h5.setData()
-        self.h6.setData()
-        self.h7.setData()
-        self.h8.setData()
+        self.clear_history()
         self.h9.setData()
         self.h10.setData()
         self.angle = self.set_angle.value()
-        x = str(self.angle) + "\n"
         try:
-            self.arduino.write(bytes(x.encode()))
+            self.reader.write_angle(self.angle)
             self.label.setText("Angle: " + str(self.angle) + self.d_symbol)
+            self.set_mode('static')
         except Exception as a:
             print(a)
             self.label2.setText("Error: Not Connected")
 
-        self.static_timer.start(1)
+    def set_mode(self, mode):
+        """Chooses which function processes readings and catches up on any already queued"""
+        self.mode = mode
+        if mode is not None:
+            self.read_samples()
+
+    def stop_mode(self, *modes):
+        if self.mode in modes:
+            self.mode = None
+
+    def read_samples(self):
+        """Called through the reader's data_ready signal when readings arrive"""
+        if self.mode == 'sweep':
+            self.profiler.call(self._update)
+        elif self.mode == 'scan':
+            self.profiler.call(self._scanning)
+        elif self.mode == 'static':
+            self.profiler.call(self.static_scan)
 
     def static_scan(self):
         """Scanning function that updates live plots"""
         # Read Data From Arduino
-        try:
-            arduinoData = self.arduino.readline().decode('ascii')
-            sensorData = arduinoData.replace("\r\n", "")
-            sensorData = float(sensorData)
-        except Exception as a:
-            self.label.setText(str(a))
-            print("Error With Communications From Arduino")
-            print(str(a))
-            sensorData = 0
+        for sample in self.reader.pending():
+            self.static_sample(sample)
 
-        self.ydata = self.ydata[1:] + [sensorData]
+    def static_sample(self, sample):
+        """Plots a single reading taken at the static angle"""
+        sensorData = sample.value
+        self.ydata.append(sensorData)
 
-        # Line Plot
-        if self.threshold <= sensorData <= self.detection_range or sensorData <= self.threshold2:
-            self.h2.setData(self.ydata, pen=pg.mkPen(self.prim_col))
-        elif self.threshold2 < sensorData < self.threshold:
-            self.h2.setData(self.ydata, pen=pg.mkPen(self.shif_col))
-        self.angle = int(self.angle)
+        # Line Plot, staged for every reading as the view is only valid until the next push
+        line_col = self.shif_col if self.threshold2 < sensorData < self.threshold else self.prim_col
+        self.clock.set_data(self.h2, self.ydata.view(), pen=pg.mkPen(line_col))
         # Bottom Left Plot
-        ydata_static = (sensorData * np.cos(self.theta[int(self.angle * self.multiplier)]))  # Polar -> Cartesian
-        xdata_static = (sensorData * np.sin(self.theta[int(self.angle * self.multiplier)]))  # Polar -> Cartesian
-        ydata_static = float(ydata_static)
-        xdata_static = float(xdata_static)
-        self.x_static = self.x_static[1:] + [xdata_static]
-        self.y_static = self.y_static[1:] + [ydata_static]
-        self.h_static.setData(self.x_static[6:7], self.y_static[6:7])
-        self.h_static2.setData(self.x_static[0:5], self.y_static[0:5])
+        start = probes.start()
+        xdata_static, ydata_static = self.polar.point(sensorData, sample.angle)  # Polar -> Cartesian
+        probes.stop('transform', start)
+        self.x_static.append(xdata_static)
+        self.y_static.append(ydata_static)
+        self.clock.set_data(self.h_static, self.x_static.view()[6:7], self.y_static.view()[6:7])
+        self.clock.set_data(self.h_static2, self.x_static.view()[0:5], self.y_static.view()[0:5])
         string_data = str(sensorData)
         dx = ("Distance: " + string_data + " cm")
-        self.label2.setText(dx)
+        self.clock.set_text(self.label2, dx)
+
+    def add_detections(self, angles, ranges):
+        """Adds a batch of readings to the occupancy grid"""
+        if self.persistence != 0 and self.top_right and angles:
+            self.occupancy.add(angles, ranges)
+            self.clock.request()
+
+    def place_occupancy(self):
+        """Draws the occupancy grid and sizes the image to its range"""
+        r = self.occupancy.max_range
+        self.draw_occupancy()
+        self.heat.setRect(QtCore.QRectF(-r, 0, 2 * r, r))  # Scales by the image size, so after setImage
+        self.heat.setVisible(self.persistence != 0)
+
+    def render_occupancy(self):
+        """Called by the frame clock before each frame"""
+        if self.top_right and self.persistence != 0:
+            self.draw_occupancy()
+
+    def draw_occupancy(self):
+        """Fades the occupancy grid and draws it. Two detections in a cell give full colour"""
+        self.heat.setImage(self.occupancy.image(), autoLevels=False, levels=(0, 2), lut=self.heat_lut)
+
+    def render_history(self):
+        """Draws new points and ages on the right hand plots, called by the frame clock before each frame"""
+        if self.top_right:
+            self.trail2.refresh()
+        if self.bottom_right:
+            self.trail3.refresh()
+
+    def add_history(self, x, y, kind):
+        """Adds a point to the history of the sweep direction, unless its plot is hidden"""
+        if self.iter:
+            if self.bottom_right:
+                self.backward.append(x, y, kind)
+        elif self.top_right:
+            self.forward.append(x, y, kind)
+
+    def clear_history(self):
+        self.forward.clear()
+        self.backward.clear()
+        self.render_history()
+
+    def set_history(self, sweeps):
+        """Keeps the last sweeps in each direction, dropping what was kept"""
+        if sweeps == self.history_sweeps:
+            return
+        from SweepHistory import SweepHistory
+
+        self.history_sweeps = sweeps
+        self.forward = SweepHistory(sweeps, 180 * 2 + 1)
+        self.backward = SweepHistory(sweeps, 180 * 2 + 1)
+        self.trail2.set_history(self.forward)
+        self.trail3.set_history(self.backward)
 
     def _update(self):
         """Scanning function that updates live plot and iterates servo angle
             Also updates labels to display relevant data to user including:
             Mean FPS, Distance to Object, and Time Taken For 1 Sweep"""
-        try:
-            arduinoData = self.arduino.readline().decode('ascii')
-            sensorData = arduinoData.replace("\r\n", "")
-            sensorData = float(sensorData)
-        except Exception as a:
-            self.label.setText(str(a))
-            print("Error With Communications From Arduino")
-            print(str(a))
-            sensorData = 0
-
-        self.ydata = self.ydata[1:] + [sensorData]
+        angles = []
+        ranges = []
+        for sample in self.reader.pending():
+            if self.accept(sample):
+                self.update_sample(sample)
+                self.refill_commands(sample)
+                angles.append(sample.angle)
+                ranges.append(sample.value)
+        if not angles:
+            return
+        self.add_detections(angles, ranges)
+
+        # Render rate of the frame clock is reported separately from the acquisition rate of the reader
+        tx = 'Mean Frame Rate:  {fps:.3f} FPS  Acquisition: {rate:.3f} Hz'.format(fps=self.clock.fps,
+                                                                                rate=self.reader.rate)
+        self.clock.set_text(self.label, tx)
+
+    def update_sample(self, sample):
+        """Plots a single reading taken during a sweep at the angle it was taken at"""
+        sensorData = sample.value
+        self.angle = sample.angle
+        self.ydata.append(sensorData)
+        start = probes.start()
+        x, y = self.polar.point(sensorData, self.angle)
+        probes.stop('transform', start)
+        classification = CLEAR
+        line_col = self.prim_col  # Of the Top Left Plot
 
         if self.threshold <= sensorData <= self.detection_range or sensorData <= self.threshold2:
-            self.h2.setData(self.ydata, pen=pg.mkPen(self.prim_col))
-            self.ydata4 = (sensorData * np.cos(self.theta[int(self.angle * self.multiplier)]))
-
-            self.ydata5.append(self.ydata4)
-            self.xdata4 = (sensorData * np.sin(self.theta[int(self.angle * self.multiplier)]))
-
-            self.xdata5.append(self.xdata4)
-            self.h4.setData(self.xdata5, self.ydata5)
+            self.xdata4, self.ydata4 = x, y
+            self.sweep5.append(self.xdata4, self.ydata4)
+            self.clock.set_data(self.h4, self.sweep5)
+            self.add_history(x, y, CLEAR)
 
         elif self.threshold2 < sensorData < self.threshold:
-            self.h2.setData(self.ydata, pen=pg.mkPen(self.shif_col))
-            self.ydata2 = (sensorData * np.cos(self.theta[int(self.angle * self.multiplier)]))
-
-            self.ydata3.append(self.ydata2)
-            self.xdata2 = (sensorData * np.sin(self.theta[int(self.angle * self.multiplier)]))
-
-            self.xdata3.append(self.xdata2)
-            self.h3.setData(self.xdata3, self.ydata3)
-        if self.angle >= (self.det_radius * 10):
-            self.iter = True
-            self.h5.setData(self.xdata3, self.ydata3)  # Top Right Plot Red
-            self.h6.setData(self.xdata5, self.ydata5)  # Top Right Plot Green
-            self.h3.setData()
-            self.xdata3 = []
-            self.ydata3 = []
-            self.h4.setData()
-            self.xdata5 = []
-            self.ydata5 = []
-        elif self.angle <= 0:
-            self.iter = False
-            self.h7.setData(self.xdata3, self.ydata3)  # Bottom Right Plot Red
-            self.h8.setData(self.xdata5, self.ydata5)  # Bottom Right Plot Green
-            self.h3.setData()
-            self.xdata3 = []
-            self.ydata3 = []
-            self.h4.setData()
-            self.xdata5 = []
-            self.ydata5 = []
-        if self.iter is False:
-            self.angle += 0.5 * self.angle_multiplier
-        else:
-            self.angle -= 0.5 * self.angle_multiplier
-        x = str(self.angle) + "\n"
-        self.arduino.write(bytes(x.encode()))
-
-        self.label3.setText("Angle: " + str(self.angle) + self.d_symbol)
+            line_col = self.shif_col
+            self.xdata2, self.ydata2 = x, y
+            self.sweep3.append(self.xdata2, self.ydata2)
+            self.clock.set_data(self.h3, self.sweep3)
+            self.add_history(x, y, OBJECT)
+            classification = OBJECT
+        # Staged for every reading, even past the detection range, as the view is only valid until the next push
+        self.clock.set_data(self.h2, self.ydata.view(), pen=pg.mkPen(line_col))
+        if self.record_reading(sample, x, y, classification):  # End of a sweep, see Scanner.py
+            if self.iter:
+                self.forward.next_sweep()  # Top Right Plot fades the sweep just finished
+            else:
+                self.backward.next_sweep()  # Bottom Right Plot
+            self.clock.set_data(self.h3)
+            self.sweep3.clear()
+            self.clock.set_data(self.h4)
+            self.sweep5.clear()
 
-        self.ydata1 = [0, self.radius[int(self.angle * self.multiplier)]
-                       * np.cos(self.theta[int(self.angle * self.multiplier)])]
-        self.xdata1 = [0, self.radius[int(self.angle * self.multiplier)]
-                       * np.sin(self.theta[int(self.angle * self.multiplier)])]
+        tx = "Angle: " + str(self.angle) + self.d_symbol + "  Last Sweep: {:.2f} s".format(self.sweep_time)
+        self.clock.set_text(self.label3, tx)
 
-        self.h1.setData(self.xdata1, self.ydata1)
+        x, y = self.polar.point(self.radius[self.polar.index(self.angle)], self.angle)
+        self.xdata1 = [0, x]
+        self.ydata1 = [0, y]
 
-        now = time.time()
-        dt = (now - self.lastupdate)
+        self.clock.set_data(self.h1, self.xdata1, self.ydata1)
 
-        try:
-            fps2 = 1.0 / dt
-        except Exception as a:
-            print(a)
-            fps2 = 1
-            print("Too Fast!")
-        self.lastupdate = now
-        self.fps = self.fps * 0.9 + fps2 * 0.1
-        tx = 'Mean Frame Rate:  {fps:.3f} FPS'.format(fps=self.fps)
-        self.label.setText(tx)
         string_data = str(sensorData)
         dx = ("Distance: " + string_data + " cm")
-        self.label2.setText(dx)
+        self.clock.set_text(self.label2, dx)
 
 
 if __name__ == '__main__':
+    from SerialSimulator import simulate_from_args
+    from SerialSession import session_from_args
+
     app = QtWidgets.QApplication(sys.argv)
-    apply_stylesheet(app, theme=stylesheet[3])
+    simulator = simulate_from_args(sys.argv)
+    session_from_args(sys.argv)
+    probes.enabled = '--latency' in sys.argv  # Times each stage from the start, see Latency.py
+    apply_stylesheet(app, theme=default_theme())
     thisapp = App()
+    profile_from_args(sys.argv, thisapp.profiler)
     thisapp.show()
     sys.exit(app.exec_())
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class RingBuffer(object):
+    """Fixed capacity history of the most recent samples backed by a numpy array.
+        Every value is stored twice, once in each half of the array, so the
+        samples in order from oldest to newest are always one contiguous slice
+        and view() never has to copy"""
+
+    def __init__(self, capacity, dtype=float, fill=0):
+        self.capacity = int(capacity)
+        self.fill = fill
+        self.data = np.full(2 * self.capacity, fill, dtype=dtype)
+        self.index = 0  # Slot of the oldest sample, which the next push overwrites
+
+    def __len__(self):
+        return self.capacity
+
+    def append(self, value):
+        """Pushes one sample, dropping the oldest. O(1) regardless of capacity"""
+        self.data[self.index] = value
+        self.data[self.index + self.capacity] = value
+        self.index += 1
+        if self.index == self.capacity:
+            self.index = 0
+
+    def extend(self, values):
+        """Pushes a batch of samples in one vectorized write"""
+        values = np.asarray(values)[-self.capacity:]
+        n = len(values)
+        if n == 0:
+            return
+        slots = (self.index + np.arange(n)) % self.capacity
+        self.data[slots] = values
+        self.data[slots + self.capacity] = values
+        self.index = (self.index + n) % self.capacity
+
+    def view(self):
+        """Returns the samples from oldest to newest without copying them.
+            The view is only valid until the next push"""
+        return self.data[self.index:self.index + self.capacity]
+
+    def last(self):
+        return self.data[self.index + self.capacity - 1]
+
+    def clear(self):
+        self.data.fill(self.fill)
+        self.index = 0
@@ -0,0 +1,150 @@
+import numpy as np
+
+from Latency import probes
+from SweepLog import SweepLogWriter, make_records, next_sweep, UNCLASSIFIED, CLEAR, OBJECT
+
+
+class Scanner(object):
+    """Sweeps, scans and logging of the radar, without any widgets, shared
+        by the GUI of Radar_Main.py and the command line of Headless.py.
+        Expects the class it is mixed into to set
+            reader              SerialReader of the connected port
+            polar               polar_transform(multiplier)
+            angle, iter         angle of the last reading and the direction of the sweep
+            det_radius          sweeps turn round at det_radius * 10 degrees
+            s                   range readings are clamped to in a scan, in cm
+            angle_multiplier    degrees per step over 0.5
+            threshold, threshold2   bounds of OBJECT readings, or None
+            pipeline, command_angle, command_iter, issued, last_seq
+            sweep_start, sweep_time
+            log_name, next_sweep, log_rows
+            tracking_list_radius, tracking_list_azimuth
+        and to provide log_writer() and log_error(s)"""
+
+    def classify(self, sensorData):
+        """OBJECT inside the threshold bounds, CLEAR outside them"""
+        if self.threshold is None or self.threshold2 is None:
+            return UNCLASSIFIED
+        if self.threshold2 < sensorData < self.threshold:
+            return OBJECT
+        return CLEAR
+
+    def log_sweep(self):
+        """Appends the readings of the sweep that just ended to the sweep log"""
+        rows = self.log_rows
+        self.log_rows = []
+        if len(rows) < 2:
+            return  # Sweeps start and stop at the ends, a lone reading is where the last one left off
+        try:
+            log = self.log_writer()
+            if self.next_sweep is None:
+                self.next_sweep = next_sweep(self.log_name)
+            columns = np.array(rows).T
+            records = make_records(columns[0], self.next_sweep, *columns[1:])
+            log.append(self.log_name, records.tobytes(), SweepLogWriter)
+            self.next_sweep += 1
+        except Exception as a:
+            self.log_error("Error: " + str(a))
+
+    def start_commands(self):
+        """Starts the angle commands for a sweep or scan from the current angle.
+            With the binary protocol the first pipeline commands are written
+            straight away and every reading tells which command it answers.
+            With ASCII the next command is written after each reading"""
+        self.command_angle = self.angle
+        self.command_iter = self.iter
+        self.issued = 0
+        self.last_seq = None
+        self.sweep_start = None
+        if self.reader.protocol == 'binary':
+            for _ in range(self.pipeline):
+                self.next_command()
+        else:
+            self.advance_command()  # The servo is already at self.angle
+
+    def next_command(self):
+        """Writes the next angle command, returns False when a scan has none left"""
+        if self.scan is True and self.command_angle > (self.det_radius * 10):
+            return False
+        self.reader.write_angle(self.command_angle)
+        self.issued += 1
+        self.advance_command()
+        return True
+
+    def advance_command(self):
+        """Steps command_angle on, turning round at the ends of a sweep"""
+        step = 0.5 * self.angle_multiplier
+        if self.scan is True:
+            self.command_angle += step
+            return
+        if self.command_angle >= (self.det_radius * 10):
+            self.command_iter = True
+        elif self.command_angle <= 0:
+            self.command_iter = False
+        if self.command_iter is False:
+            self.command_angle += step
+        else:
+            self.command_angle -= step
+
+    def accept(self, sample):
+        """True if the reading answers a command written since start_commands().
+            The Arduino repeats the last seq while it waits for a command, and
+            readings from before the sweep started are skipped"""
+        if sample.seq is None:
+            return True  # ASCII readings can only be assumed to be at the last angle written
+        if sample.seq == self.last_seq or self.reader.in_flight(sample) >= self.issued:
+            return False
+        self.last_seq = sample.seq
+        return True
+
+    def refill_commands(self, sample):
+        """Tops the commands in flight back up after a reading"""
+        if sample.seq is None:
+            self.next_command()  # Lockstep
+            return
+        while self.reader.in_flight(sample) < self.pipeline:
+            if self.next_command() is False:
+                break
+
+    def time_sweep(self, sample):
+        """Times the sweep that ends at this reading"""
+        if self.sweep_start is not None:
+            self.sweep_time = sample.stamp - self.sweep_start
+        self.sweep_start = sample.stamp
+
+    def record_reading(self, sample, x, y, classification):
+        """Adds a sweep reading to the sweep in progress. At either end of
+            the sweep logs it, turns round and returns True"""
+        self.log_rows.append((sample.stamp, self.angle, sample.value, x, y, classification))
+        if self.angle >= (self.det_radius * 10) or self.angle <= 0:
+            self.time_sweep(sample)
+            self.log_sweep()
+            self.iter = self.angle >= (self.det_radius * 10)
+            return True
+        return False
+
+    def scan_reading(self, sample):
+        """Records a scan reading, returns its range, clamped to s, and its
+            position rounded to the 0.01 cm written to datax.txt and datay.txt"""
+        sensorData = sample.value
+        if sensorData > self.s:
+            sensorData = self.s
+        start = probes.start()
+        x, y = self.polar.point(sensorData, sample.angle)  # Polar -> Cartesian
+        probes.stop('transform', start)
+        x = float("{:.2f}".format(x))
+        y = float("{:.2f}".format(y))
+        self.angle = sample.angle + 0.5 * self.angle_multiplier  # Where the next reading is taken
+        self.tracking_list_radius.append(x)  # Array of coordinates for further use
+        self.tracking_list_azimuth.append(y)
+        self.log_rows.append((sample.stamp, sample.angle, sensorData, x, y, self.classify(sensorData)))
+        return sensorData, x, y
+
+    def log_scan(self):
+        """Appends a completed scan to datax.txt and datay.txt, used by 3D scatter.py,
+            and to the sweep log"""
+        log = self.log_writer()
+        log.append("datax.txt", ("".join(str(v) + "," for v in self.tracking_list_radius) + "\n").encode('utf-8'))
+        log.append("datay.txt", ("".join(str(v) + "," for v in self.tracking_list_azimuth) + "\n").encode('utf-8'))
+        self.log_sweep()
+        return log
@@ -0,0 +1,325 @@
+import os
+import select
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+import serial
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from BinaryProtocol import (ANALOG_TEXT_BYTES, ANALOG_TEXT_SAMPLES, FrameDecoder, analog_count, analog_frame,
+                            encode_command, is_analog_text)
+from Latency import probes
+from SerialSession import SessionRecorder, open_port
+
+# stamp is time.time() on the host when the reading arrived and device_time is
+# micros() on the Arduino when the ping was sent. The binary protocol reports
+# the angle and seq of the command the reading was taken at. The ASCII protocol
+# cannot, so angle is the last angle written and seq and device_time are None.
+# With the analog protocol value is a whole frame of analogRead() values
+Sample = namedtuple('Sample', ['stamp', 'value', 'angle', 'seq', 'device_time'])
+
+FLUSH = None  # Marks where flush_input() was called in the command queue
+
+
+class SerialReader(QObject):
+    """Owns the serial port and reads from it continuously on a worker thread.
+        Every reading is handed to the GUI as a Sample through the samples
+        queue, and commands for the Arduino are written from the same thread
+        so the GUI never blocks on the port. The protocol is either 'ascii',
+        one reading per line, or 'binary', the frames of BinaryProtocol.py
+        sent by Radar_Binary.ino, or 'analog', the frames of analogRead()
+        values sent by analog_port.ino, queued a frame at a time. Boards
+        still running the analog_port.ino that printed each value on a line
+        are read 75 lines to a frame, and error asks for it to be reflashed.
+        The worker sleeps in select() until the port has data or there is a
+        command to write, and data_ready tells the GUI when samples arrive,
+        so nothing polls while the link is quiet.
+        Given a record path, everything read, written and flushed is saved
+        as a session that ReplayPort can play back, see SerialSession.py.
+        Given a port, already opened by PortProbe, it is read instead of
+        opening port_name again"""
+    progress = pyqtSignal(str)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+    data_ready = pyqtSignal()  # Emitted once per batch of samples until pending() is called
+
+    def __init__(self, port_name, baudrate=9600, protocol='ascii', timeout=0.05, maxlen=4096, record=None,
+                 port=None):
+        super(SerialReader, self).__init__()
+        self.port_name = port_name
+        self.baudrate = baudrate
+        self.protocol = protocol
+        self.timeout = timeout  # Read timeout for ports select() cannot wait on, such as loop://
+        self.arduino = port
+        self.running = False
+        self.fd = None  # File descriptor of the port, None if it has none
+        self.wakeup = None  # Pipe that wakes the worker from select() when commands are queued
+        self.wakeup_lock = threading.Lock()  # The GUI may be writing to the pipe as the worker closes it
+        self.notified = False
+        self.record = record
+        self.recorder = None
+
+        self.samples = deque(maxlen=maxlen)  # Oldest samples are dropped if the GUI falls behind
+        self.commands = deque()  # (bytes, angle) pairs, angle is None for anything else
+        self.partial = b''
+        # Analog frame length is read from the first header
+        self.decoder = FrameDecoder() if protocol == 'binary' else None
+        self.text_values = []  # Of the analog frame in progress, when analog_port.ino sends text
+        self.seq = 0  # Sequence number of the last angle command queued
+        self.angle = 0  # Last angle written to the port
+
+        # For Acquisition Rate Calculations
+        self.rate = 0.
+        self.count = 0
+        self.lastupdate = time.time()
+
+    @pyqtSlot()
+    def long_running(self):
+        """Opens the port and reads until stop() is called"""
+        try:
+            if self.arduino is None:
+                self.arduino = open_port(self.port_name, self.baudrate, self.protocol, self.timeout)
+            if self.record is not None:
+                self.recorder = SessionRecorder(self.record, self.protocol, self.baudrate)
+                print("Recording", self.port_name, "to", self.recorder.path)
+        except Exception as a:
+            self.progress.emit("Error: " + str(a) + " " + str(self.port_name))
+            self.finished.emit()
+            return
+        if getattr(self.arduino, 'lossless', False):
+            self.samples = deque()  # Replaying as fast as possible, the GUI sets the pace
+
+        try:
+            self.fd = self.arduino.fileno()
+            self.wakeup = os.pipe()
+            os.set_blocking(self.wakeup[1], False)
+        except Exception:
+            self.fd = None  # Reads block for up to timeout instead, and cancel_read() wakes them where supported
+
+        self.running = True
+        self.progress.emit("Success")
+        while self.running:
+            try:
+                self.write_pending()
+                if self.wait_for_data() is False:
+                    continue
+                start = probes.start()
+                data = self.read_port()
+                probes.stop('read', start)
+                if not data:
+                    continue
+                start = probes.start()
+                if self.protocol == 'binary':
+                    self.parse_frames(data)
+                elif self.protocol == 'analog':
+                    self.parse_analog(data)
+                elif self.protocol == 'analog_text':
+                    self.parse_analog_text(data)
+                else:
+                    self.parse_lines(data)
+                probes.stop('parse', start)
+            except Exception as a:
+                self.error.emit(str(a))
+                time.sleep(self.timeout)
+        try:
+            self.arduino.close()
+            if self.recorder is not None:
+                self.recorder.close()
+        except Exception as a:
+            print(a)
+        with self.wakeup_lock:
+            if self.wakeup is not None:
+                os.close(self.wakeup[0])
+                os.close(self.wakeup[1])
+                self.wakeup = None
+        self.finished.emit()
+
+    def wait_for_data(self):
+        """Sleeps until the port is readable, returning False if woken for anything else"""
+        if self.fd is None:
+            return True
+        ready, _, _ = select.select([self.fd, self.wakeup[0]], [], [])
+        if self.wakeup[0] in ready:
+            os.read(self.wakeup[0], 4096)
+        return self.fd in ready
+
+    def wake(self):
+        """Interrupts wait_for_data() or a blocking read in the worker"""
+        with self.wakeup_lock:
+            try:
+                if self.wakeup is not None:
+                    os.write(self.wakeup[1], b'x')
+                elif self.arduino is not None:
+                    self.arduino.cancel_read()
+            except Exception:
+                pass  # Already awake if the pipe is full
+
+    def read_port(self):
+        """Reads everything waiting on the port, blocking for at most timeout when idle"""
+        data = self.arduino.read(max(1, self.arduino.in_waiting))
+        if data and self.recorder is not None:
+            self.recorder.read(data)
+        return data
+
+    def parse_lines(self, data):
+        """Queues every complete line in data"""
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()  # Part of a line still on its way
+        if not lines:
+            return
+
+        now = time.time()
+        for line in lines:
+            try:
+                sensorData = float(line.decode('ascii').replace("\r", ""))
+            except Exception as a:
+                self.error.emit(str(a))
+                print("Error With Communications From Arduino")
+                sensorData = 0
+            self.samples.append(Sample(now, sensorData, self.angle, None, None))
+        self.count_samples(now, len(lines))
+        self.notify()
+
+    def parse_frames(self, data):
+        """Queues every frame in data"""
+        now = time.time()
+        frames = self.decoder.feed(data)
+        if len(frames) == 0:
+            return
+        ranges = np.round(frames['range'].astype(float), 2)  # Same precision as Serial.print(cm)
+        angles = frames['angle'] / 10.
+        self.samples.extend(Sample(now, *fields) for fields in zip(ranges.tolist(), angles.tolist(),
+                                                                    frames['seq'].tolist(),
+                                                                    frames['time'].tolist()))
+        self.count_samples(now, len(frames))
+        self.notify()
+
+    def parse_analog(self, data):
+        """Queues every analog frame in data"""
+        if self.decoder is None:
+            self.partial += data
+            count = analog_count(self.partial)
+            if count is None:
+                if len(self.partial) >= ANALOG_TEXT_BYTES and is_analog_text(self.partial):
+                    self.protocol = 'analog_text'
+                    self.error.emit("analog_port.ino on " + str(self.port_name) + " is sending text, reflash it "
+                                    "to send frames. Reading " + str(ANALOG_TEXT_SAMPLES) + " lines to a frame")
+                    self.parse_analog_text(b'')
+                return
+            self.decoder = FrameDecoder(analog_frame(count))
+            data = self.partial
+            self.partial = b''
+        now = time.time()
+        frames = self.decoder.feed(data)
+        if len(frames) == 0:
+            if self.decoder.frames == 0 and self.decoder.errors > 8:
+                self.decoder = None  # The first header was corrupt, look for another
+            return
+        self.samples.extend(Sample(now, values, None, seq, micros)
+                            for values, seq, micros in zip(frames['samples'], frames['seq'].tolist(),
+                                                           frames['time'].tolist()))
+        self.count_samples(now, len(frames))
+        self.notify()
+
+    def parse_analog_text(self, data):
+        """Queues the values of the text analog_port.ino, ANALOG_TEXT_SAMPLES lines to a frame.
+            Without a sync marker a frame may start part way through a ping"""
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        for line in lines:
+            try:
+                self.text_values.append(int(line))
+            except ValueError as a:
+                self.error.emit(str(a))
+                self.text_values.append(0)
+        frames = len(self.text_values) // ANALOG_TEXT_SAMPLES
+        if frames == 0:
+            return
+        now = time.time()
+        for i in range(frames):
+            values = self.text_values[i * ANALOG_TEXT_SAMPLES:(i + 1) * ANALOG_TEXT_SAMPLES]
+            self.samples.append(Sample(now, np.array(values, dtype=np.uint16), None, None, None))
+        del self.text_values[:frames * ANALOG_TEXT_SAMPLES]
+        self.count_samples(now, frames)
+        self.notify()
+
+    def notify(self):
+        if self.notified is False:
+            self.notified = True
+            self.data_ready.emit()
+
+    def count_samples(self, now, n):
+        dt = now - self.lastupdate
+        if dt > 0:
+            self.rate = self.rate * 0.9 + (n / dt) * 0.1
+        self.lastupdate = now
+        self.count += n
+
+    def write_pending(self):
+        while self.commands:
+            data, angle = self.commands.popleft()
+            if data is FLUSH:
+                self.arduino.reset_input_buffer()
+                if self.recorder is not None:
+                    self.recorder.flush()
+                self.partial = b''
+                self.text_values = []
+                if self.protocol == 'analog':
+                    self.decoder = None
+                elif self.decoder is not None:
+                    self.decoder.reset()
+                self.samples.clear()
+                continue
+            self.arduino.write(data)
+            if self.recorder is not None:
+                self.recorder.write(data)
+            if angle is not None:
+                self.angle = angle
+
+    def write(self, data, angle=None):
+        """Queues bytes to be written to the Arduino by the worker thread"""
+        self.commands.append((data, angle))
+        self.wake()
+
+    def write_angle(self, angle):
+        """Queues a servo angle command in the format of the protocol in use
+            and returns its sequence number"""
+        self.seq = (self.seq + 1) & 0xffff
+        if self.protocol == 'binary':
+            self.write(encode_command(self.seq, angle), angle)
+        else:
+            x = str(angle) + "\n"
+            self.write(bytes(x.encode()), angle)
+        return self.seq
+
+    def in_flight(self, sample):
+        """Number of angle commands queued after the one sample was taken at"""
+        return (self.seq - sample.seq) & 0xffff
+
+    def flush_input(self):
+        """Discards everything received so far, on the port and in the queue.
+            Commands queued before this are still written, in order"""
+        if self.arduino is None:
+            raise serial.SerialException("Port " + str(self.port_name) + " is not open")
+        # Cleared before the worker can act on FLUSH, clearing after could lose readings taken since
+        self.samples.clear()
+        self.notified = False
+        self.write(FLUSH)
+
+    def pending(self):
+        """Yields the samples queued since the last call, oldest first"""
+        self.notified = False  # Samples queued from here on emit data_ready again
+        while self.samples:
+            try:
+                sample = self.samples.popleft()
+            except IndexError:
+                return
+            if probes.enabled:
+                probes.add('queue', time.time() - sample.stamp)
+            yield sample
+
+    def stop(self):
+        self.running = False
+        self.wake()
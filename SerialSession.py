@@ -0,0 +1,333 @@
+##################################################################
+# Recording and replay of the raw serial stream
+# A session records every chunk of bytes SerialReader read from the
+# port, every command it wrote and every flush_input(), with the time
+# each happened. A 64 byte header is followed by chunks of
+#   time    float64  time.time() when the bytes were read or written
+#   kind    uint8    READ, WRITE or FLUSH
+#   length  uint32   number of bytes that follow
+# ReplayPort opens in place of a serial port and gives the recorded
+# bytes back to SerialReader, so they go through the same decoding and
+# the same _update/_scanning/static_scan as they did live. What the
+# Arduino sent in answer to a command is only given back once the GUI
+# has written that command, so commands and readings pair up as they
+# did when recorded, at real time, N times real time or as fast as
+# the GUI can take them.
+#
+# Record:   python Radar_Main.py --record=session.radarsession
+# Replay:   python Radar_Main.py --playback=session.radarsession --speed=4
+#           then pick the replay port in Settings, --speed=max for no delays
+# Summary:  python SerialSession.py session.radarsession
+##################################################################
+
+import os
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+import serial
+
+MAGIC = b'RADARSES'
+VERSION = 1
+SCHEME = 'replay://'  # Port names that open a ReplayPort, replay://path@speed
+
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u2'), ('header_size', '<u2'), ('protocol', 'S8'),
+                   ('baudrate', '<u4'), ('created', '<f8'), ('reserved', 'V32')])
+CHUNK = struct.Struct('<dBI')  # time, kind, length, packed with struct as one is written per read
+
+# Chunk kinds
+READ = 0  # Bytes read from the port
+WRITE = 1  # Bytes written to the port
+FLUSH = 2  # flush_input() discarded the input buffer
+
+recording = []  # Paths given with --record, ports opened in this process are recorded to the first
+playbacks = []  # (port name, description) of sessions given with --playback, listed in the Settings window
+
+
+def unused_path(path):
+    """path, or path with a number added if it already exists, so a second
+        connection does not overwrite the first recording"""
+    root, ext = os.path.splitext(path)
+    n = 1
+    while os.path.exists(path):
+        n += 1
+        path = root + "-" + str(n) + ext
+    return path
+
+
+class SessionRecorder(object):
+    """Writes a session file. Called from the reader thread, writes are buffered"""
+
+    def __init__(self, path, protocol, baudrate):
+        self.path = unused_path(path)
+        self.file = open(self.path, 'wb', buffering=1 << 16)
+        header = np.zeros(1, dtype=HEADER)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['header_size'] = HEADER.itemsize
+        header['protocol'] = protocol.encode('ascii')
+        header['baudrate'] = baudrate
+        header['created'] = time.time()
+        self.file.write(header.tobytes())
+        self.chunks = 0
+
+    def add(self, kind, data=b'', now=None):
+        self.file.write(CHUNK.pack(time.time() if now is None else now, kind, len(data)))
+        self.file.write(data)
+        self.chunks += 1
+
+    def read(self, data, now=None):
+        self.add(READ, data, now)
+
+    def write(self, data):
+        self.add(WRITE, data)
+
+    def flush(self):
+        self.add(FLUSH)
+
+    def close(self):
+        self.file.close()
+
+
+def read_session(path):
+    """(header, chunks) of a session file, chunks as (time, kind, bytes).
+        A chunk cut short by a crash is left out"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if len(raw) < HEADER.itemsize:
+        raise ValueError(path + " is too short to be a session")
+    header = np.frombuffer(raw[:HEADER.itemsize], dtype=HEADER)[0]
+    if header['magic'] != MAGIC:
+        raise ValueError(path + " is not a session")
+    if header['version'] != VERSION:
+        raise ValueError(path + " is version " + str(header['version']) + ", expected " + str(VERSION))
+    chunks = []
+    offset = int(header['header_size'])
+    while offset + CHUNK.size <= len(raw):
+        stamp, kind, length = CHUNK.unpack_from(raw, offset)
+        offset += CHUNK.size
+        if offset + length > len(raw):
+            break
+        chunks.append((stamp, kind, raw[offset:offset + length]))
+        offset += length
+    return header, chunks
+
+
+class ReplayPort(object):
+    """Stands in for a serial port and gives back the bytes of a recorded
+        session. Each READ chunk is held back until the GUI has written as
+        many commands and flushes as had been written before it was read,
+        and at a finite speed until as long after the replay started as
+        it was read after the recording started, divided by speed.
+        speed None replays as fast as the GUI takes the bytes.
+        Commands written are only counted and compared with the recording"""
+
+    def __init__(self, path, speed=1.):
+        self.path = path
+        self.speed = speed
+        header, chunks = read_session(path)
+        self.protocol = header['protocol'].decode('ascii')
+        self.baudrate = int(header['baudrate'])
+
+        # READ chunks as (gate, due, bytes), gate is the number of host events before it
+        self.reads = []
+        self.events = []  # (kind, bytes) of every WRITE and FLUSH recorded
+        first = chunks[0][0] if chunks else 0.
+        for stamp, kind, data in chunks:
+            if kind == READ:
+                due = (stamp - first) / speed if speed else 0.
+                self.reads.append((len(self.events), due, data))
+            else:
+                self.events.append((kind, data))
+
+        self.lock = threading.Condition()
+        self.buffer = bytearray()  # Bytes released and not read yet
+        self.next_read = 0  # Index of the next READ chunk to release
+        self.host_events = 0  # Writes and flushes made by the GUI so far
+        self.diverged = 0  # Host events that differ from the recording
+        self.bytes_read = 0
+        self.start = time.time()
+        self.running = True
+        self.is_open = True
+        self.notify = os.pipe()  # Readable while buffer holds bytes, for select()
+        os.set_blocking(self.notify[1], False)
+        self.signalled = False
+        self.clock = None
+        if speed:
+            self.clock = threading.Thread(target=self.run, daemon=True)
+            self.clock.start()
+        with self.lock:
+            self.release()
+
+    @property
+    def lossless(self):
+        """True when the reader should queue everything rather than drop what the GUI has not taken"""
+        return not self.speed
+
+    @property
+    def finished(self):
+        """True once every recorded byte has been read"""
+        return self.next_read == len(self.reads) and not self.buffer
+
+    def release(self):
+        """Moves the chunks that may be read now into the buffer, called holding lock"""
+        now = time.time() - self.start
+        while self.next_read < len(self.reads):
+            gate, due, data = self.reads[self.next_read]
+            if gate > self.host_events or due > now:
+                break
+            self.buffer += data
+            self.next_read += 1
+        if self.buffer and self.signalled is False:
+            os.write(self.notify[1], b'x')
+            self.signalled = True
+
+    def run(self):
+        """Releases chunks as they fall due when replaying at a finite speed"""
+        with self.lock:
+            while self.running and self.next_read < len(self.reads):
+                self.release()
+                if self.next_read == len(self.reads):
+                    break
+                gate, due, data = self.reads[self.next_read]
+                if gate > self.host_events:
+                    self.lock.wait()  # Until the GUI writes
+                else:
+                    self.lock.wait(max(0., due - (time.time() - self.start)))
+
+    def host_event(self, kind, data=b''):
+        if self.host_events >= len(self.events) or self.events[self.host_events] != (kind, data):
+            self.diverged += 1
+        self.host_events += 1
+        self.release()
+        self.lock.notify()
+
+    def fileno(self):
+        return self.notify[0]
+
+    @property
+    def in_waiting(self):
+        return len(self.buffer)
+
+    def read(self, size=1):
+        with self.lock:
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            self.bytes_read += len(data)
+            if not self.buffer and self.signalled:
+                os.read(self.notify[0], 1)
+                self.signalled = False
+            return data
+
+    def write(self, data):
+        with self.lock:
+            self.host_event(WRITE, bytes(data))
+        return len(data)
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.buffer.clear()
+            if self.signalled:
+                os.read(self.notify[0], 1)
+                self.signalled = False
+            self.host_event(FLUSH)
+
+    def cancel_read(self):
+        pass
+
+    def stats(self):
+        return ("Replay of {path}: {done} of {total} chunks, {mb:.2f} MB read in {elapsed:.2f} s  "
+                "{events} host events, {diverged} differ from the recording").format(
+            path=self.path, done=self.next_read, total=len(self.reads), mb=self.bytes_read / 1e6,
+            elapsed=time.time() - self.start, events=self.host_events, diverged=self.diverged)
+
+    def close(self):
+        if self.is_open is False:
+            return
+        with self.lock:
+            self.running = False
+            self.is_open = False
+            self.lock.notify()
+        if self.clock is not None:
+            self.clock.join()
+        os.close(self.notify[0])
+        os.close(self.notify[1])
+        print(self.stats())
+
+
+def replay_url(path, speed=1.):
+    return SCHEME + path + "@" + ("max" if not speed else "{:g}".format(speed))
+
+
+def parse_url(port_name):
+    """(path, speed) of a replay port name"""
+    path, at, speed = port_name[len(SCHEME):].rpartition('@')
+    if not at:
+        return speed, 1.  # No speed given, rpartition leaves the whole name in speed
+    return path, None if speed == 'max' else float(speed)
+
+
+def open_port(port_name, baudrate, protocol, timeout):
+    """Opens a serial port, pyserial URL or replay port"""
+    if str(port_name).startswith(SCHEME):
+        port = ReplayPort(*parse_url(port_name))
+        if port.protocol != protocol:
+            port.close()
+            raise serial.SerialException("The session was recorded with the " + port.protocol +
+                                         " protocol, select it in Settings")
+        return port
+    # serial_for_url also accepts pyserial URLs such as loop:// for testing without hardware
+    return serial.serial_for_url(port_name, baudrate, bytesize=8, timeout=timeout)
+
+
+def recording_path():
+    """Where to record ports opened in this process, None if not recording"""
+    return recording[0] if recording else None
+
+
+def replay_ports():
+    """(name, description) of the sessions given with --playback"""
+    return list(playbacks)
+
+
+def session_from_args(argv):
+    """Handles --record=PATH, and --playback=PATH with --speed=N or --speed=max.
+        Returns the replay port name, or None"""
+    speed = 1.
+    playback = None
+    for arg in argv:
+        if arg.startswith('--record='):
+            recording.append(arg.split('=', 1)[1])
+            print("Recording sessions to", recording[0])
+        elif arg.startswith('--playback='):
+            playback = arg.split('=', 1)[1]
+        elif arg.startswith('--speed='):
+            value = arg.split('=', 1)[1]
+            speed = None if value == 'max' else float(value)
+    if playback is None:
+        return None
+    url = replay_url(playback, speed)
+    playbacks.append((url, "Replay of " + os.path.basename(playback) +
+                      (" as fast as possible" if not speed else " at {:g}x".format(speed))))
+    print("Replay port:", url)
+    return url
+
+
+def main(argv):
+    if len(argv) != 1:
+        print("Usage: python SerialSession.py file.radarsession")
+        return
+    header, chunks = read_session(argv[0])
+    kinds = [kind for stamp, kind, data in chunks]
+    size = sum(len(data) for stamp, kind, data in chunks if kind == READ)
+    length = chunks[-1][0] - chunks[0][0] if chunks else 0.
+    print(argv[0] + ":", header['protocol'].decode('ascii'), "at", header['baudrate'], "baud, recorded",
+          time.ctime(float(header['created'])))
+    print(kinds.count(READ), "reads ({:.2f} MB),".format(size / 1e6), kinds.count(WRITE), "writes,",
+          kinds.count(FLUSH), "flushes over {:.1f} s".format(length))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,341 @@
+##################################################################
+# Stand in for the Arduino when there is no hardware attached
+# Emulates Radar_Combined.ino, Radar_Binary.ino and analog_port.ino,
+# or as analog_text the analog_port.ino that sent values as text
+# on one end of a pseudo terminal. The other end is an ordinary
+# serial port that either GUI can select in the Settings window.
+# POSIX only, as it needs a pty
+#
+# From the GUIs:    python Radar_Main.py --simulate
+#                   python Radar_Main.py --simulate=binary --scene="0,40,8;-30,25,5"
+#                   python Radar_Main.py --simulate --replay
+#                   python Oscillate.py --simulate=analog --samples=1000
+# Standalone:       python SerialSimulator.py radar|binary|analog|analog_text [--scene=...] [--replay] [--samples=N]
+##################################################################
+
+import math
+import os
+import select
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from BinaryProtocol import COMMAND, FrameDecoder, encode_analog_frames, encode_frames
+
+running = []  # Simulated ports started in this process, listed in the Settings window
+
+
+class Scene(object):
+    """Circular obstacles in front of the sensor, in the same cm coordinates
+        as the radar plots: x to the right and y straight ahead"""
+
+    def __init__(self, obstacles=None, max_range=400., noise=0.3, seed=None):
+        if obstacles is None:
+            obstacles = [(0., 40., 8.), (-30., 25., 5.), (35., 30., 6.), (-60., 70., 15.)]
+        self.obstacles = [tuple(float(v) for v in o) for o in obstacles]
+        self.max_range = max_range
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_string(cls, text, **kwargs):
+        """Parses obstacles written as "x,y,r;x,y,r" """
+        obstacles = [part.split(",") for part in text.split(";") if part.strip()]
+        return cls(obstacles, **kwargs)
+
+    def distance(self, angle):
+        """Range in cm seen at a servo angle in degrees"""
+        theta = math.radians(angle - 90)
+        dx = math.sin(theta)
+        dy = math.cos(theta)
+        nearest = self.max_range
+        for x, y, r in self.obstacles:
+            t = x * dx + y * dy  # Distance along the beam to the point closest to the centre
+            d2 = r * r - (x * x + y * y - t * t)
+            if d2 >= 0:
+                hit = t - math.sqrt(d2)
+                if 0 < hit < nearest:
+                    nearest = hit
+        if self.noise:
+            nearest += self.rng.normal(0, self.noise)
+        return min(max(nearest, 2.), self.max_range)
+
+    def servo(self, angle):
+        """Called whenever the servo is commanded to a new angle"""
+        pass
+
+
+class ProfileScene(Scene):
+    """Replays the sweeps recorded in datax.txt and datay.txt. Each line is a
+        sweep, and the next one starts whenever the servo returns to 0"""
+
+    def __init__(self, xfile="datax.txt", yfile="datay.txt", noise=0., **kwargs):
+        super(ProfileScene, self).__init__([], noise=noise, **kwargs)
+        self.angles = []
+        self.ranges = []
+        with open(xfile) as f, open(yfile) as g:
+            for xline, yline in zip(f, g):
+                x = np.array([float(v) for v in xline.split(",") if v.strip()])
+                y = np.array([float(v) for v in yline.split(",") if v.strip()])
+                n = min(len(x), len(y))
+                if n == 0:
+                    continue
+                angle = np.degrees(np.arctan2(x[:n], y[:n])) + 90
+                order = np.argsort(angle)
+                self.angles.append(angle[order])
+                self.ranges.append(np.hypot(x[:n], y[:n])[order])
+        if not self.angles:
+            raise ValueError("No sweeps found in " + xfile + " and " + yfile)
+        self.sweep = 0
+        self.last_angle = 0
+
+    def distance(self, angle):
+        nearest = float(np.interp(angle, self.angles[self.sweep], self.ranges[self.sweep]))
+        if self.noise:
+            nearest += self.rng.normal(0, self.noise)
+        return max(nearest, 2.)
+
+    def servo(self, angle):
+        if angle == 0 and self.last_angle > 0:
+            self.sweep = (self.sweep + 1) % len(self.angles)
+        self.last_angle = angle
+
+
+def settle_delay(cm):
+    """The distance dependent delay at the end of each loop of Radar_Combined.ino, in seconds"""
+    for limit, ms in ((10, 2), (50, 4), (100, 7), (150, 9), (200, 12), (250, 15),
+                      (300, 18), (350, 21), (400, 24), (450, 27)):
+        if cm <= limit:
+            return ms / 1000.
+    return 47 / 1000.
+
+
+class RadarDevice(object):
+    """Emulates Radar_Combined.ino, or Radar_Binary.ino when protocol is 'binary'"""
+    queue_size = 8  # QUEUE_SIZE in Radar_Binary.ino
+
+    def __init__(self, scene=None, protocol='ascii'):
+        self.scene = scene if scene is not None else Scene()
+        self.protocol = protocol
+        self.baudrate = 115200 if protocol == 'binary' else 9600
+        self.angle = 0.
+        self.seq = 0
+        self.start = time.perf_counter()
+        self.incoming = b''
+        self.decoder = FrameDecoder(COMMAND)
+        self.queue = deque()
+
+    def loop(self, port):
+        if self.protocol == 'binary':
+            # Commands are queued and the next one is taken before every ping
+            self.read_commands(port)
+            if self.queue:
+                self.move(*self.queue.popleft())
+                port.sleep(0.002)
+        ping = time.perf_counter()
+        cm = self.scene.distance(self.angle)
+        port.sleep(2 * cm / 0.0343 * 1e-6 + 15e-6)  # Trigger pulse and pulseIn() waiting for the echo
+        cm = int(cm / 0.0343) * 0.0343  # duration / 2 is integer maths in the sketch
+        if self.protocol == 'binary':
+            micros = int((ping - self.start) * 1e6) & 0xffffffff
+            port.write(encode_frames(self.seq, self.angle, cm, micros))
+        else:
+            port.write("{:.2f}\r\n".format(cm).encode('ascii'))
+        port.sleep(settle_delay(cm))
+        if self.protocol != 'binary':
+            self.read_commands(port)
+            port.sleep(0.002)
+
+    def read_commands(self, port):
+        self.incoming += port.read()
+        if self.protocol == 'binary':
+            commands = self.decoder.feed(self.incoming)
+            self.incoming = b''
+            for seq, angle in zip(commands['seq'].tolist(), commands['angle'].tolist()):
+                if len(self.queue) < self.queue_size:
+                    self.queue.append((angle / 10., seq))
+        elif b'\n' in self.incoming:
+            # Serial.readStringUntil('\n') handles a single command per loop
+            line, self.incoming = self.incoming.split(b'\n', 1)
+            try:
+                self.move(int(float(line)))  # pypos.toInt() drops the fraction
+            except ValueError:
+                self.move(0)
+
+    def move(self, angle, seq=0):
+        self.angle = angle
+        self.seq = seq
+        self.scene.servo(angle)
+
+
+class AnalogDevice(object):
+    """Emulates analog_port.ino, frames of analogRead() values sent back to back
+        once the host has sent any byte, or when protocol is 'text' the earlier
+        sketch that printed 75 values a line at a time"""
+    baudrate = 115200
+
+    def __init__(self, scene=None, samples=75, protocol='binary'):
+        self.scene = scene if scene is not None else Scene()
+        self.samples = samples if protocol == 'binary' else 75
+        self.protocol = protocol
+        self.rng = np.random.default_rng()
+        self.triggered = False
+        self.seq = 0
+        self.start = time.perf_counter()
+
+    def frame(self):
+        """Receiver output with the echo from straight ahead, 0-1023 like analogRead()"""
+        t = np.arange(self.samples)
+        echo = self.scene.distance(90) / self.scene.max_range * self.samples
+        signal = 300 + 250 * np.exp(-((t - echo) / 3.) ** 2) * np.sin(t * 1.3)
+        signal += self.rng.normal(0, 8, self.samples)
+        return np.clip(signal, 0, 1023).astype(np.uint16)
+
+    def loop(self, port):
+        # while (!Serial.available()) {} never reads the byte, so one byte starts frames for good
+        if self.triggered is False:
+            self.triggered = port.wait(0.1)
+            return
+        port.read()
+        micros = int((time.perf_counter() - self.start) * 1e6) & 0xffffffff
+        port.sleep(0.0005 + self.samples * 0.000112)  # Trigger pulse and the analogRead() loop
+        if self.protocol == 'binary':
+            port.write(encode_analog_frames(self.seq, micros, self.frame()))
+        else:
+            port.write(b''.join(b'%d\r\n' % value for value in self.frame().tolist()))
+        self.seq = (self.seq + 1) & 0xffff
+        port.sleep(0.010)
+
+
+class SimulatedPort(object):
+    """Runs a device on the master side of a pty. port_name is the slave
+        side, which opens like any other serial port"""
+
+    def __init__(self, device, description="Simulated Arduino"):
+        import pty
+        import tty
+
+        self.device = device
+        self.description = description
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port_name = os.ttyname(self.slave)
+        self.running = False
+        self.thread = None
+        self.dropped = 0  # Bytes lost because the host was not reading, like a UART overrun
+
+    @property
+    def name(self):
+        return os.path.basename(self.port_name)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        running.append(self)
+        return self
+
+    def run(self):
+        while self.running:
+            self.device.loop(self)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        if self in running:
+            running.remove(self)
+        os.close(self.master)
+        os.close(self.slave)
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds for bytes from the host"""
+        ready, _, _ = select.select([self.master], [], [], timeout)
+        return bool(ready)
+
+    def read(self):
+        """Everything the host has sent so far, without blocking"""
+        data = b''
+        while self.wait(0):
+            try:
+                chunk = os.read(self.master, 4096)
+            except OSError:
+                break
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def write(self, data):
+        """Sends bytes to the host, taking as long as they would on the wire"""
+        try:
+            self.dropped += len(data) - os.write(self.master, data)
+        except BlockingIOError:
+            self.dropped += len(data)
+        self.sleep(len(data) * 10. / self.device.baudrate)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+def simulated_ports():
+    """(name, description) of the simulated ports running in this process"""
+    return [(sim.port_name, sim.description) for sim in running]
+
+
+def start_simulator(kind='radar', scene=None, samples=75):
+    """Starts a simulated device. kind is 'radar', 'binary', 'analog' or
+        'analog_text', samples is the analog frame length"""
+    if kind == 'analog':
+        device = AnalogDevice(scene, samples)
+        description = "Simulated analog_port.ino"
+    elif kind == 'analog_text':
+        device = AnalogDevice(scene, protocol='text')
+        description = "Simulated analog_port.ino, sending text"
+    elif kind == 'binary':
+        device = RadarDevice(scene, 'binary')
+        description = "Simulated Radar_Binary.ino"
+    else:
+        device = RadarDevice(scene)
+        description = "Simulated Radar_Combined.ino"
+    return SimulatedPort(device, description).start()
+
+
+def simulate_from_args(argv, kind='radar'):
+    """Starts a simulator if --simulate[=radar|binary|analog|analog_text] is in argv.
+        --scene="x,y,r;..." sets the obstacles, --replay replays datax.txt/datay.txt
+        and --samples=N sets the analog frame length"""
+    scene = None
+    simulate = False
+    samples = 75
+    for arg in argv:
+        if arg == '--simulate':
+            simulate = True
+        elif arg.startswith('--simulate='):
+            simulate = True
+            kind = arg.split('=', 1)[1]
+        elif arg.startswith('--scene='):
+            scene = Scene.from_string(arg.split('=', 1)[1])
+        elif arg == '--replay':
+            scene = ProfileScene()
+        elif arg.startswith('--samples='):
+            samples = int(arg.split('=', 1)[1])
+    if simulate is False:
+        return None
+    sim = start_simulator(kind, scene, samples)
+    print("Simulated port:", sim.port_name, "-", sim.description)
+    return sim
+
+
+if __name__ == '__main__':
+    kind = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'radar'
+    sim = simulate_from_args(['--simulate=' + kind] + sys.argv[1:])
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sim.stop()
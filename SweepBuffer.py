@@ -0,0 +1,83 @@
+import numpy as np
+import pyqtgraph as pg
+
+
+class SweepBuffer(object):
+    """Preallocated x/y arrays holding the points of a single sweep.
+        Points are written in place and only the filled part is handed to
+        the plots, so a sweep never re-converts a growing Python list"""
+
+    def __init__(self, capacity):
+        self.x = np.empty(int(capacity))
+        self.y = np.empty(int(capacity))
+        self.count = 0
+        self.cleared = 0  # Times cleared, so a SweepScatter knows to start over
+
+    def __len__(self):
+        return self.count
+
+    def append(self, x, y):
+        if self.count == len(self.x):  # More readings than angular positions, should not happen
+            self.x = np.concatenate((self.x, np.empty(len(self.x))))
+            self.y = np.concatenate((self.y, np.empty(len(self.y))))
+        self.x[self.count] = x
+        self.y[self.count] = y
+        self.count += 1
+
+    def xdata(self):
+        """Filled part of the x array. Valid until the buffer is cleared"""
+        return self.x[:self.count]
+
+    def ydata(self):
+        """Filled part of the y array. Valid until the buffer is cleared"""
+        return self.y[:self.count]
+
+    def copy(self):
+        """Copies of the filled x and y arrays, for plots that keep a finished sweep"""
+        return self.x[:self.count].copy(), self.y[:self.count].copy()
+
+    def clear(self):
+        self.count = 0
+        self.cleared += 1
+
+
+class SweepScatter(pg.ScatterPlotItem):
+    """Scatter plot of a SweepBuffer, drawn with setData(buffer). Handing
+        ScatterPlotItem the filled arrays restyles every point, and adding
+        to it reallocates every point, so either grows over a sweep. Instead
+        a hidden spot is laid out for every point the buffer can hold when a
+        sweep starts, and each draw moves the points added since the last
+        into place and shows them, so drawing a point costs the same at the
+        end of a sweep as at the start. setData() with anything else
+        behaves as ScatterPlotItem's"""
+
+    def __init__(self, *args, **kargs):
+        self.source = None  # (buffer, buffer.cleared) being shown
+        self.shown = 0  # Points of the buffer shown
+        super(SweepScatter, self).__init__(*args, **kargs)
+
+    def setData(self, *args, **kargs):
+        if len(args) == 1 and isinstance(args[0], SweepBuffer):
+            self.show_buffer(args[0])
+        else:
+            self.source = None
+            super(SweepScatter, self).setData(*args, **kargs)
+
+    def show_buffer(self, buffer):
+        if self.source != (buffer, buffer.cleared) or len(self.data) < len(buffer.x):
+            capacity = len(buffer.x)
+            super(SweepScatter, self).setData(x=np.zeros(capacity), y=np.zeros(capacity))
+            self.setPointsVisible(False)
+            self.source = (buffer, buffer.cleared)
+            self.shown = 0
+        if len(buffer) <= self.shown:
+            return
+        added = self.data[self.shown:len(buffer)]
+        added['x'] = buffer.x[self.shown:len(buffer)]
+        added['y'] = buffer.y[self.shown:len(buffer)]
+        self.setPointsVisible(True, dataSet=added)
+        self.shown = len(buffer)
+        self.prepareGeometryChange()
+        self.informViewBoundsChanged()
+        self.bounds = [None, None]
+        self.invalidate()
@@ -0,0 +1,162 @@
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtCore, QtGui
+
+POINT = np.dtype([('x', 'f8'), ('y', 'f8'), ('sweep', 'i8'), ('kind', 'u1')])
+EMPTY = 255  # Classification of pixels FadingScatter has not drawn on
+
+
+class SweepHistory(object):
+    """The points of the last few sweeps in one preallocated ring. Each
+        point is stored with the sweep it was read in and its
+        classification, so adding a point is a single write and the
+        oldest points are overwritten once the ring is full"""
+
+    def __init__(self, sweeps, points):
+        self.sweeps = sweeps  # Sweeps kept, counting the one in progress
+        self.points = np.zeros(sweeps * points, dtype=POINT)  # points is the most readings a sweep can have
+        self.added = 0  # Points added since the last clear, the next goes at added % len(points)
+        self.sweep = 0  # Number of the sweep in progress
+        self.cleared = 0  # Times cleared, so views know to start over
+
+    def __len__(self):
+        return min(self.added, len(self.points))
+
+    def append(self, x, y, kind):
+        self.points[self.added % len(self.points)] = (x, y, self.sweep, kind)
+        self.added += 1
+
+    def next_sweep(self):
+        self.sweep += 1
+
+    def ordered(self, since=0):
+        """Points of the last sweeps from oldest to newest, only those added
+            after the first since points if given"""
+        first = max(since, self.added - len(self.points))
+        points = self.points.take(np.arange(first, self.added), mode='wrap')
+        return points[np.searchsorted(points['sweep'], self.sweep - self.sweeps + 1):]
+
+    def clear(self):
+        self.added = 0
+        self.cleared += 1
+
+
+class FadingScatter(pg.GraphicsObject):
+    """Draws a SweepHistory as points that fade with the age of their sweep.
+        The points are stamped into an RGBA image the size of the view,
+        newest on top, and painting is a single drawImage. Each pixel also
+        keeps the sweep and classification of the point drawn on it, so
+        when a sweep ends the image is recoloured by age without going
+        back to the points. Only a change of view or history draws every
+        point again. refresh() is meant to be called once per frame"""
+
+    def __init__(self, history, colors, size=2, levels=16):
+        super(FadingScatter, self).__init__()
+        self.history = history
+        self.size = size  # Of a point in pixels, like symbolSize
+        self.levels = levels  # Steps of transparency from the newest sweep to the oldest
+        # Colour of a classification at each age level, the extra level past the oldest is transparent
+        self.rgba = np.zeros((256, levels + 1, 4), dtype=np.uint8)
+        self.shown = np.zeros(256, dtype=bool)  # Classifications that are drawn
+        self.pixels = np.zeros((0, 0, 4), dtype=np.uint8)
+        self.owner = np.zeros((0, 0), dtype=np.int64)  # Sweep of the point on each pixel
+        self.kinds = np.zeros((0, 0), dtype=np.uint8)  # Classification of the point on each pixel, EMPTY if none
+        self.image = None  # QImage over pixels
+        self.rect = QtCore.QRectF()  # Of the view when pixels were drawn
+        self.drawn = None  # (view, history, history.cleared) when every point was last drawn
+        self.sweep = 0  # history.sweep when pixels were last coloured
+        self.stamped = 0  # history.added when pixels were last drawn on
+        self.set_colors(colors)
+
+    def set_colors(self, colors):
+        """colors maps a classification to a colour, other classifications are not drawn"""
+        self.rgba[:] = 0
+        self.shown[:] = False
+        fade = (self.levels - np.arange(self.levels)) / float(self.levels)
+        for kind, color in colors.items():
+            self.rgba[kind, :self.levels, :3] = pg.mkColor(color).getRgb()[:3]
+            self.rgba[kind, :self.levels, 3] = np.round(255 * fade)
+            self.shown[kind] = True
+        self.rgba[EMPTY] = 0
+        self.shown[EMPTY] = False
+        self.drawn = None
+        self.refresh()
+
+    def set_history(self, history):
+        self.history = history
+        self.refresh()
+
+    def viewRangeChanged(self):
+        self.refresh()
+
+    def refresh(self):
+        """Brings the image up to date with the history"""
+        vb = self.getViewBox()
+        if vb is None:
+            return
+        rect = vb.viewRect()
+        width = max(1, int(round(vb.width())))
+        height = max(1, int(round(vb.height())))
+        key = ((rect.x(), rect.y(), rect.width(), rect.height(), width, height), id(self.history),
+               self.history.cleared)
+        if key != self.drawn:
+            if self.pixels.shape[:2] != (height, width):
+                self.pixels = np.zeros((height, width, 4), dtype=np.uint8)
+                self.owner = np.zeros((height, width), dtype=np.int64)
+                self.kinds = np.full((height, width), EMPTY, dtype=np.uint8)
+                self.image = QtGui.QImage(self.pixels.data, width, height, width * 4, QtGui.QImage.Format_RGBA8888)
+            else:
+                self.pixels[:] = 0
+                self.kinds[:] = EMPTY
+            if rect != self.rect:
+                self.prepareGeometryChange()
+                self.rect = rect
+            self.drawn = key
+            self.sweep = self.history.sweep
+            self.stamp(self.history.ordered())
+        elif self.stamped != self.history.added or self.sweep != self.history.sweep:
+            self.stamp(self.history.ordered(self.stamped))
+            if self.sweep != self.history.sweep:
+                self.sweep = self.history.sweep
+                self.recolor()
+        else:
+            return
+        self.stamped = self.history.added
+        self.update()
+
+    def stamp(self, points):
+        """Draws points onto the image, in order"""
+        points = points[self.shown[points['kind']]]
+        if len(points) == 0:
+            return
+        height, width = self.pixels.shape[:2]
+        # Row 0 of the image is at the top of rect, the lowest y, as drawImage maps it
+        px = np.floor((points['x'] - self.rect.left()) * (width / self.rect.width())).astype(np.intp)
+        py = np.floor((points['y'] - self.rect.top()) * (height / self.rect.height())).astype(np.intp)
+        rgba = self.rgba[points['kind'], self.level(points['sweep'])]
+        for oy in range(self.size):
+            for ox in range(self.size):
+                cx = px + ox - self.size // 2
+                cy = py + oy - self.size // 2
+                inside = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+                cx = cx[inside]
+                cy = cy[inside]
+                # The last of repeated pixels wins, so newer points cover older ones
+                self.pixels[cy, cx] = rgba[inside]
+                self.owner[cy, cx] = points['sweep'][inside]
+                self.kinds[cy, cx] = points['kind'][inside]
+
+    def level(self, sweeps):
+        """Age level of points read in sweeps, levels once they are too old to show"""
+        return np.minimum((self.history.sweep - sweeps) * self.levels // self.history.sweeps, self.levels)
+
+    def recolor(self):
+        """Colours every pixel by the age of its point"""
+        self.pixels[:] = self.rgba[self.kinds, self.level(self.owner)]
+
+    def boundingRect(self):
+        return QtCore.QRectF(self.rect)
+
+    def paint(self, p, *args):
+        if self.image is not None:
+            p.drawImage(self.rect, self.image)
@@ -0,0 +1,309 @@
+##################################################################
+# Append-only binary log of radar sweeps
+# A 64 byte header is followed by 32 byte records, one per reading:
+#   time            float64  time.time() when the reading arrived
+#   sweep           uint32   sweep id, increasing through the file
+#   angle           float32  servo angle in degrees
+#   range           float32  distance in cm
+#   x, y            float32  position in cm, as plotted
+#   classification  uint8    UNCLASSIFIED, CLEAR or OBJECT
+# Records are written a sweep at a time, so the file can be opened as a
+# numpy memmap and used without parsing, however many sweeps it holds.
+#
+# A whole session can also be loaded as flat x/y arrays with the start
+# and stop offsets of each sweep, from either kind of log, and padded
+# into grids for plotting. Sweeps need not have the same length.
+#
+# Convert the old text logs:  python SweepLog.py convert datax.txt datay.txt sweeps.radarlog
+# Summarise a log:            python SweepLog.py info sweeps.radarlog
+##################################################################
+
+import bisect
+import os
+import sys
+import time
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b'RADARLOG'
+VERSION = 1
+
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u2'), ('header_size', '<u2'), ('record_size', '<u2'),
+                   ('flags', '<u2'), ('created', '<f8'), ('reserved', 'V40')])
+RECORD = np.dtype([('time', '<f8'), ('sweep', '<u4'), ('angle', '<f4'), ('range', '<f4'),
+                   ('x', '<f4'), ('y', '<f4'), ('classification', 'u1'), ('pad', 'V3')])
+
+# Classifications
+UNCLASSIFIED = 0  # Converted from the text logs, which do not record it
+CLEAR = 1  # Outside the threshold bounds
+OBJECT = 2  # Inside the threshold bounds
+
+# Every point of a session, sweep i is x[starts[i]:stops[i]], y[starts[i]:stops[i]]
+Sweeps = namedtuple('Sweeps', ['x', 'y', 'starts', 'stops'])
+
+
+def make_records(stamp, sweep, angle, distance, x, y, classification=UNCLASSIFIED):
+    """Builds records from scalars or equal length arrays"""
+    columns = np.broadcast_arrays(stamp, sweep, angle, distance, x, y, classification)
+    records = np.zeros(columns[0].size, dtype=RECORD)
+    for name, column in zip(('time', 'sweep', 'angle', 'range', 'x', 'y', 'classification'), columns):
+        records[name] = column.ravel()
+    return records
+
+
+def make_header():
+    header = np.zeros(1, dtype=HEADER)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['header_size'] = HEADER.itemsize
+    header['record_size'] = RECORD.itemsize
+    header['created'] = time.time()
+    return header
+
+
+def read_header(path):
+    """Reads and checks the header of a log, raising ValueError if it is not one"""
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER.itemsize)
+    if len(raw) < HEADER.itemsize:
+        raise ValueError(path + " is too short to be a sweep log")
+    header = np.frombuffer(raw, dtype=HEADER)[0]
+    if header['magic'] != MAGIC:
+        raise ValueError(path + " is not a sweep log")
+    if header['version'] != VERSION or header['record_size'] != RECORD.itemsize:
+        raise ValueError(path + " is version " + str(header['version']) + ", expected " + str(VERSION))
+    return header
+
+
+class SweepLogWriter(object):
+    """Appends records to a log, writing the header first if the file is new"""
+
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            read_header(path)
+        self.file = open(path, 'ab')
+        if exists is False:
+            self.file.write(make_header().tobytes())
+            self.file.flush()
+        else:
+            # Drop a partial record left by a crash, so records stay aligned
+            extra = (os.path.getsize(path) - HEADER.itemsize) % RECORD.itemsize
+            if extra:
+                self.file.truncate(os.path.getsize(path) - extra)
+        self.next_sweep = next_sweep(path)
+
+    def write(self, records):
+        """Appends a structured array of records, or the bytes of one"""
+        self.file.write(records if isinstance(records, bytes) else records.tobytes())
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def flush(self):
+        self.file.flush()
+
+    def fsync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+class SweepLog(object):
+    """Read only view of a log. records is a memmap of every complete record,
+        nothing is read from disk until it is used"""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = read_header(path)
+        count = (os.path.getsize(path) - HEADER.itemsize) // RECORD.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.itemsize, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD)
+
+    def __len__(self):
+        return len(self.records)
+
+    def sweep(self, sweep):
+        """Records of one sweep, found by binary search on the sweep ids.
+            bisect only reads the records it compares, where searchsorted
+            would copy the whole column out of the memmap first"""
+        ids = self.records['sweep']
+        start = bisect.bisect_left(ids, sweep)
+        stop = bisect.bisect_left(ids, sweep + 1, start)
+        return self.records[start:stop]
+
+    def sweep_bounds(self):
+        """(ids, starts, stops) of every sweep in the log. Reads the whole sweep column"""
+        ids = self.records['sweep']
+        if len(ids) == 0:
+            return ids[:0], np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        starts = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1))
+        stops = np.append(starts[1:], len(ids))
+        return np.asarray(ids[starts]), starts, stops
+
+
+def next_sweep(path):
+    """The sweep id that follows the last one in a log, 0 if there is no log yet"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    records = SweepLog(path).records
+    return int(records['sweep'][-1]) + 1 if len(records) else 0
+
+
+def read_txt(xfile="datax.txt", yfile="datay.txt"):
+    """Sweeps from the old text logs as a list of (x, y) arrays. Lines of
+        different lengths are cut to the shorter, and the number of sweeps
+        to the shorter file, with a warning"""
+    with open(xfile) as f, open(yfile) as g:
+        xlines = f.readlines()
+        ylines = g.readlines()
+    if len(xlines) != len(ylines):
+        print("Warning: " + xfile + " has " + str(len(xlines)) + " sweeps but " + yfile + " has " + str(len(ylines)))
+    sweeps = []
+    for i, (xline, yline) in enumerate(zip(xlines, ylines)):
+        x = np.array([float(v) for v in xline.split(",") if v.strip()])
+        y = np.array([float(v) for v in yline.split(",") if v.strip()])
+        if len(x) != len(y):
+            print("Warning: sweep " + str(i) + " has " + str(len(x)) + " x and " + str(len(y)) + " y values")
+        n = min(len(x), len(y))
+        sweeps.append((x[:n], y[:n]))
+    return sweeps
+
+
+def read_txt_values(path):
+    """Every value of a text log in one pass, and how many are on each line.
+        Each value is followed by a comma, as Radar_Main writes them, so
+        the values on a line are the commas on it. Blank lines are sweeps
+        with no values. Raises ValueError for a line that does not fit"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw and not raw.endswith(b'\n'):
+        raw += b'\n'
+    chars = np.frombuffer(raw, dtype=np.uint8)
+    commas = np.flatnonzero(chars == ord(','))
+    ends = np.flatnonzero(chars == ord('\n'))
+    counts = np.diff(np.searchsorted(commas, ends), prepend=0)
+    last = ends - 1
+    last -= chars[np.maximum(last, 0)] == ord('\r')
+    blank = last < np.concatenate(([0], ends[:-1] + 1))
+    with warnings.catch_warnings():
+        # Older numpy warns about text it cannot read rather than raising, the length check catches it
+        warnings.simplefilter('ignore', DeprecationWarning)
+        try:
+            values = np.fromstring(raw.replace(b'\n', b'').replace(b'\r', b'').decode('ascii'), sep=',')
+        except ValueError:
+            values = None
+    if values is None or len(values) != counts.sum() or not np.all(blank | (chars[last] == ord(','))):
+        raise ValueError(path + " has a line that does not end in a comma, or has an empty value")
+    return values, counts
+
+
+def load_txt(xfile="datax.txt", yfile="datay.txt"):
+    """Loads the old text logs as Sweeps. Gives the same sweeps as
+        read_txt, cut to the shorter of each pair, without a loop over
+        the values. Falls back on read_txt for a log it cannot parse"""
+    try:
+        x, xcounts = read_txt_values(xfile)
+        y, ycounts = read_txt_values(yfile)
+    except ValueError as a:
+        print(a)
+        sweeps = read_txt(xfile, yfile)
+        lengths = np.array([len(sx) for sx, sy in sweeps], dtype=np.intp)
+        stops = np.cumsum(lengths)
+        x = np.concatenate([sx for sx, sy in sweeps]) if sweeps else np.empty(0)
+        y = np.concatenate([sy for sx, sy in sweeps]) if sweeps else np.empty(0)
+        return Sweeps(x, y, stops - lengths, stops)
+    if len(xcounts) != len(ycounts):
+        print("Warning: " + xfile + " has " + str(len(xcounts)) + " sweeps but " + yfile + " has " + str(len(ycounts)))
+    n = min(len(xcounts), len(ycounts))
+    xcounts, ycounts = xcounts[:n], ycounts[:n]
+    lengths = np.minimum(xcounts, ycounts)
+    if np.any(xcounts != ycounts):
+        print("Warning: " + str(np.count_nonzero(xcounts != ycounts)) +
+              " sweeps have different numbers of x and y values")
+    x = x[keep_first(xcounts, lengths)]
+    y = y[keep_first(ycounts, lengths)]
+    stops = np.cumsum(lengths)
+    return Sweeps(x, y, stops - lengths, stops)
+
+
+def keep_first(counts, lengths):
+    """Indices of the first lengths[i] of each run of counts[i] values"""
+    if np.array_equal(counts, lengths):
+        return slice(0, int(counts.sum()))
+    starts = np.cumsum(counts) - counts
+    index = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + index
+
+
+def load_log(path):
+    """Loads a sweep log as Sweeps. x and y are read into memory, the offsets
+        come from the sweep ids"""
+    log = SweepLog(path)
+    ids, starts, stops = log.sweep_bounds()
+    return Sweeps(np.array(log.records['x'], dtype=float), np.array(log.records['y'], dtype=float), starts, stops)
+
+
+def load(path=None):
+    """Loads a sweep log, or the text logs when no path is given"""
+    return load_txt() if path is None else load_log(path)
+
+
+def pad_sweeps(values, starts, stops, fill=None):
+    """Pads ragged sweeps into a (sweeps, longest sweep) grid with one gather.
+        Returns the grid and a mask that is True where it holds a value.
+        The padding is fill, or each sweep's last value when fill is None,
+        so a surface through the grid folds back on itself rather than
+        reaching for a value that does not exist. Empty sweeps are fill, or 0"""
+    lengths = stops - starts
+    width = int(lengths.max()) if len(lengths) else 0
+    column = np.arange(width)
+    mask = column < lengths[:, None]
+    index = starts[:, None] + np.minimum(column, np.maximum(lengths - 1, 0)[:, None])
+    grid = values[np.minimum(index, max(len(values) - 1, 0))] if len(values) else np.zeros(mask.shape)
+    if fill is not None:
+        grid[~mask] = fill
+    else:
+        grid[lengths == 0] = 0
+    return grid, mask
+
+
+def convert_txt(xfile, yfile, path):
+    """Appends the sweeps of the old text logs to a sweep log. The text logs
+        hold no times, so time is 0, and angle and range are recovered
+        from x and y"""
+    x, y, starts, stops = load_txt(xfile, yfile)
+    writer = SweepLogWriter(path)
+    sweep = writer.next_sweep + np.repeat(np.arange(len(starts)), stops - starts)
+    angle = np.degrees(np.arctan2(x, y)) + 90
+    writer.write(make_records(0., sweep, angle, np.hypot(x, y), x, y))
+    writer.close()
+    return len(starts)
+
+
+def main(argv):
+    if len(argv) == 4 and argv[0] == 'convert':
+        count = convert_txt(argv[1], argv[2], argv[3])
+        print("Converted", count, "sweeps into", argv[3])
+    elif len(argv) == 2 and argv[0] == 'info':
+        start = time.perf_counter()
+        log = SweepLog(argv[1])
+        ids, starts, stops = log.sweep_bounds()
+        elapsed = time.perf_counter() - start
+        print(argv[1] + ":", len(log), "records in", len(ids), "sweeps, indexed in {:.1f} ms".format(elapsed * 1e3))
+        if len(ids):
+            print("Sweeps", ids[0], "to", ids[-1], " created", time.ctime(float(log.header['created'])))
+    else:
+        print("Usage: python SweepLog.py convert datax.txt datay.txt out.radarlog")
+        print("       python SweepLog.py info file.radarlog")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
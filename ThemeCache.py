@@ -0,0 +1,42 @@
+import os
+
+from PyQt5.QtCore import QDir
+from PyQt5.QtGui import QColor, QGuiApplication, QPalette
+from qt_material import build_stylesheet, get_theme
+from qt_material.resources import RESOURCES_PATH
+
+
+class ThemeCache(object):
+    """Applies qt_material themes, building each one only the first time.
+        Building a theme parses its XML, writes a set of coloured icons to
+        disk and renders the stylesheet template, which is most of the time
+        a theme switch takes. Each theme keeps its own icon folder, so
+        switching back to a theme only points the icon: search path at it
+        and restores the QTMATERIAL_ colours it set"""
+
+    def __init__(self):
+        self.themes = {}  # Theme name -> (stylesheet, environment, icon folder)
+
+    def build(self, theme):
+        colors = get_theme(theme)
+        if colors is None:
+            raise ValueError("No theme called " + theme)
+        folder = "theme_" + os.path.splitext(theme)[0]
+        # export skips adding the fonts again, apply_stylesheet added them at start up
+        stylesheet = build_stylesheet(theme, parent=folder, export=True)
+        environment = {k: v for k, v in os.environ.items() if k in colors or k.startswith('QTMATERIAL_')}
+        return stylesheet, environment, os.path.join(RESOURCES_PATH, folder)
+
+    def apply(self, app, theme):
+        """Sets the stylesheet of theme on app and its colours in os.environ"""
+        if theme not in self.themes:
+            self.themes[theme] = self.build(theme)
+        stylesheet, environment, icons = self.themes[theme]
+        os.environ.update(environment)
+        QDir.setSearchPaths("icon", [icons])  # build_stylesheet only ever adds to the search path
+        palette = QGuiApplication.palette()
+        text = QColor(environment['QTMATERIAL_PRIMARYCOLOR'])
+        text.setAlpha(92)
+        palette.setColor(QPalette.ColorRole.Text, text)
+        QGuiApplication.setPalette(palette)
+        app.setStyleSheet(stylesheet)
@@ -1,13 +1,19 @@
-
+// Sends each ping as one binary frame of analogRead() values, see
+// BinaryProtocol.py for the layout. Oscillate.py reads the number of
+// samples from the frame header, so SAMPLES can be changed freely as
+// long as the samples fit in RAM
 int trigPin = 12;  // Trigger
 int echoPin = 11;  // Echo
 int ldr = A9;
 int Echo = 28;
 
-int samples[75];
+const uint16_t SAMPLES = 75;
+uint16_t samples[SAMPLES];
 //int samples[sample_size];
 long duration, cm, inches;
 boolean flag;
+uint16_t seq = 0;
+unsigned long pingTime;
 
 void setup() {
   //Serial Port begin
@@ -31,6 +37,7 @@ void loop() {
     //String pypos = Serial.readStringUntil('\n');
   digitalWrite(trigPin, LOW);
   delayMicroseconds(5);
+  pingTime = micros();
   digitalWrite(trigPin, HIGH);
   delayMicroseconds(10);
   digitalWrite(trigPin, LOW);
@@ -44,21 +51,38 @@ void loop() {
   //{
   
   //if (digitalRead(echoPin)) {
-  for(int i=0; i<75; i++) {
+  for(int i=0; i<SAMPLES; i++) {
     int data = analogRead(ldr);
     samples[i] = data;
     //Serial.print(data);
     //Serial.print('\n');
     //delayMicroseconds(1);
     }
-  for(int i=0; i<75; i++) {
-    Serial.print(samples[i]);
-    Serial.print('\n');
-    //delayMicroseconds(50);
-  }
+  sendFrame();
   delay(10);
     //flag = true;
   //}
   //}
   //delay(10);
-}
\ No newline at end of file
+}
+
+void sendFrame() {
+  // sync, count, seq, time, samples, checksum. The checksum is the sum
+  // of every byte between the sync marker and the checksum
+  byte header[10] = {0xA5, 0x5A,
+                     lowByte(SAMPLES), highByte(SAMPLES),
+                     lowByte(seq), highByte(seq),
+                     (byte)pingTime, (byte)(pingTime >> 8), (byte)(pingTime >> 16), (byte)(pingTime >> 24)};
+  byte sum = 0;
+  for (int i = 2; i < 10; i++) {
+    sum += header[i];
+  }
+  byte *bytes = (byte *)samples;
+  for (unsigned int i = 0; i < sizeof(samples); i++) {
+    sum += bytes[i];
+  }
+  Serial.write(header, 10);
+  Serial.write(bytes, sizeof(samples));
+  Serial.write(sum);
+  seq++;
+}
@@ -0,0 +1,123 @@
+##################################################################
+# Benchmark for reading analog_port.ino frames in Oscillate.py
+# Host parsing: frames are written into a pseudo terminal as fast as
+# possible and read back, by the old loop of one readline() and
+# float() per value, and by SerialReader decoding whole binary frames.
+# Live: frames per second from the simulated analog_port.ino at
+# 115200 baud, for several frame lengths.
+# POSIX only, as it needs a pty
+# Run with: python benchmarks/analog_frames.py
+##################################################################
+
+import os
+import pty
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import serial
+
+from BinaryProtocol import encode_analog_frames
+from SerialReader import SerialReader
+from SerialSimulator import AnalogDevice, SimulatedPort
+
+
+def feed(master, payload, chunk=4096):
+    for i in range(0, len(payload), chunk):
+        os.write(master, payload[i:i + chunk])
+
+
+def parse_lines(frames, timeout=60):
+    """The original Oscillate._update, one readline() per value"""
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    payload = ''.join(str(v) + '\n' for v in frames.ravel()).encode('ascii')
+    port = serial.Serial(os.ttyname(slave), 115200, timeout=1)
+    writer = threading.Thread(target=feed, args=(master, payload))
+    start = time.perf_counter()
+    writer.start()
+    values = []
+    for _ in range(len(frames)):
+        ydata = []
+        for i in range(frames.shape[1]):
+            ydata.append(float(port.readline().decode('ascii')))
+        values.append(ydata)
+        if time.perf_counter() - start > timeout:
+            break
+    elapsed = time.perf_counter() - start
+    writer.join()
+    port.close()
+    os.close(master)
+    os.close(slave)
+    return elapsed, np.array(values)
+
+
+def parse_frames(frames, timeout=60):
+    """SerialReader with the analog protocol"""
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    payload = encode_analog_frames(np.arange(len(frames)) & 0xffff, 0, frames)
+    reader = SerialReader(os.ttyname(slave), 115200, 'analog', maxlen=len(frames))
+    thread = threading.Thread(target=reader.long_running)
+    thread.start()
+    while reader.running is False:
+        time.sleep(0.001)
+    start = time.perf_counter()
+    feed(master, payload)
+    while reader.count < len(frames) and time.perf_counter() - start < timeout:
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    reader.stop()
+    thread.join()
+    os.close(master)
+    os.close(slave)
+    return elapsed, np.array([sample.value for sample in reader.pending()])
+
+
+def live(samples, seconds=3.):
+    """Frames per second from the simulated device through SerialReader"""
+    sim = SimulatedPort(AnalogDevice(samples=samples)).start()
+    reader = SerialReader(sim.port_name, 115200, 'analog')
+    thread = threading.Thread(target=reader.long_running)
+    thread.start()
+    while reader.running is False:
+        time.sleep(0.001)
+    reader.write(b'1')
+    time.sleep(0.5)  # Settle into the steady state
+    first = reader.count
+    time.sleep(seconds)
+    frames = reader.count - first
+    errors = reader.decoder.errors if reader.decoder is not None else 0
+    reader.stop()
+    thread.join()
+    sim.stop()
+    return frames / seconds, errors
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print("Host parsing")
+    for samples, n in ((75, 400), (1000, 40), (4000, 10)):
+        frames = rng.integers(0, 1024, (n, samples)).astype(np.uint16)
+        for name, parse in (("readline", parse_lines), ("frames", parse_frames)):
+            elapsed, values = parse(frames)
+            ok = values.shape == frames.shape and np.array_equal(values, frames)
+            print("  {:<9} {:5d} samples/frame  {:8.1f} frames/s  {:10.0f} samples/s  {}".format(
+                name, samples, len(values) / elapsed, len(values) * samples / elapsed, "ok" if ok else "MISMATCH"))
+
+    print("Live from the simulator at 115200 baud")
+    for samples, seconds in ((75, 3.), (1000, 3.), (4000, 6.)):
+        fps, errors = live(samples, seconds)
+        # 10 bits on the wire per byte, and about 4 bytes per value as text
+        binary_limit = 11520. / (samples * 2 + 11)
+        text_limit = 11520. / (samples * 4)
+        print("  {:5d} samples/frame  {:6.1f} frames/s  {} errors  link limit {:5.1f} frames/s, {:5.1f} as text".format(
+            samples, fps, errors, binary_limit, text_limit))
+
+
+if __name__ == '__main__':
+    main()
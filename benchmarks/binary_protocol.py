@@ -0,0 +1,74 @@
+##################################################################
+# Benchmark for the ASCII and binary serial protocols
+# Runs a SerialReader against one end of a pseudo terminal and writes
+# readings encoded the way each sketch sends them into the other end,
+# so they come back through the normal read path of the worker.
+# The pty has no baud rate, so this measures how fast the host can
+# parse, and the rate a real link allows is printed next to it.
+# Checks every value arrived. POSIX only, as it needs a pty
+# Run with: python benchmarks/binary_protocol.py
+##################################################################
+
+import os
+import pty
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from BinaryProtocol import encode_frames
+from SerialReader import SerialReader
+
+
+def encode_ascii(distance):
+    """Readings formatted the way Serial.print(cm); Serial.println(); sends them"""
+    return ''.join("{:.2f}\r\n".format(d) for d in distance).encode('ascii')
+
+
+def run(protocol, payload, n, chunk=4096, timeout=60):
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    reader = SerialReader(os.ttyname(slave), 115200, protocol, timeout=0.01, maxlen=n)
+    thread = threading.Thread(target=reader.long_running)
+    thread.start()
+    while reader.running is False:
+        time.sleep(0.001)
+
+    # Written from this thread, as the device would, while the worker reads
+    start = time.perf_counter()
+    for i in range(0, len(payload), chunk):
+        os.write(master, payload[i:i + chunk])
+    while reader.count < n and time.perf_counter() - start < timeout:
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    reader.stop()
+    thread.join()
+    os.close(master)
+    os.close(slave)
+    values = np.array([sample.value for sample in reader.pending()])
+    return elapsed, values
+
+
+def main(n=50000):
+    rng = np.random.default_rng(0)
+    distance = np.round(rng.uniform(2, 400, n), 2)
+    angle = np.tile(np.arange(0, 180.5, 0.5), n // 361 + 1)[:n]
+
+    payloads = (('ascii', encode_ascii(distance), 9600),
+                ('binary', encode_frames(np.arange(n) & 0xffff, angle, distance, np.arange(n) * 5000), 115200))
+    for protocol, payload, baudrate in payloads:
+        elapsed, values = run(protocol, payload, n)
+        ok = len(values) == n and np.allclose(values, distance, atol=0.005)
+        link = baudrate / 10. / (len(payload) / n)  # 10 bits on the wire per byte
+        print("{:<7} {:6d} samples  {:8d} bytes  parsed at {:9.0f} samples/s  "
+              "link limit at {:6d} baud {:7.0f} samples/s  {}".format(
+                  protocol, len(values), len(payload), len(values) / elapsed, baudrate, link,
+                  "ok" if ok else "MISMATCH"))
+
+
+if __name__ == '__main__':
+    main()
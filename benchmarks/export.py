@@ -0,0 +1,141 @@
+##################################################################
+# Benchmark for exporting plots and sweeps
+# Plots: how long the GUI thread is held up by one export, rendering
+# the scene through pyqtgraph's ImageExporter as export() used to,
+# next to grabbing a snapshot of the canvas and saving it on the
+# Exporter worker. Sweeps: frames/s rendering every sweep of a sweep
+# log to an image sequence on the worker, next to drawing each sweep
+# into a plot and exporting it with ImageExporter on the GUI thread.
+# Files go in a temporary directory and are removed after.
+# Run with: python benchmarks/export.py [sweeps]
+##################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.exporters import ImageExporter
+from PyQt5 import QtWidgets
+from qt_material import apply_stylesheet
+
+import Radar_Main
+from Exporter import Exporter
+from SweepLog import SweepLog, SweepLogWriter, make_records, CLEAR, OBJECT
+
+POINTS = 361
+
+
+def write_log(path, sweeps):
+    rng = np.random.default_rng(0)
+    theta = np.radians(np.linspace(0, 180, POINTS) - 90)
+    writer = SweepLogWriter(path)
+    for sweep in range(sweeps):
+        ranges = rng.uniform(2, 50, POINTS)
+        classification = np.where(ranges < 20, OBJECT, CLEAR)
+        writer.write(make_records(0., sweep, np.degrees(theta) + 90, ranges,
+                                  ranges * np.sin(theta), ranges * np.cos(theta), classification))
+    writer.close()
+
+
+def fill_plots(w):
+    """Puts a sweep's worth of points in every plot"""
+    rng = np.random.default_rng(1)
+    ranges = rng.uniform(2, 50, POINTS)
+    theta = np.radians(np.linspace(0, 180, POINTS) - 90)
+    x, y = ranges * np.sin(theta), ranges * np.cos(theta)
+    for item in (w.h3, w.h4):
+        item.setData(x, y)
+    for history in (w.forward, w.backward):
+        for i in range(POINTS):
+            history.append(x[i], y[i], CLEAR)
+    w.render_history()
+    w.h2.setData(ranges)
+
+
+def run(worker):
+    thread = threading.Thread(target=worker.long_running)
+    thread.start()
+    return thread
+
+
+def main(sweeps=500):
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    apply_stylesheet(app, theme=Radar_Main.default_theme())
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    folder = tempfile.mkdtemp()
+    try:
+        w = Radar_Main.App()
+        w.resize(1280, 800)
+        w.show()
+        fill_plots(w)
+        app.processEvents()
+
+        print("Plots, GUI thread held up per export")
+        repeats = 20
+        start = time.perf_counter()
+        for i in range(repeats):
+            ImageExporter(w.canvas.scene()).export(os.path.join(folder, "old{}.png".format(i)))
+        old = (time.perf_counter() - start) / repeats
+        print("  ImageExporter on the GUI thread {:8.1f} ms".format(old * 1e3))
+
+        exporter = Exporter()
+        thread = run(exporter)
+        held = []
+        start = time.perf_counter()
+        for i in range(repeats):
+            t = time.perf_counter()
+            exporter.save_image(os.path.join(folder, "new{}.png".format(i)), w.canvas.grab().toImage())
+            held.append(time.perf_counter() - t)
+        exporter.stop()
+        thread.join()
+        total = time.perf_counter() - start
+        print("  snapshot + Exporter worker      {:8.1f} ms  ({:.1f} ms worst, worker saved {:.1f} frames/s)".format(
+            np.mean(held) * 1e3, np.max(held) * 1e3, repeats / total))
+
+        path = os.path.join(folder, "sweeps.radarlog")
+        write_log(path, sweeps)
+        log = SweepLog(path)
+        ids, starts, stops = log.sweep_bounds()
+        print("Every sweep of a {} sweep log as an image sequence".format(sweeps))
+        plot = pg.PlotWidget()
+        plot.resize(800, 420)
+        plot.show()
+        points = plot.plot([], [], pen=None, symbol='o', symbolSize=4)
+        n = min(50, sweeps)
+        start = time.perf_counter()
+        for i in range(n):
+            records = log.records[starts[i]:stops[i]]
+            points.setData(records['x'], records['y'])
+            ImageExporter(plot.plotItem).export(os.path.join(folder, "plot_{:05d}.png".format(i)))
+        old = n / (time.perf_counter() - start)
+        print("  plot + ImageExporter, GUI thread  {:7.1f} frames/s  ({} sweeps)".format(old, n))
+
+        for ext in ('.png', '.jpg', '.bmp'):
+            exporter = Exporter()
+            thread = run(exporter)
+            start = time.perf_counter()
+            exporter.save_sweeps(path, os.path.join(folder, "seq", "sweep" + ext), 50.)
+            exporter.stop()
+            thread.join()
+            elapsed = time.perf_counter() - start
+            files = len(os.listdir(os.path.join(folder, "seq")))
+            print("  SweepRenderer + Exporter {:<5}    {:7.1f} frames/s  ({} files)".format(
+                ext, sweeps / elapsed, files))
+            shutil.rmtree(os.path.join(folder, "seq"))
+        del log
+        w.close()
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
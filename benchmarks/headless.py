@@ -0,0 +1,121 @@
+##################################################################
+# Headless.py against the GUI of Radar_Main.py
+# Records two sweeps from the simulated Radar_Binary.ino through
+# Headless.py, then replays the session as fast as possible through
+# each, every replay in a process of its own so resident memory is
+# not shared, and prints the readings processed per second and the
+# peak resident memory of each.
+# POSIX only, as the simulator needs a pty
+# Run with: python benchmarks/headless.py [replays]
+##################################################################
+
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import Headless
+from SerialSession import replay_url
+from SerialSimulator import Scene, start_simulator
+
+SEED = 0
+MAX_RANGE = 100.
+SWEEPS = 2
+
+
+def peak_mb():
+    scale = 1. if sys.platform == 'darwin' else 1e3  # ru_maxrss is in bytes on macOS, KB elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def counted(scanner):
+    """Counts the sweep readings the scanner processes in processed"""
+    scanner.processed = 0
+    record_reading = scanner.record_reading
+
+    def count(*args):
+        scanner.processed += 1
+        return record_reading(*args)
+    scanner.record_reading = count
+    return scanner
+
+
+def record(folder):
+    """Records SWEEPS sweeps to a session, returns its path and the readings processed"""
+    path = os.path.join(folder, "sweep.radarsession")
+    sim = start_simulator('binary', Scene(max_range=MAX_RANGE, seed=SEED))
+    Headless.recording_path = lambda: path
+    scanner = counted(Headless.HeadlessScanner(sim.port_name, 'binary',
+                                               log_name=os.path.join(folder, "record.radarlog")))
+    scanner.connect()
+    scanner.sweep(SWEEPS)
+    scanner.close()
+    sim.stop()
+    return path, scanner.processed
+
+
+def replay_headless(path, expected, timeout=60.):
+    scanner = counted(Headless.HeadlessScanner(replay_url(path, None), 'binary', log_name="headless.radarlog"))
+    scanner.connect()
+    began = time.perf_counter()
+    scanner.start()
+    scanner.process(scanner.sweep_sample,
+                    lambda: scanner.processed >= expected or time.perf_counter() - began > timeout)
+    elapsed = time.perf_counter() - began
+    scanner.close()
+    return scanner.processed / elapsed
+
+
+def replay_gui(path, expected):
+    from PyQt5 import QtWidgets
+    from qt_material import apply_stylesheet
+    import Radar_Main
+    import suite
+
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    apply_stylesheet(app, theme=Radar_Main.default_theme())
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    return suite.replay_radar(app, 'sweep', path, expected)
+
+
+def child(kind, path, expected):
+    """Runs in its own process, prints its result as the last line"""
+    rate = (replay_gui if kind == 'gui' else replay_headless)(path, expected)
+    print(json.dumps({'rate': rate, 'peak': peak_mb()}))
+
+
+def run(kind, path, expected, folder):
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child=' + kind, path,
+                                      str(expected)], cwd=folder, stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main(replays=3):
+    folder = tempfile.mkdtemp()
+    try:
+        path, expected = record(folder)
+        print("Replaying {} readings, {} sweeps, as fast as possible".format(expected, SWEEPS))
+        print("  {:<10} {:>14} {:>12}".format("", "readings/s", "peak RSS"))
+        for kind in ('gui', 'headless'):
+            results = [run(kind, path, expected, folder) for _ in range(replays)]
+            rate = sorted(r['rate'] for r in results)[len(results) // 2]
+            peak = max(r['peak'] for r in results)
+            print("  {:<10} {:>14.0f} {:>9.1f} MB".format(kind, rate, peak))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1].startswith('--child='):
+        child(sys.argv[1].split('=', 1)[1], sys.argv[2], int(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
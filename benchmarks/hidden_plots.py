@@ -0,0 +1,106 @@
+##################################################################
+# Benchmark for hiding the right hand plots in the settings
+# Synthetic sweeps are fed through App.update_sample as _update
+# would, a batch of 12 readings per frame, and every frame is
+# rendered by the frame clock and painted. Reported per reading:
+# processing (update_sample and the occupancy grid), the frame
+# clock's render and the repaint, with all four plots and with only
+# the left hand plots, each spanning its row. Also times switching
+# the layout back and forth.
+# Run with: python benchmarks/hidden_plots.py [sweeps]
+##################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PyQt5 import QtWidgets
+from qt_material import apply_stylesheet
+
+import Radar_Main
+from SerialReader import Sample
+
+BATCH = 12  # Readings per frame, 360 Hz at 30 fps
+
+
+def readings(sweeps):
+    """Samples of back and forth sweeps in half degree steps"""
+    rng = np.random.default_rng(0)
+    up = np.arange(0, 180.5, 0.5)
+    angles = np.concatenate([up if i % 2 == 0 else up[::-1] for i in range(sweeps)])
+    ranges = np.round(25 + 20 * np.abs(np.sin(np.radians(angles * 3))) + rng.normal(0, 1, len(angles)), 1)
+    return [Sample(0., float(r), float(a), None, None) for r, a in zip(ranges, angles)]
+
+
+def run(app, w, samples):
+    processing = render = paint = 0.
+    for i in range(0, len(samples), BATCH):
+        batch = samples[i:i + BATCH]
+        start = time.perf_counter()
+        for sample in batch:
+            w.update_sample(sample)
+        w.add_detections([s.angle for s in batch], [s.value for s in batch])
+        t1 = time.perf_counter()
+        w.clock.timer.stop()
+        w.clock.render()
+        t2 = time.perf_counter()
+        w.canvas.viewport().repaint()
+        t3 = time.perf_counter()
+        processing += t1 - start
+        render += t2 - t1
+        paint += t3 - t2
+    n = float(len(samples))
+    return processing / n, render / n, paint / n
+
+
+def main(sweeps=20):
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    apply_stylesheet(app, theme=Radar_Main.default_theme())
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    folder = tempfile.mkdtemp()
+    w = Radar_Main.App()
+    w.log_name = os.path.join(folder, "sweeps.radarlog")  # update_sample logs every sweep
+    w.resize(1280, 800)
+    w.show()
+    w.threshold = 30
+    w.threshold2 = 0
+    w.det_radius = 18
+    w.s = 80
+    w.set_limits(w.s)
+    app.processEvents()
+    samples = readings(sweeps)
+    run(app, w, samples[:len(samples) // 4])  # Warm up
+
+    print("Per reading, {} sweeps of {} readings, {} readings a frame".format(sweeps, len(samples) // sweeps, BATCH))
+    print("  {:<22} {:>11} {:>11} {:>11} {:>11}".format("layout", "processing", "render", "repaint", "total"))
+    for name, plot1, plot2 in (("four plots", True, True), ("left hand plots only", False, False),
+                               ("four plots again", True, True), ("left hand plots again", False, False)):
+        w.plot1 = plot1
+        w.plot2 = plot2
+        w.checked_plots()
+        w.reset_plots()
+        app.processEvents()
+        costs = run(app, w, samples)
+        print("  {:<22} {:>8.1f} us {:>8.1f} us {:>8.1f} us {:>8.1f} us".format(
+            name, *[c * 1e6 for c in costs + (sum(costs),)]))
+
+    repeats = 20
+    start = time.perf_counter()
+    for i in range(repeats):
+        w.plot1 = w.plot2 = i % 2 == 1
+        w.checked_plots()
+        app.processEvents()
+    print("Switching layout {:.1f} ms".format((time.perf_counter() - start) / repeats * 1e3))
+    w.close()
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,117 @@
+##################################################################
+# Overhead of the latency probes of Latency.py
+# Times a probe, start() and stop(), disabled and enabled. Then runs
+# the binary protocol through a SerialReader on a pseudo terminal and
+# synthetic sweeps through the GUI path of hidden_plots.py, with the
+# probes disabled and enabled, and prints the latency report of the
+# enabled runs. POSIX only, as it needs a pty
+# Run with: python benchmarks/latency.py [sweeps]
+##################################################################
+
+import os
+import pty
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tty
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PyQt5 import QtWidgets
+from qt_material import apply_stylesheet
+
+import Radar_Main
+from BinaryProtocol import encode_frames
+from Latency import probes
+from SerialReader import SerialReader
+from hidden_plots import readings, run
+
+
+def probe_cost(n=1000000):
+    t = timeit.timeit("probes.stop('parse', probes.start())", globals={'probes': probes}, number=n)
+    return t / n
+
+
+def read_binary(n, chunk=4096):
+    """Seconds taken to read and parse n binary frames"""
+    rng = np.random.default_rng(0)
+    distance = np.round(rng.uniform(2, 400, n), 2)
+    angle = np.tile(np.arange(0, 180.5, 0.5), n // 361 + 1)[:n]
+    payload = encode_frames(np.arange(n) & 0xffff, angle, distance, np.arange(n) * 5000)
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    reader = SerialReader(os.ttyname(slave), 115200, 'binary', timeout=0.01, maxlen=n)
+    thread = threading.Thread(target=reader.long_running)
+    thread.start()
+    while reader.running is False:
+        time.sleep(0.001)
+    start = time.perf_counter()
+    for i in range(0, len(payload), chunk):
+        os.write(master, payload[i:i + chunk])
+    while reader.count < n and time.perf_counter() - start < 60:
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    reader.stop()
+    thread.join()
+    os.close(master)
+    os.close(slave)
+    return elapsed
+
+
+def main(sweeps=20):
+    probes.enabled = False
+    print("Probe, start() and stop():  disabled {:.0f} ns  ".format(probe_cost() * 1e9), end="")
+    probes.enabled = True
+    print("enabled {:.0f} ns".format(probe_cost() * 1e9))
+
+    n = 50000
+    print("Reading {} binary frames from a pty".format(n))
+    for enabled in (False, True, False, True):
+        probes.enabled = enabled
+        probes.reset()
+        elapsed = read_binary(n)
+        print("  probes {:<9} {:>8.0f} frames/s".format("enabled" if enabled else "disabled", n / elapsed))
+    reader_report = probes.report()
+
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    apply_stylesheet(app, theme=Radar_Main.default_theme())
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    folder = tempfile.mkdtemp()
+    probes.enabled = False
+    w = Radar_Main.App()
+    w.log_name = os.path.join(folder, "sweeps.radarlog")
+    w.latency_name = os.path.join(folder, "latency.txt")
+    w.resize(1280, 800)
+    w.show()
+    w.threshold = 30
+    w.threshold2 = 0
+    w.det_radius = 18
+    w.s = 80
+    w.set_limits(w.s)
+    app.processEvents()
+    samples = readings(sweeps)
+    run(app, w, samples[:len(samples) // 4])  # Warm up
+
+    print("GUI per reading, {} sweeps".format(sweeps))
+    print("  {:<16} {:>11} {:>11} {:>11} {:>11}".format("probes", "processing", "render", "repaint", "total"))
+    for enabled in (False, True, False, True):
+        w.set_latency(enabled)
+        probes.reset()
+        costs = run(app, w, samples)
+        print("  {:<16} {:>8.1f} us {:>8.1f} us {:>8.1f} us {:>8.1f} us".format(
+            "enabled" if enabled else "disabled", *[c * 1e6 for c in costs + (sum(costs),)]))
+    print("\nReader, last run\n" + reader_report)
+    print("\nGUI, last run\n" + probes.report())
+    w.close()
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
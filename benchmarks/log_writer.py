@@ -0,0 +1,99 @@
+##################################################################
+# Benchmark for writing sweep logs off the GUI thread
+# Logs a stream of sweeps to a file that stalls like a slow disk,
+# once written directly, as finish_scan used to, and once through
+# LogWriter, and reports how long the caller is held up per sweep.
+# Run with: python benchmarks/log_writer.py [sweeps] [stall ms]
+##################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from LogWriter import LogWriter
+from SweepLog import SweepLog, SweepLogWriter, make_records
+
+POINTS = 361
+
+
+class SlowDisk(SweepLogWriter):
+    """A sweep log on a disk where every write and fsync stalls"""
+    stall = 0.02
+
+    def write(self, records):
+        time.sleep(self.stall)
+        super(SlowDisk, self).write(records)
+
+    def fileno(self):
+        time.sleep(self.stall * 5)  # fsync is the slowest part
+        return super(SlowDisk, self).fileno()
+
+
+def sweep_records(sweep):
+    angle = np.linspace(0, 180, POINTS)
+    ranges = np.full(POINTS, 100.)
+    return make_records(time.time(), sweep, angle, ranges, ranges, ranges).tobytes()
+
+
+def direct(path, sweeps, interval):
+    times = []
+    for sweep in range(sweeps):
+        start = time.perf_counter()
+        log = SlowDisk(path)
+        log.write(sweep_records(sweep))
+        log.fsync()
+        log.close()
+        times.append(time.perf_counter() - start)
+        time.sleep(interval)
+    return np.array(times)
+
+
+def background(path, sweeps, interval):
+    writer = LogWriter()
+    thread = threading.Thread(target=writer.long_running)
+    thread.start()
+    times = []
+    for sweep in range(sweeps):
+        start = time.perf_counter()
+        writer.append(path, sweep_records(sweep), SlowDisk)
+        times.append(time.perf_counter() - start)
+        time.sleep(interval)
+    start = time.perf_counter()
+    writer.stop()
+    thread.join()
+    shutdown = time.perf_counter() - start
+    return np.array(times), writer, shutdown
+
+
+def main(sweeps=100, stall_ms=20.):
+    SlowDisk.stall = stall_ms / 1000.
+    interval = 0.01  # Sweeps arrive faster than this disk can keep up with fsyncing each one
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "direct.radarlog")
+        times = direct(path, sweeps, interval)
+        print("Direct      held the caller {:7.2f} ms mean {:7.2f} ms worst per sweep".format(
+            times.mean() * 1e3, times.max() * 1e3))
+
+        path = os.path.join(folder, "background.radarlog")
+        times, writer, shutdown = background(path, sweeps, interval)
+        print("LogWriter   held the caller {:7.3f} ms mean {:7.3f} ms worst per sweep, "
+              "shutdown flushed in {:.0f} ms".format(times.mean() * 1e3, times.max() * 1e3, shutdown * 1e3))
+        print(writer.stats())
+        log = SweepLog(path)
+        ids, starts, stops = log.sweep_bounds()
+        print("{} sweeps of {} written, all complete: {}".format(
+            len(ids), sweeps, len(ids) == sweeps and bool(np.all(stops - starts == POINTS))))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100, float(sys.argv[2]) if len(sys.argv) > 2 else 20.)
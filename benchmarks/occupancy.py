@@ -0,0 +1,91 @@
+##################################################################
+# Benchmark for the occupancy heat map
+# Cost of one frame (fade the grid, resample it and setImage on an
+# ImageItem) after 10, 100, 1000 and 10000 sweeps have been added,
+# next to keeping every detection as a point of a scatter plot and
+# redrawing it. The grid's frame cost should not grow with the
+# number of sweeps, the scatter plot's does.
+# Run with: python benchmarks/occupancy.py
+##################################################################
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore, QtWidgets
+
+from OccupancyGrid import OccupancyGrid, fade_lut
+
+POINTS = 181  # Readings per sweep
+MAX_RANGE = 80.
+
+
+def sweep(rng):
+    """Angles and ranges of one sweep, a few walls with noise"""
+    angles = np.linspace(0, 180, POINTS)
+    ranges = 30 + 20 * np.abs(np.sin(np.radians(angles * 3))) + rng.normal(0, 1, POINTS)
+    return angles, ranges
+
+
+def frame_time(app, draw, repeats=20):
+    start = time.perf_counter()
+    for i in range(repeats):
+        draw()
+        app.processEvents()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    app = QtWidgets.QApplication([])
+    rng = np.random.default_rng(0)
+    plot = pg.PlotWidget()
+    plot.resize(640, 360)
+    plot.show()
+
+    grid = OccupancyGrid(MAX_RANGE)
+    heat = pg.ImageItem(axisOrder='row-major')
+    lut = fade_lut((0, 255, 0))
+    heat.setImage(grid.image(), autoLevels=False, levels=(0, 2), lut=lut)
+    heat.setRect(QtCore.QRectF(-MAX_RANGE, 0, 2 * MAX_RANGE, MAX_RANGE))
+    plot.addItem(heat)
+    points = plot.plot([], [], pen=None, symbol='o', symbolSize=3)
+    xs, ys = [], []
+
+    def draw_grid():
+        heat.setImage(grid.image(), autoLevels=False, levels=(0, 2), lut=lut)
+
+    def draw_points():
+        points.setData(np.concatenate(xs), np.concatenate(ys))
+
+    print("Frame cost after n sweeps, {} readings each".format(POINTS))
+    print("  {:>6}  {:>14}  {:>14}  {:>10}".format("sweeps", "occupancy grid", "every point", "add sweep"))
+    added = 0
+    add_time = 0.
+    for n in (10, 100, 1000, 10000):
+        while added < n:
+            angles, ranges = sweep(rng)
+            start = time.perf_counter()
+            grid.add(angles, ranges)
+            add_time += time.perf_counter() - start
+            theta = np.radians(angles - 90)
+            xs.append(ranges * np.sin(theta))
+            ys.append(ranges * np.cos(theta))
+            added += 1
+        heat.setVisible(True)
+        points.setVisible(False)
+        cost = frame_time(app, draw_grid)
+        heat.setVisible(False)
+        points.setVisible(True)
+        scatter = frame_time(app, draw_points, repeats=5 if n > 1000 else 20)
+        print("  {:>6}  {:>11.2f} ms  {:>11.2f} ms  {:>7.3f} ms".format(
+            n, cost * 1e3, scatter * 1e3, add_time / added * 1e3))
+    plot.close()
+
+
+if __name__ == '__main__':
+    main()
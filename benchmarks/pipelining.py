@@ -0,0 +1,98 @@
+##################################################################
+# Benchmark for lockstep and pipelined angle commands
+# Sweeps Radar_Main.py against the simulated Arduino with the ASCII
+# protocol, the binary protocol one command at a time, and the binary
+# protocol with several commands in flight. The simulated range is a
+# known function of the servo angle, so every reading also shows the
+# angle it was really taken at and mispaired readings can be counted.
+# POSIX only, as the simulator needs a pty
+# Run with: python benchmarks/pipelining.py [sweeps]
+##################################################################
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtWidgets
+from qt_material import apply_stylesheet
+
+import Radar_Main
+from SerialSimulator import Scene, start_simulator
+
+
+class AngleScene(Scene):
+    """Range grows with the angle, so a reading gives away where it was taken"""
+
+    def __init__(self):
+        super(AngleScene, self).__init__([], noise=0.)
+
+    def distance(self, angle):
+        return 10. + angle * 0.4
+
+    def true_angle(self, cm):
+        return (cm - 10.) / 0.4
+
+
+def run(app, protocol, pipeline, sweeps):
+    scene = AngleScene()
+    sim = start_simulator('binary' if protocol == 'binary' else 'radar', scene)
+    w = Radar_Main.App()
+    w.port_name = sim.port_name
+    w.protocol = protocol
+    w.pipeline = pipeline
+    w.threshold = 0
+    w.threshold2 = 0
+    w.det_radius = 18
+    w.detection_range = 400
+    w.speed2.setChecked(True)  # 1 degree steps
+    w.set_speed()
+
+    readings = []
+    update_sample = w.update_sample
+
+    def record(sample):
+        readings.append((sample.angle, sample.value))
+        update_sample(sample)
+    w.update_sample = record
+
+    w.connect_arduino2("Success")
+    while w.reader.running is False:
+        app.processEvents()
+    w.start_timer()
+    times = []
+    last = 0.
+    while len(times) < sweeps + 1:  # The first sweep starts part way
+        app.processEvents()
+        time.sleep(0.0005)
+        if w.sweep_time != last:
+            last = w.sweep_time
+            times.append(last)
+    received = w.reader.count
+    w.stop_timer()
+    w.close_reader()
+    w.close()  # Stops the port registry's thread
+    sim.stop()
+
+    wrong = sum(1 for angle, cm in readings if abs(scene.true_angle(cm) - angle) > 0.25)
+    return sum(times[1:]) / sweeps, len(readings), received, wrong
+
+
+def main(sweeps=2):
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    apply_stylesheet(app, theme=Radar_Main.default_theme())
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+
+    print("{:<24} {:>9} {:>9} {:>9} {:>10}".format("", "sweep s", "readings", "received", "mispaired"))
+    for name, protocol, pipeline in (("ascii lockstep", 'ascii', 1),
+                                     ("binary lockstep", 'binary', 1),
+                                     ("binary 4 in flight", 'binary', 4)):
+        sweep, used, received, wrong = run(app, protocol, pipeline, sweeps)
+        print("{:<24} {:9.2f} {:9d} {:9d} {:10d}".format(name, sweep, used, received, wrong))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2)
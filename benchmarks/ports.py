@@ -0,0 +1,87 @@
+##################################################################
+# Opening the Settings window and connecting to the Arduino
+# Times opening CustomDialog with the ports listed by comports() on
+# the GUI thread, as before PortRegistry.py, and served from the
+# registry's cache, then times connecting to the simulated
+# Radar_Combined.ino and Radar_Binary.ino with PortProbe, given the
+# port and finding it among every port, against the fixed 1.5 s the
+# old "Connecting . . ." wait took before the port was even opened.
+# POSIX only, as the simulator needs a pty
+# Run with: python benchmarks/ports.py [repeats]
+##################################################################
+
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt
+
+from CustomDialog import CustomDialog
+from PortRegistry import PortProbe, PortRegistry
+from SerialSimulator import Scene, start_simulator
+
+OLD_WAIT = 1.5  # Seconds SomeObject.long_running slept before the port was opened
+
+
+def median(times):
+    return sorted(times)[len(times) // 2]
+
+
+def open_dialog(registry, repeats):
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        dialog = CustomDialog(None, registry)
+        times.append(time.perf_counter() - start)
+        dialog.done(0)
+    return median(times)
+
+
+def connect(candidates, baudrate, protocol):
+    """Seconds PortProbe takes to find the port, and the port it found"""
+    probe = PortProbe(candidates, baudrate, protocol)
+    status = []
+    probe.progress.connect(status.append, Qt.DirectConnection)
+    probe.long_running()
+    name, port = probe.take()
+    if port is not None:
+        port.close()
+    if status[-1] != "Success":
+        raise RuntimeError(status[-1])
+    return probe.elapsed, name
+
+
+def main(repeats=5):
+    app = QtWidgets.QApplication([])
+    registry = PortRegistry()
+    thread = threading.Thread(target=registry.long_running, daemon=True)
+    thread.start()
+    registry.listed.wait()
+    print("{} ports, listed in {:.1f} ms".format(len(registry.ports()), registry.list_time * 1e3))
+    print("Opening the Settings window, median of {}".format(repeats))
+    print("  {:<24} {:>8.1f} ms".format("comports() each time", open_dialog(None, repeats) * 1e3))
+    print("  {:<24} {:>8.1f} ms".format("from PortRegistry", open_dialog(registry, repeats) * 1e3))
+
+    print("Connecting, median of {}, was {:.0f} ms of waiting before opening".format(repeats, OLD_WAIT * 1e3))
+    for protocol, baudrate in (('ascii', 9600), ('binary', 115200)):
+        sim = start_simulator('radar' if protocol == 'ascii' else 'binary', Scene(seed=0))
+        everywhere = [name for name, description in registry.ports()] + [sim.port_name]
+        for label, candidates in (("given the port", [sim.port_name]),
+                                  ("among {} ports".format(len(everywhere)), everywhere)):
+            results = [connect(candidates, baudrate, protocol) for _ in range(repeats)]
+            assert all(name == sim.port_name for elapsed, name in results)
+            print("  {:<8} {:<20} {:>8.1f} ms".format(protocol, label,
+                                                     median([elapsed for elapsed, name in results]) * 1e3))
+        sim.stop()
+    registry.stop()
+    thread.join()
+    del app
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
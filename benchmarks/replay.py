@@ -0,0 +1,129 @@
+##################################################################
+# Benchmark for recording and replaying sessions
+# Records sweeps of Radar_Main.py against the simulated Arduino, then
+# replays the session through a fresh Radar_Main.py at real time, 4x
+# and as fast as possible, and checks every replay processed the same
+# readings at the same angles as the live run. The as fast as possible
+# replay is the throughput of SerialReader and _update together.
+# Files are written in a temporary directory, removed after.
+# POSIX only, as the simulator needs a pty
+# Run with: python benchmarks/replay.py [sweeps]
+##################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtWidgets
+from qt_material import apply_stylesheet
+
+import Radar_Main
+import SerialSession
+from SerialSession import read_session, replay_url
+from SerialSimulator import start_simulator
+
+
+def make_app(port_name, protocol, record=None):
+    w = Radar_Main.App()
+    w.port_name = port_name
+    w.protocol = protocol
+    w.threshold = 20
+    w.threshold2 = 0
+    w.det_radius = 18
+    w.detection_range = 400
+    w.speed2.setChecked(True)  # 1 degree steps
+    w.set_speed()
+    w.readings = []
+    update_sample = w.update_sample
+
+    def keep(sample):
+        w.readings.append((sample.angle, sample.value))
+        update_sample(sample)
+    w.update_sample = keep
+    if record is not None:
+        SerialSession.recording_path = lambda: record  # Imported by connect_arduino2
+    w.connect_arduino2("Success")
+    SerialSession.recording_path = lambda: None
+    return w
+
+
+def wait_connected(app, w):
+    while w.reader is not None and w.reader.running is False:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def record(app, protocol, path, sweeps):
+    sim = start_simulator('binary' if protocol == 'binary' else 'radar')
+    w = make_app(sim.port_name, protocol, path)
+    wait_connected(app, w)
+    w.start_timer()
+    start = time.perf_counter()
+    times = 0
+    last = 0.
+    while times < sweeps + 1:  # The first sweep starts part way
+        app.processEvents()
+        time.sleep(0.0005)
+        if w.sweep_time != last:
+            last = w.sweep_time
+            times += 1
+    elapsed = time.perf_counter() - start
+    readings = w.readings
+    w.stop_timer()
+    w.close_reader()
+    w.close_log()
+    w.close()  # Stops the port registry's thread
+    sim.stop()
+    return elapsed, readings
+
+
+def replay(app, protocol, path, speed, expected, timeout=120.):
+    w = make_app(replay_url(path, speed), protocol)
+    wait_connected(app, w)
+    start = time.perf_counter()
+    w.start_timer()
+    while len(w.readings) < len(expected) and time.perf_counter() - start < timeout:
+        app.processEvents()
+        if speed:
+            time.sleep(0.0005)  # Live-like, rather than spinning
+    elapsed = time.perf_counter() - start
+    readings = w.readings
+    w.stop_timer()
+    w.close_reader()
+    w.close_log()
+    w.close()  # Stops the port registry's thread
+    return elapsed, readings
+
+
+def main(sweeps=2):
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    apply_stylesheet(app, theme=Radar_Main.default_theme())
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    folder = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(folder)  # Radar_Main.py logs to the working directory
+    try:
+        for protocol in ('ascii', 'binary'):
+            path = os.path.join(folder, protocol + ".radarsession")
+            elapsed, expected = record(app, protocol, path, sweeps)
+            header, chunks = read_session(path)
+            print("{}: recorded {} readings in {:.2f} s, {} chunks".format(protocol, len(expected), elapsed,
+                                                                            len(chunks)))
+            for name, speed in (("real time", 1.), ("4x", 4.), ("max speed", None)):
+                elapsed, readings = replay(app, protocol, path, speed, expected)
+                same = readings == expected
+                print("  {:<10} {:8.2f} s  {:10.0f} samples/s  identical to live: {}".format(
+                    name, elapsed, len(readings) / elapsed, same))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2)
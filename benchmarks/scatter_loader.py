@@ -0,0 +1,123 @@
+##################################################################
+# Benchmark for loading sessions into the 3D scatter grids
+# Writes synthetic sessions as datax.txt/datay.txt style text logs and
+# as sweep logs, with every sweep the same length and with a mix of
+# lengths (2x speed, other detection radii), then times building the
+# x/y/z grids: by the old loop of 3D scatter.py, by read_txt, and by
+# load_txt and load_log with pad_sweeps. The old loop cannot stack
+# sweeps of different lengths, so it is only timed on the even session.
+# Run with: python benchmarks/scatter_loader.py [sweeps]
+##################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from SweepLog import SweepLogWriter, load_log, load_txt, make_records, pad_sweeps, read_txt
+
+
+def write_session(folder, sweeps, lengths):
+    """Writes the same sweeps as text logs and as a sweep log"""
+    rng = np.random.default_rng(0)
+    xfile = os.path.join(folder, "datax.txt")
+    yfile = os.path.join(folder, "datay.txt")
+    path = os.path.join(folder, "session.radarlog")
+    writer = SweepLogWriter(path)
+    with open(xfile, 'w') as f, open(yfile, 'w') as g:
+        for sweep in range(sweeps):
+            n = rng.choice(lengths)
+            theta = np.radians(np.linspace(0, 180, n) - 90)
+            ranges = rng.uniform(2, 400, n)
+            x, y = ranges * np.sin(theta), ranges * np.cos(theta)
+            f.write("".join(str(v) + "," for v in x) + "\n")
+            g.write("".join(str(v) + "," for v in y) + "\n")
+            writer.write(make_records(0., sweep, np.degrees(theta) + 90, ranges, x, y))
+    writer.close()
+    return xfile, yfile, path
+
+
+def old_loop(xfile, yfile):
+    """The original 3D scatter.py, with the sweep length read from the data
+        rather than fixed at 180"""
+    xi = []
+    yi = []
+    with open(xfile) as f, open(yfile) as g:
+        for line in f.readlines():
+            x = line.rstrip('\n').split(",")[0:-1]
+            for i in range(len(x)):
+                x[i] = float(x[i])
+            xi.append(x)
+        for line in g.readlines():
+            y = line.rstrip('\n').split(",")[0:-1]
+            for i in range(len(y)):
+                y[i] = float(y[i])
+            yi.append(y)
+    x_data3d, y_data3d, z_data3d = [], [], []
+    counter = 0
+    for i in range(len(xi)):
+        x_data3d.append(np.array(xi[i]))
+        y_data3d.append(np.array(yi[i]))
+        z_data3d.append(np.ones(len(xi[i])) * counter)
+        counter += 0.5
+    return np.array(x_data3d), np.array(y_data3d), np.array(z_data3d)
+
+
+def grids(sweeps):
+    height = np.arange(len(sweeps.starts)) * 0.5
+    x, mask = pad_sweeps(sweeps.x, sweeps.starts, sweeps.stops)
+    y, mask = pad_sweeps(sweeps.y, sweeps.starts, sweeps.stops)
+    return x, y, np.repeat(height[:, None], mask.shape[1], axis=1)
+
+
+def from_read_txt(xfile, yfile):
+    pairs = read_txt(xfile, yfile)
+    lengths = np.array([len(x) for x, y in pairs])
+    stops = np.cumsum(lengths)
+    x = np.concatenate([x for x, y in pairs])
+    y = np.concatenate([y for x, y in pairs])
+    return pad_sweeps(x, stops - lengths, stops)[0]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(sweeps=10000):
+    for name, lengths in (("even, 180 points", [180]), ("mixed, 90 to 361 points", [90, 120, 180, 361])):
+        folder = tempfile.mkdtemp()
+        try:
+            xfile, yfile, path = write_session(folder, sweeps, lengths)
+            mb = (os.path.getsize(xfile) + os.path.getsize(yfile)) / 1e6
+            print("{} sweeps, {}: text logs {:.1f} MB, sweep log {:.1f} MB".format(
+                sweeps, name, mb, os.path.getsize(path) / 1e6))
+            if len(lengths) == 1:
+                seconds, (x, y, z) = timed(old_loop, xfile, yfile)
+                print("  {:<24} {:8.3f} s".format("old loop", seconds))
+            seconds, x = timed(from_read_txt, xfile, yfile)
+            print("  {:<24} {:8.3f} s".format("read_txt + pad", seconds))
+            seconds, sweep_data = timed(load_txt, xfile, yfile)
+            seconds_grid, (x, y, z) = timed(grids, sweep_data)
+            print("  {:<24} {:8.3f} s  (load {:.3f} s, grids {:.3f} s)  {:.1f} M points/s".format(
+                "load_txt + pad_sweeps", seconds + seconds_grid, seconds, seconds_grid,
+                len(sweep_data.x) / (seconds + seconds_grid) / 1e6))
+            seconds, log_data = timed(load_log, path)
+            seconds_grid, (lx, ly, lz) = timed(grids, log_data)
+            print("  {:<24} {:8.3f} s  (load {:.3f} s, grids {:.3f} s)  {:.1f} M points/s".format(
+                "load_log + pad_sweeps", seconds + seconds_grid, seconds, seconds_grid,
+                len(log_data.x) / (seconds + seconds_grid) / 1e6))
+            same = np.array_equal(sweep_data.starts, log_data.starts) and np.allclose(x, lx, atol=1e-4)
+            print("  grid {} x {}, text and sweep log agree: {}".format(x.shape[0], x.shape[1], same))
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,96 @@
+##################################################################
+# Start up time of Radar_Main.py and Oscillate.py
+# Starts each in a fresh interpreter, offscreen, and times every step
+# up to the first frame of the window:
+#   launch      from starting the process to its first line of Python
+#   import      importing the entry point
+#   style       the QApplication and, for Radar_Main, its stylesheet
+#   window      constructing App()
+#   show        showing the window and painting its first frame
+# The median of the runs is printed, then the slowest modules each
+# entry point imports, from python -X importtime.
+# Run with: python benchmarks/startup.py [runs]
+##################################################################
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+STARTED = time.time()  # As soon as possible, see launch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ('launch', 'import', 'style', 'window', 'show')
+
+
+def child(module, spawned):
+    """Runs in its own interpreter, prints the time of each step as the last line"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, ROOT)
+    times = {'launch': STARTED - spawned}
+    start = time.perf_counter()
+    entry = __import__(module)
+    times['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from PyQt5 import QtCore, QtWidgets
+    app = QtWidgets.QApplication([])
+    if module == 'Radar_Main':
+        entry.app = app
+        entry.apply_stylesheet(app, theme=entry.default_theme())
+        os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    times['style'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    w = entry.App()
+    times['window'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    w.show()
+    QtCore.QTimer.singleShot(0, app.quit)  # Runs once the first frame has been painted
+    app.exec_()
+    times['show'] = time.perf_counter() - start
+    w.close()  # Stops the port registry's thread
+    print(json.dumps(times))
+
+
+def run(module):
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child=' + module,
+                                      repr(time.time())], cwd=ROOT, stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def slowest_imports(module, n=8):
+    """(module, seconds) of the slowest imports module makes directly, from -X importtime"""
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    imports = []
+    for line in result.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if name.startswith('   ') and not name.startswith('    '):  # Imported by module itself
+            imports.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(imports, key=lambda i: i[1], reverse=True)[:n]
+
+
+def main(runs=5):
+    for module in ('Radar_Main', 'Oscillate'):
+        results = [run(module) for _ in range(runs)]
+        median = {step: sorted(r[step] for r in results)[len(results) // 2] for step in STEPS}
+        print("{}, median of {} runs".format(module, runs))
+        for step in STEPS:
+            print("  {:<10} {:>8.1f} ms".format(step, median[step] * 1e3))
+        print("  {:<10} {:>8.1f} ms".format("first frame", sum(median.values()) * 1e3))
+        print("  Slowest imports")
+        for name, seconds in slowest_imports(module):
+            print("    {:<28} {:>8.1f} ms".format(name, seconds * 1e3))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1].startswith('--child='):
+        child(sys.argv[1].split('=', 1)[1], float(sys.argv[2]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,402 @@
+##################################################################
+# Benchmark suite for the acquisition and rendering hot paths
+# Drives Radar_Main.App and Oscillate.App offscreen against the
+# simulated Arduino of SerialSimulator.py and writes every result to
+# a JSON file:
+#   samples/s   sessions recorded live in sweep, object scanning and
+#               static mode, and from analog_port.ino, replayed as fast
+#               as possible through _update, _scanning, static_scan
+#               and Oscillate's _update
+#   sweep time  of live sweeps at 1x and 2x speed
+#   frames      the frame clock's render as the sweep history fills,
+#               after 1, 10 and 100 synthetic sweeps
+#   memory      resident memory growth over the 100 sweeps
+#   export      plots, data and every logged sweep as images
+# Given a baseline, a JSON file from an earlier run, each result is
+# compared with it and any worse by more than the tolerance, 20% by
+# default, is flagged as a regression and the exit status is 1.
+# Files go in a temporary directory and are removed after.
+# POSIX only, as the simulator needs a pty
+# Run with: python benchmarks/suite.py [--out=results.json] [--baseline=old.json] [--tolerance=0.2]
+# Compare:  python benchmarks/suite.py --compare=new.json --baseline=old.json
+##################################################################
+
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PyQt5 import QtWidgets
+from qt_material import apply_stylesheet
+
+import Oscillate
+import Radar_Main
+import SerialSession
+from SerialSession import replay_url
+from SerialSimulator import Scene, start_simulator
+from hidden_plots import readings
+
+SEED = 0  # Of the simulated scene, so every run sees the same obstacles
+MAX_RANGE = 100.  # Of the simulated sensor in cm, the echo of an empty beam takes as long as one from this far
+REPLAYS = 3  # Replays of each session, the median is reported
+STATIC_SECONDS = 2.  # Recorded in static mode and from analog_port.ino
+BATCH = 12  # Readings per frame in the synthetic sweeps, 360 Hz at 30 fps
+
+
+def metric(results, name, value, unit, better='lower', slack=0.):
+    """Adds a result. better is 'lower' or 'higher', and a change smaller
+        than slack is never counted as a regression"""
+    results[name] = {'value': float(value), 'unit': unit, 'better': better, 'slack': slack}
+    print("  {:<28} {:>12.3f} {}".format(name, value, unit))
+
+
+def rss_mb():
+    """Resident memory of this process in MB, the peak where /proc is missing"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        scale = 1. if sys.platform == 'darwin' else 1e3  # ru_maxrss is in bytes on macOS, KB elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def wait_connected(app, w):
+    while w.reader is not None and w.reader.running is False:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def radar_app(app, port_name, speed=1):
+    """Radar_Main.App connected to port_name, counting the readings it processes in processed"""
+    w = Radar_Main.App()
+    w.resize(1280, 800)
+    w.show()
+    w.port_name = port_name
+    w.protocol = 'binary'
+    w.threshold = 20
+    w.threshold2 = 0
+    w.det_radius = 18
+    w.detection_range = 400
+    if speed == 2:
+        w.speed2.setChecked(True)
+        w.set_speed()
+    w.processed = 0
+
+    def counted(process):
+        def count(sample):
+            w.processed += 1
+            process(sample)
+        return count
+    for name in ('update_sample', 'scanning_sample', 'static_sample'):
+        setattr(w, name, counted(getattr(w, name)))
+    w.connect_arduino2("Success")
+    wait_connected(app, w)
+    return w
+
+
+def start(w, mode):
+    if mode == 'sweep':
+        w.start_timer()
+    elif mode == 'scan':
+        w.object_detection()
+        w.start_timer()
+    else:
+        w.static_angle()
+
+
+def record_radar(app, mode, path, speed=1, sweeps=2):
+    """Runs mode live against the simulated Radar_Binary.ino, recording the
+        session to path. Returns the sweep times and the readings processed"""
+    sim = start_simulator('binary', Scene(max_range=MAX_RANGE, seed=SEED))
+    SerialSession.recording_path = lambda: path  # Imported by connect_arduino2
+    w = radar_app(app, sim.port_name, speed)
+    SerialSession.recording_path = lambda: None
+    start(w, mode)
+    began = time.perf_counter()
+    times = []
+    last = 0.
+    while True:
+        app.processEvents()
+        time.sleep(0.0005)
+        if mode == 'sweep':
+            if w.sweep_time != last:
+                last = w.sweep_time
+                times.append(last)
+            if len(times) == sweeps:
+                break
+        elif mode == 'scan':
+            if w.mode is None:
+                break
+        elif time.perf_counter() - began > STATIC_SECONDS:
+            break
+    processed = w.processed
+    w.stop_timer()
+    w.close()
+    sim.stop()
+    return times, processed
+
+
+def replay_radar(app, mode, path, expected, timeout=60.):
+    """Samples/s processed replaying the session as fast as possible"""
+    w = radar_app(app, replay_url(path, None))
+    began = time.perf_counter()
+    start(w, mode)
+    while w.processed < expected and time.perf_counter() - began < timeout:
+        app.processEvents()
+    elapsed = time.perf_counter() - began
+    processed = w.processed
+    w.stop_timer()
+    w.close()
+    return processed / elapsed
+
+
+def oscillate_app(app, port_name):
+    w = Oscillate.App()
+    w.resize(1280, 800)
+    w.show()
+    w.port_name = port_name
+    w.connect_arduino2("Success")
+    wait_connected(app, w)
+    return w
+
+
+def record_oscillate(app, path):
+    """Streams from the simulated analog_port.ino, recording the session
+        to path. Returns the frames read"""
+    sim = start_simulator('analog', Scene(max_range=MAX_RANGE, seed=SEED))
+    Oscillate.recording_path = lambda: path
+    w = oscillate_app(app, sim.port_name)
+    Oscillate.recording_path = lambda: None
+    reader = w.reader
+    w.start_timer()
+    began = time.perf_counter()
+    while time.perf_counter() - began < STATIC_SECONDS:
+        app.processEvents()
+        time.sleep(0.0005)
+    w.stop_timer()
+    w.close()
+    sim.stop()
+    return reader.count
+
+
+def replay_oscillate(app, path, expected, timeout=60.):
+    """Frames/s taken by _update replaying the session as fast as possible"""
+    w = oscillate_app(app, replay_url(path, None))
+    reader = w.reader
+    began = time.perf_counter()
+    w.start_timer()
+    while (reader.count < expected or reader.samples) and time.perf_counter() - began < timeout:
+        app.processEvents()
+    elapsed = time.perf_counter() - began
+    w.stop_timer()
+    w.close()
+    return reader.count / elapsed
+
+
+def throughput(app, folder, results):
+    print("Live and replayed sessions, binary protocol")
+    for mode, function in (('sweep', '_update'), ('scan', '_scanning'), ('static', 'static_scan')):
+        path = os.path.join(folder, mode + ".radarsession")
+        times, expected = record_radar(app, mode, path)
+        if mode == 'sweep':
+            metric(results, 'sweep_time.1x', np.mean(times), 's')
+        rates = [replay_radar(app, mode, path, expected) for _ in range(REPLAYS)]
+        metric(results, function + '.samples_per_s', np.median(rates), 'samples/s', 'higher')
+    times, expected = record_radar(app, 'sweep', os.path.join(folder, "sweep2x.radarsession"), speed=2)
+    metric(results, 'sweep_time.2x', np.mean(times), 's')
+
+    path = os.path.join(folder, "analog.radarsession")
+    expected = record_oscillate(app, path)
+    rates = [replay_oscillate(app, path, expected) for _ in range(REPLAYS)]
+    metric(results, 'oscillate._update.frames_per_s', np.median(rates), 'frames/s', 'higher')
+
+
+def frames(app, folder, results, sweeps=100, checkpoints=(1, 10, 100)):
+    """Synthetic sweeps through update_sample, rendering every frame, while
+        up to 200 sweeps are kept in the sweep history"""
+    print("Frames as the sweep history fills, {} sweeps".format(sweeps))
+    w = Radar_Main.App()
+    w.log_name = os.path.join(folder, "sweeps.radarlog")
+    w.resize(1280, 800)
+    w.show()
+    w.threshold = 30
+    w.threshold2 = 0
+    w.det_radius = 18
+    w.s = 80
+    w.set_limits(w.s)
+    w.set_history(200)
+    app.processEvents()
+    samples = readings(sweeps)
+    per_sweep = len(samples) // sweeps
+    for sweep in range(sweeps):
+        rendering = 0.
+        count = 0
+        sweep_samples = samples[sweep * per_sweep:(sweep + 1) * per_sweep]
+        for i in range(0, len(sweep_samples), BATCH):
+            batch = sweep_samples[i:i + BATCH]
+            for sample in batch:
+                w.update_sample(sample)
+            w.add_detections([s.angle for s in batch], [s.value for s in batch])
+            w.clock.timer.stop()
+            t = time.perf_counter()
+            w.clock.render()
+            rendering += time.perf_counter() - t
+            count += 1
+        app.processEvents()
+        if sweep + 1 in checkpoints:
+            metric(results, 'render.sweep_{}'.format(sweep + 1), rendering / count * 1e3, 'ms/frame')
+        if sweep + 1 == 10:
+            settled = rss_mb()
+    w.canvas.viewport().repaint()
+    metric(results, 'memory.rss', rss_mb(), 'MB', slack=20.)
+    metric(results, 'memory.growth', rss_mb() - settled, 'MB', slack=5.)
+    return w
+
+
+def exports(app, w, folder, results, repeats=5):
+    """The exports of App.export, on the App's own export worker"""
+    print("Exports")
+    exporter = w.export_worker()
+    held = []
+    began = time.perf_counter()
+    for i in range(repeats):
+        t = time.perf_counter()
+        exporter.save_image(os.path.join(folder, "plots{}.png".format(i)), w.canvas.grab().toImage())
+        held.append(time.perf_counter() - t)
+    w.close_exporter()
+    metric(results, 'export.plots_gui', np.median(held) * 1e3, 'ms')
+    metric(results, 'export.plots', (time.perf_counter() - began) / repeats * 1e3, 'ms')
+
+    exporter = w.export_worker()
+    began = time.perf_counter()
+    for i in range(repeats):
+        object_x, object_y = w.sweep3.copy()
+        clear_x, clear_y = w.sweep5.copy()
+        exporter.save_data(os.path.join(folder, "data{}.csv".format(i)),
+                           {'object_x': object_x, 'object_y': object_y, 'clear_x': clear_x, 'clear_y': clear_y,
+                            'range': w.ydata.view().copy()})
+    w.close_exporter()
+    metric(results, 'export.data', (time.perf_counter() - began) / repeats * 1e3, 'ms')
+
+    w.close_log()  # Everything logged is on disk before the log is read
+    exporter = w.export_worker()
+    began = time.perf_counter()
+    exporter.save_sweeps(w.log_name, os.path.join(folder, "seq", "sweep.png"), w.s,
+                         {'clear': w.prim_col, 'object': w.shif_col})
+    w.close_exporter()
+    metric(results, 'export.sweeps', exporter.frames / (time.perf_counter() - began), 'frames/s', 'higher')
+    w.close()
+
+
+def run():
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    apply_stylesheet(app, theme=Radar_Main.default_theme())
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    results = {}
+    folder = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(folder)  # Both GUIs write logs to the working directory
+    try:
+        throughput(app, folder, results)
+        w = frames(app, folder, results)
+        exports(app, w, folder, results)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(folder)
+    return results
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'commit': commit(),
+                   'python': platform.python_version(), 'platform': platform.platform(),
+                   'results': results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print("Results written to", path)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance):
+    """Prints each result next to the baseline and returns the names of
+        those worse than it by more than tolerance, a fraction of the
+        baseline, or by more than their slack if that is larger"""
+    regressions = []
+    print("{:<30} {:>12} {:>12} {:>8}".format("", "baseline", "now", "change"))
+    for name in sorted(set(results) | set(baseline)):
+        if name not in results or name not in baseline:
+            print("{:<30} {:>12} {:>12}".format(name, "" if name not in baseline else "{:.3f}".format(
+                baseline[name]['value']), "" if name not in results else "{:.3f}".format(results[name]['value'])))
+            continue
+        now = results[name]['value']
+        then = baseline[name]['value']
+        worse = now - then if results[name]['better'] == 'lower' else then - now
+        change = (now - then) / abs(then) * 100 if then else 0.
+        flag = ""
+        if worse > max(tolerance * abs(then), results[name]['slack']):
+            flag = "REGRESSION"
+            regressions.append(name)
+        print("{:<30} {:>12.3f} {:>12.3f} {:>+7.1f}% {} {}".format(name, then, now, change,
+                                                                  results[name]['unit'], flag))
+    return regressions
+
+
+def main(argv):
+    out = "benchmark.json"
+    baseline = None
+    tolerance = 0.2
+    compare_only = None
+    for arg in argv:
+        if arg.startswith('--out='):
+            out = arg.split('=', 1)[1]
+        elif arg.startswith('--baseline='):
+            baseline = arg.split('=', 1)[1]
+        elif arg.startswith('--tolerance='):
+            tolerance = float(arg.split('=', 1)[1])
+        elif arg.startswith('--compare='):
+            compare_only = arg.split('=', 1)[1]
+        else:
+            print("Unknown option", arg)
+            return 2
+    if compare_only is not None:
+        results = load(compare_only)['results']
+    else:
+        results = run()
+        save(out, results)
+    if baseline is None:
+        return 0
+    old = load(baseline)
+    print("\nCompared with {} ({}, commit {})".format(baseline, old['created'], old['commit']))
+    regressions = compare(results, old['results'], tolerance)
+    if regressions:
+        print("{} regressions beyond {:.0f}%: {}".format(len(regressions), tolerance * 100, ", ".join(regressions)))
+        return 1
+    print("No regressions beyond {:.0f}%".format(tolerance * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
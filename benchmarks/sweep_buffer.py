@@ -0,0 +1,102 @@
+##################################################################
+# Benchmark for the per-sweep point storage used by Radar_Main.py
+# Compares growing Python lists against SweepBuffer over a full
+# sweep at 1x and 2x speed and reports the per-sample cost at the
+# start and the end of the sweep. Handing the filled arrays to
+# setData() grows with the sweep whatever stores them, SweepScatter
+# is what keeps the cost of a sample flat
+# Run with: python benchmarks/sweep_buffer.py
+##################################################################
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtWidgets
+
+from SweepBuffer import SweepBuffer, SweepScatter
+
+
+def sweep_lists(item, theta, ranges):
+    """Per-sample timings of the original list based sweep"""
+    xdata = []
+    ydata = []
+    times = np.empty(len(theta))
+    for i in range(len(theta)):
+        start = time.perf_counter()
+        xdata.append(ranges[i] * np.sin(theta[i]))
+        ydata.append(ranges[i] * np.cos(theta[i]))
+        item.setData(xdata, ydata)
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def sweep_buffer(item, theta, ranges):
+    """Per-sample timings of a sweep stored in a SweepBuffer"""
+    points = SweepBuffer(len(theta))
+    times = np.empty(len(theta))
+    for i in range(len(theta)):
+        start = time.perf_counter()
+        points.append(ranges[i] * np.sin(theta[i]), ranges[i] * np.cos(theta[i]))
+        item.setData(points.xdata(), points.ydata())
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def sweep_scatter(scatter, theta, ranges):
+    """Per-sample timings of a sweep stored in a SweepBuffer and drawn by a SweepScatter"""
+    points = SweepBuffer(len(theta))
+    times = np.empty(len(theta))
+    for i in range(len(theta)):
+        start = time.perf_counter()
+        points.append(ranges[i] * np.sin(theta[i]), ranges[i] * np.cos(theta[i]))
+        scatter.setData(points)
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def sweep_buffer_only(theta, ranges):
+    """Per-sample timings of filling the SweepBuffer without plotting"""
+    points = SweepBuffer(len(theta))
+    times = np.empty(len(theta))
+    for i in range(len(theta)):
+        start = time.perf_counter()
+        points.append(ranges[i] * np.sin(theta[i]), ranges[i] * np.cos(theta[i]))
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def report(name, times):
+    tenth = max(len(times) // 10, 1)
+    first = np.median(times[:tenth]) * 1e6
+    last = np.median(times[-tenth:]) * 1e6
+    print("{:<22} first 10%: {:8.1f} us   last 10%: {:8.1f} us   ratio: {:5.2f}   total: {:7.1f} ms".format(
+        name, first, last, last / first, times.sum() * 1e3))
+
+
+def main(repeats=5):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    plot = pg.PlotWidget()
+    item = plot.plot([], pen=None, symbolBrush='r', symbolSize=2, symbolPen=None)
+    scatter = SweepScatter(pen=None, brush='r', size=2)
+    plot.addItem(scatter)
+
+    for speed, multiplier in (("1x", 2), ("2x", 1)):
+        theta = np.linspace(np.pi / -2, np.pi / 2, 180 * multiplier + 1)
+        ranges = np.random.default_rng(0).uniform(2, 90, len(theta))
+        print("Speed {} ({} samples per sweep)".format(speed, len(theta)))
+        for name, run in (("lists + setData", lambda: sweep_lists(item, theta, ranges)),
+                          ("SweepBuffer + setData", lambda: sweep_buffer(item, theta, ranges)),
+                          ("SweepScatter", lambda: sweep_scatter(scatter, theta, ranges)),
+                          ("SweepBuffer only", lambda: sweep_buffer_only(theta, ranges))):
+            report(name, np.median([run() for _ in range(repeats)], axis=0))
+    app.processEvents()
+
+
+if __name__ == '__main__':
+    main()
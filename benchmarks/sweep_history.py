@@ -0,0 +1,104 @@
+##################################################################
+# Benchmark for the fading sweep history of the right hand plots
+# Cost of adding a point, of a frame during a sweep (stamp the
+# points read since the last frame and repaint the plot) and of the
+# frame that ends a sweep (redraw every point at its new age) while
+# the last 1 to 500 sweeps are kept, next to a ScatterPlotItem given
+# every point with a brush per point for its age each frame. 60 fps
+# leaves 16.7 ms per frame.
+# Run with: python benchmarks/sweep_history.py
+##################################################################
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtWidgets
+
+from SweepHistory import SweepHistory, FadingScatter
+from SweepLog import CLEAR, OBJECT
+
+POINTS = 361  # Readings per sweep at 1x speed
+
+
+def sweep(rng):
+    """x, y and classification of one sweep"""
+    theta = np.radians(np.linspace(0, 180, POINTS) - 90)
+    ranges = 30 + 20 * np.abs(np.sin(theta * 3)) + rng.normal(0, 1, POINTS)
+    kinds = np.where(ranges < 35, OBJECT, CLEAR)
+    return ranges * np.sin(theta), ranges * np.cos(theta), kinds
+
+
+def frame_time(plot, draw, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        draw()
+        plot.grab()  # Paints the plot as the next frame would
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    app = QtWidgets.QApplication([])
+    rng = np.random.default_rng(0)
+    colors = {OBJECT: '#ff0000', CLEAR: '#00ff00'}
+    plot = pg.PlotWidget()
+    plot.resize(640, 360)
+    plot.setXRange(-60, 60)
+    plot.setYRange(0, 60)
+    plot.show()
+
+    print("Frame cost keeping the last n sweeps, {} readings each".format(POINTS))
+    print("  {:>6}  {:>8}  {:>12}  {:>12}  {:>16}  {:>10}".format("sweeps", "points", "during sweep",
+                                                                  "sweep end", "brush per point", "add point"))
+    for sweeps in (1, 10, 50, 200, 500):
+        history = SweepHistory(sweeps, POINTS)
+        trail = FadingScatter(history, colors)
+        plot.addItem(trail)
+        add_time = 0.
+        for i in range(sweeps):
+            x, y, kinds = sweep(rng)
+            start = time.perf_counter()
+            for j in range(POINTS):
+                history.append(x[j], y[j], kinds[j])
+            add_time += time.perf_counter() - start
+            history.next_sweep()
+        trail.refresh()
+        x, y, kinds = sweep(rng)
+        frame = iter(range(0, 10 ** 6, 12))  # 12 new readings a frame, 360 Hz at 30 fps
+
+        def draw_points():
+            j = next(frame) % (POINTS - 12)
+            for k in range(j, j + 12):
+                history.append(x[k], y[k], kinds[k])
+            trail.refresh()
+        during = frame_time(plot, draw_points, 20)
+        points = history.ordered()
+
+        def draw_sweep_end():
+            history.next_sweep()
+            trail.refresh()
+        end = frame_time(plot, draw_sweep_end, 5)
+        plot.removeItem(trail)
+
+        scatter = pg.ScatterPlotItem(size=2, pen=None)
+        plot.addItem(scatter)
+        age = history.sweep - points['sweep']
+        brushes = [pg.mkBrush(pg.mkColor(colors[int(k)]).red(), pg.mkColor(colors[int(k)]).green(), 0,
+                              int(255 * (sweeps - a) / sweeps)) for k, a in zip(points['kind'], age)]
+
+        def draw_scatter():
+            scatter.setData(points['x'], points['y'], brush=brushes)
+        old = frame_time(plot, draw_scatter, 3 if sweeps >= 200 else 10)
+        plot.removeItem(scatter)
+        print("  {:>6}  {:>8}  {:>9.2f} ms  {:>9.2f} ms  {:>13.2f} ms  {:>7.2f} us".format(
+            sweeps, len(points), during * 1e3, end * 1e3, old * 1e3, add_time / (sweeps * POINTS) * 1e6))
+    plot.close()
+
+
+if __name__ == '__main__':
+    main()
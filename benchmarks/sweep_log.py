@@ -0,0 +1,83 @@
+##################################################################
+# Benchmark for loading sweep logs
+# Writes sessions of increasing size in the binary sweep log format
+# and times opening them, looking up a sweep and indexing every sweep,
+# next to parsing the same sweeps from datax.txt/datay.txt style
+# text logs. Files go in a temporary directory and are removed after.
+# Run with: python benchmarks/sweep_log.py [largest number of sweeps]
+##################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from SweepLog import SweepLog, SweepLogWriter, make_records, read_txt
+
+POINTS = 361  # Readings per sweep at 1x speed
+
+
+def write_log(path, sweeps, batch=1000):
+    theta = np.radians(np.linspace(0, 180, POINTS) - 90)
+    rng = np.random.default_rng(0)
+    writer = SweepLogWriter(path)
+    for first in range(0, sweeps, batch):
+        n = min(batch, sweeps - first)
+        ranges = rng.uniform(2, 400, (n, POINTS))
+        sweep = np.repeat(np.arange(first, first + n), POINTS).reshape(n, POINTS)
+        writer.write(make_records(time.time(), sweep, np.degrees(theta) + 90, ranges,
+                                  ranges * np.sin(theta), ranges * np.cos(theta)))
+    writer.close()
+
+
+def write_txt(xfile, yfile, sweeps):
+    rng = np.random.default_rng(0)
+    with open(xfile, 'w') as f, open(yfile, 'w') as g:
+        for _ in range(sweeps):
+            f.write(",".join(str(v) for v in rng.uniform(-400, 400, POINTS)) + ",\n")
+            g.write(",".join(str(v) for v in rng.uniform(0, 400, POINTS)) + ",\n")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1e3, result
+
+
+def main(largest=100000):
+    folder = tempfile.mkdtemp()
+    try:
+        print("{:>8} {:>9} {:>9} {:>10} {:>10} {:>12}".format(
+            "sweeps", "MB", "write s", "open ms", "sweep ms", "index ms"))
+        sweeps = 1000
+        while sweeps <= largest:
+            path = os.path.join(folder, "{}.radarlog".format(sweeps))
+            write_ms, _ = timed(write_log, path, sweeps)
+            open_ms, log = timed(SweepLog, path)
+            lookup_ms, records = timed(log.sweep, sweeps // 2)
+            assert len(records) == POINTS
+            index_ms, (ids, starts, stops) = timed(log.sweep_bounds)
+            assert len(ids) == sweeps
+            print("{:8d} {:9.1f} {:9.2f} {:10.3f} {:10.3f} {:12.1f}".format(
+                sweeps, os.path.getsize(path) / 1e6, write_ms / 1e3, open_ms, lookup_ms, index_ms))
+            del log, records
+            os.remove(path)
+            sweeps *= 10
+
+        xfile = os.path.join(folder, "datax.txt")
+        yfile = os.path.join(folder, "datay.txt")
+        write_txt(xfile, yfile, 1000)
+        parse_ms, sweeps = timed(read_txt, xfile, yfile)
+        print("Text logs: 1000 sweeps ({:.1f} MB) parsed in {:.0f} ms".format(
+            (os.path.getsize(xfile) + os.path.getsize(yfile)) / 1e6, parse_ms))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
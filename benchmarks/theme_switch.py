@@ -0,0 +1,72 @@
+##################################################################
+# Soak test for switching colour themes
+# Switches the theme 100 times through the ten themes offered in the
+# Settings window, as picking them there would, and every 10 switches
+# reports the number of items in the plot scene, how long a switch
+# took and how long repainting the plots takes.
+# Run with: python benchmarks/theme_switch.py [switches]
+##################################################################
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PyQt5 import QtWidgets
+from qt_material import apply_stylesheet, list_themes
+
+import Radar_Main
+
+POINTS = 361
+
+
+def fill_plots(w):
+    """Puts a sweep's worth of points in the plots"""
+    rng = np.random.default_rng(1)
+    ranges = rng.uniform(2, 50, POINTS)
+    theta = np.radians(np.linspace(0, 180, POINTS) - 90)
+    x, y = ranges * np.sin(theta), ranges * np.cos(theta)
+    w.h2.setData(ranges)
+    w.h3.setData(x[::2], y[::2])
+    w.h4.setData(x[1::2], y[1::2])
+
+
+def frame_time(app, w, repeats=10):
+    start = time.perf_counter()
+    for i in range(repeats):
+        w.canvas.viewport().repaint()
+    return (time.perf_counter() - start) / repeats
+
+
+def main(switches=100):
+    app = QtWidgets.QApplication([])
+    Radar_Main.app = app
+    themes = list_themes()[:10]  # As listed in the Settings window
+    apply_stylesheet(app, theme=themes[3])
+    os.environ.setdefault('QTMATERIAL_SHIFTEDCOLOR', '#ff0000')  # Not set by every qt_material version
+    w = Radar_Main.App()
+    w.resize(1280, 800)
+    w.show()
+    fill_plots(w)
+    app.processEvents()
+
+    print("{:>8}  {:>11}  {:>12}  {:>10}".format("switches", "scene items", "switch", "frame"))
+    print("{:>8}  {:>11}  {:>12}  {:>7.2f} ms".format(0, len(w.canvas.scene().items()), "", frame_time(app, w) * 1e3))
+    elapsed = 0.
+    for i in range(1, switches + 1):
+        start = time.perf_counter()
+        w.new_stylesheet(themes[i % len(themes)])
+        app.processEvents()
+        elapsed += time.perf_counter() - start
+        if i % 10 == 0:
+            print("{:>8}  {:>11}  {:>9.1f} ms  {:>7.2f} ms".format(
+                i, len(w.canvas.scene().items()), elapsed / 10 * 1e3, frame_time(app, w) * 1e3))
+            elapsed = 0.
+    w.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)